@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Direct amdgpu sysfs/hwmon reader
+Reads AMD GPU utilization, VRAM, temperature, power and clocks without forking rocm-smi
+"""
+
+import glob
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+AMD_VENDOR_ID = "0x1002"
+
+# DRM exposes connectors as card0-DP-1 etc.; only bare cardN entries are devices
+CARD_PATTERN = re.compile(r"card(\d+)$")
+
+
+class SysfsAttribute:
+    """An integer sysfs attribute read through a file descriptor kept open between ticks"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def read(self) -> Optional[int]:
+        """Re-read the attribute from offset 0 (sysfs regenerates the value on each read)"""
+        try:
+            data = os.pread(self.fd, 64, 0)
+            return int(data.split()[0])
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+def _open_attribute(path: str) -> Optional[SysfsAttribute]:
+    """Open an attribute if the driver exposes it"""
+    try:
+        return SysfsAttribute(path)
+    except OSError:
+        return None
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def find_cards(root: str = "/") -> List[str]:
+    """Card directories of amdgpu-managed devices, ordered by card number
+
+    The one place devices are enumerated, so the live reader, the inventory
+    and captured fixtures all agree on GPU indexes.
+    """
+    cards = []
+    for card_path in glob.glob(os.path.join(root, "sys", "class", "drm", "card*")):
+        match = CARD_PATTERN.search(os.path.basename(card_path))
+        if not match:
+            continue
+        if _read_text(os.path.join(card_path, "device", "vendor")) != AMD_VENDOR_ID:
+            continue
+        # Devices without gpu_busy_percent are not amdgpu-managed (or too old to be useful)
+        if not os.path.exists(os.path.join(card_path, "device", "gpu_busy_percent")):
+            continue
+        cards.append((int(match.group(1)), card_path))
+    return [card_path for _, card_path in sorted(cards)]
+
+
+class AmdGpuDevice:
+    """One amdgpu device with its attribute handles opened once at discovery"""
+
+    def __init__(self, index: int, card_path: str):
+        self.index = index
+        self.card_path = card_path
+        device = os.path.join(card_path, "device")
+        self.model = _read_text(os.path.join(device, "product_name")) or "AMD GPU"
+        self.pci_bus = os.path.basename(os.path.realpath(device))
+
+        self.busy = _open_attribute(os.path.join(device, "gpu_busy_percent"))
+        self.memory_busy = _open_attribute(os.path.join(device, "mem_busy_percent"))
+        self.vram_used = _open_attribute(os.path.join(device, "mem_info_vram_used"))
+        self.vram_total = _open_attribute(os.path.join(device, "mem_info_vram_total"))
+
+        self.temperature = None
+        self.temperature_limit = None
+        self.power = None
+        self.power_cap = None
+        self.graphics_clock = None
+        self.memory_clock = None
+        hwmon_dirs = sorted(glob.glob(os.path.join(device, "hwmon", "hwmon*")))
+        if hwmon_dirs:
+            self._open_hwmon(hwmon_dirs[0])
+
+    def _open_hwmon(self, hwmon: str):
+        """Pick edge temperature, package power and sclk/mclk from the hwmon directory"""
+        labels = {}
+        for label_path in glob.glob(os.path.join(hwmon, "*_label")):
+            label = _read_text(label_path)
+            if label:
+                labels[label.lower()] = label_path[:-len("_label")] + "_input"
+
+        temperature_input = labels.get("edge") or os.path.join(hwmon, "temp1_input")
+        self.temperature = _open_attribute(temperature_input)
+        # The critical temperature is fixed by the board, so it is read once
+        critical = _read_text(temperature_input[:-len("_input")] + "_crit")
+        self.temperature_limit = int(critical) / 1000.0 if critical and critical.isdigit() else None
+        # Newer kernels expose power1_input; older ones only power1_average
+        self.power = (_open_attribute(os.path.join(hwmon, "power1_average"))
+                      or _open_attribute(os.path.join(hwmon, "power1_input")))
+        # The power cap can be changed at runtime (rocm-smi --setpoweroverdrive), so it is re-read each tick
+        self.power_cap = _open_attribute(os.path.join(hwmon, "power1_cap"))
+        self.graphics_clock = _open_attribute(labels.get("sclk") or os.path.join(hwmon, "freq1_input"))
+        self.memory_clock = _open_attribute(labels.get("mclk") or os.path.join(hwmon, "freq2_input"))
+
+    @staticmethod
+    def _value(attribute: Optional[SysfsAttribute]) -> Optional[int]:
+        return attribute.read() if attribute else None
+
+    def read(self) -> Dict:
+        """Read the current metrics in the same shape as the other GPU providers"""
+        mem_total = self._value(self.vram_total) or 0
+        mem_used = self._value(self.vram_used) or 0
+        utilization = self._value(self.busy) or 0
+        memory_utilization = self._value(self.memory_busy)
+        temp = self._value(self.temperature)
+        power = self._value(self.power)
+        power_cap = self._value(self.power_cap)
+        graphics_clock = self._value(self.graphics_clock)
+        memory_clock = self._value(self.memory_clock)
+
+        return {
+            "model": self.model,
+            "vendor": "AMD",
+            "memoryTotal": mem_total,
+            "memoryUsed": mem_used,
+            "memoryFree": max(0, mem_total - mem_used),
+            "memoryPercent": (mem_used / mem_total * 100) if mem_total > 0 else 0,
+            "utilization": utilization,
+            "memoryUtilization": memory_utilization if memory_utilization is not None else utilization,
+            "temperature": temp / 1000.0 if temp is not None else 0,  # millidegrees C
+            "powerDraw": power / 1_000_000.0 if power is not None else None,  # microwatts
+            "powerLimit": power_cap / 1_000_000.0 if power_cap else None,
+            "temperatureLimit": self.temperature_limit,
+            "graphicsClock": graphics_clock // 1_000_000 if graphics_clock is not None else None,  # Hz
+            "memoryClock": memory_clock // 1_000_000 if memory_clock is not None else None
+        }
+
+    def close(self):
+        for attribute in (self.busy, self.memory_busy, self.vram_used, self.vram_total,
+                          self.temperature, self.power, self.power_cap, self.graphics_clock, self.memory_clock):
+            if attribute:
+                attribute.close()
+
+
+class AmdGpuSysfsReader:
+    """Discovers amdgpu devices under a (configurable) sysfs root and reads them directly"""
+
+    def __init__(self, root: str = "/"):
+        self.root = root
+        self.devices: List[AmdGpuDevice] = []
+        if not hasattr(os, "pread"):
+            return
+        try:
+            self.devices = self._discover()
+        except Exception as e:
+            logger.warning(f"amdgpu sysfs discovery failed: {e}")
+        if self.devices:
+            logger.info(f"Found {len(self.devices)} AMD GPU(s) via sysfs under {root}")
+
+    @property
+    def available(self) -> bool:
+        return bool(self.devices)
+
+    def _discover(self) -> List[AmdGpuDevice]:
+        return [AmdGpuDevice(index, card_path) for index, card_path in enumerate(find_cards(self.root))]
+
+    def read_all(self) -> List[Dict]:
+        """Read every discovered device"""
+        return [device.read() for device in self.devices]
+
+    def close(self):
+        for device in self.devices:
+            device.close()
+        self.devices = []
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Cluster aggregation hub
+Keeps a WebSocket subscription to every node's metrics server and merges their
+streams into per-node and fleet-wide views
+"""
+
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from delta_frames import MSGPACK_AVAILABLE, apply_delta, decode
+
+# The hub's node connections use the websockets client (installed with uvicorn[standard])
+try:
+    import websockets
+    WEBSOCKETS_AVAILABLE = True
+except ImportError:
+    WEBSOCKETS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Only what the views need is subscribed to, so nodes encode and send as little as possible
+NODE_GROUPS = ["cpu", "memory", "gpu"]
+# Groups that older agents do not have; dropped for a node that rejects them
+OPTIONAL_NODE_GROUPS = ["throttle"]
+# Same threshold the throttle detector uses for a GPU that is doing work
+GPU_BUSY_UTILIZATION = 50.0
+CONNECT_TIMEOUT = 5.0
+# A connected node that sends nothing for this many intervals is reconnected
+STALL_INTERVALS = 10
+# Without a frame for this many intervals a node is shown as stale and left out of the fleet totals
+STALE_INTERVALS = 3
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 30.0
+MAX_MESSAGE_BYTES = 4 * 2**20
+NODE_NAME_PATTERN = re.compile(r"^([\w.-]+)=(.+)$")
+
+
+def parse_node(spec: str) -> tuple:
+    """'name=url', 'ws://host:port', 'http://host:port' or 'host:port' -> (name, WebSocket URL)"""
+    spec = spec.strip()
+    name = None
+    match = NODE_NAME_PATTERN.match(spec)
+    if match and "://" not in match.group(1):
+        name, spec = match.group(1), match.group(2)
+    if "://" not in spec:
+        spec = f"ws://{spec}"
+    parts = urlsplit(spec)
+    scheme = {"http": "ws", "https": "wss"}.get(parts.scheme, parts.scheme)
+    path = parts.path.rstrip("/")
+    if not path.endswith("/ws/metrics"):
+        path += "/ws/metrics"
+    url = urlunsplit((scheme, parts.netloc, path, parts.query, ""))
+    return name or parts.netloc + path[:-len("/ws/metrics")], url
+
+
+def parse_nodes(value: str) -> List[tuple]:
+    """Comma- or whitespace-separated node specs (see parse_node)"""
+    return [parse_node(spec) for spec in re.split(r"[,\s]+", value) if spec.strip()]
+
+
+def summarize_node(document: Dict) -> Dict:
+    """The few numbers the fleet view needs from one node's metrics document"""
+    gpus = document.get("gpus") or []
+    utilizations = [gpu.get("utilization") or 0 for gpu in gpus]
+    powers = [gpu["powerDraw"] for gpu in gpus if gpu.get("powerDraw") is not None]
+    temperatures = [gpu["temperature"] for gpu in gpus if gpu.get("temperature")]
+    vram_total = sum(gpu.get("memoryTotal") or 0 for gpu in gpus)
+    vram_used = sum(gpu.get("memoryUsed") or 0 for gpu in gpus)
+    return {
+        "cpuUtilization": (document.get("cpu") or {}).get("utilization"),
+        "memoryPercent": (document.get("memory") or {}).get("percent"),
+        "gpus": len(gpus),
+        "gpusBusy": sum(1 for utilization in utilizations if utilization >= GPU_BUSY_UTILIZATION),
+        "utilizationMean": round(sum(utilizations) / len(utilizations), 1) if utilizations else None,
+        "vramTotal": vram_total,
+        "vramUsed": vram_used,
+        "vramFree": max(0, vram_total - vram_used),
+        "powerDraw": sum(powers) if powers else None,
+        "temperatureMax": max(temperatures) if temperatures else None,
+        "throttling": (document.get("throttle") or {}).get("throttling", 0)
+    }
+
+
+class Backoff:
+    """Exponential reconnect delay with jitter, so nodes that drop together do not reconnect together"""
+
+    def __init__(self, initial: float = BACKOFF_INITIAL, maximum: float = BACKOFF_MAX):
+        self.initial = initial
+        self.maximum = maximum
+        self.attempts = 0
+
+    def next(self) -> float:
+        delay = min(self.maximum, self.initial * 2 ** self.attempts)
+        self.attempts += 1
+        return delay * random.uniform(0.5, 1.0)
+
+    def reset(self):
+        self.attempts = 0
+
+
+class NodeConnection:
+    """One node's subscription: connects, follows key/delta frames and reconnects with backoff
+
+    Each node runs in its own task and only ever touches its own state, so a
+    slow, hung or dead node never delays the others or the fleet view.
+    """
+
+    def __init__(self, name: str, url: str, interval: float):
+        self.name = name
+        self.url = url
+        self.interval = interval
+        self.state = "connecting"
+        self.document: Optional[Dict] = None
+        self.summary: Optional[Dict] = None
+        self.dirty = False
+        self.updated_at: Optional[float] = None  # monotonic time of the last frame
+        self.connected_at: Optional[float] = None
+        self.frames = 0
+        self.reconnects = 0
+        self.error: Optional[str] = None
+        self.protocol: Optional[str] = None
+        # Narrowed (and kept across reconnects) when the node rejects a group it does not know
+        self.groups = NODE_GROUPS + OPTIONAL_NODE_GROUPS
+        # Set when the node rejects even the basic subscription; it is then followed on its default stream
+        self.subscribe_error: Optional[str] = None
+        self.backoff = Backoff()
+        self._seq: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._follow()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            if self.state == "live":
+                logger.warning(f"Lost node '{self.name}': {self.error}")
+            self.state = "down"
+            self.connected_at = None
+            self.reconnects += 1
+            await asyncio.sleep(self.backoff.next())
+            self.state = "connecting"
+
+    async def _follow(self):
+        # Offer the delta protocol (MessagePack if available); older agents answer with plain JSON
+        subprotocols = (["multiverse.delta.msgpack"] if MSGPACK_AVAILABLE else []) + ["multiverse.delta.json"]
+        async with websockets.connect(self.url, subprotocols=subprotocols, open_timeout=CONNECT_TIMEOUT,
+                                      ping_interval=max(5.0, self.interval * 5), ping_timeout=CONNECT_TIMEOUT,
+                                      close_timeout=1.0, max_size=MAX_MESSAGE_BYTES) as websocket:
+            self.protocol = websocket.subprotocol or "json"
+            self._seq = None
+            await self._subscribe(websocket)
+            stall = max(CONNECT_TIMEOUT, self.interval * STALL_INTERVALS)
+            while True:
+                try:
+                    payload = await asyncio.wait_for(websocket.recv(), stall)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"no frame for {stall:.0f}s") from None
+                if self._receive(payload):
+                    await self._subscribe(websocket)
+
+    async def _subscribe(self, websocket):
+        await websocket.send(json.dumps({"type": "subscribe", "groups": self.groups, "interval": self.interval}))
+
+    def _rejected(self, reason: str) -> bool:
+        """The node refused the subscription; returns True if a narrower one should be sent
+
+        The connection stays up either way: a node keeps streaming its previous
+        (default) subscription after an error, so there is nothing to reconnect for.
+        """
+        optional = [group for group in self.groups if group in OPTIONAL_NODE_GROUPS]
+        if optional:
+            logger.info(f"Node '{self.name}' rejected groups {', '.join(optional)} ({reason}); subscribing without them")
+            self.groups = [group for group in self.groups if group not in optional]
+            return True
+        if self.subscribe_error is None:
+            logger.warning(f"Node '{self.name}' rejected the subscription ({reason}); following its default stream")
+        self.subscribe_error = reason
+        return False
+
+    def _receive(self, payload) -> bool:
+        """Handle one message; returns True if the subscription should be sent again"""
+        message = decode(payload)
+        # Plain JSON documents have no type; everything else (delta frames, acknowledgements) does
+        kind = message.get("type")
+        if kind == "error":
+            return self._rejected(message.get("message", "no reason given"))
+        if kind == "key":
+            self.document = message["data"]
+        elif kind == "delta":
+            if self.document is None or self._seq is None or message["seq"] != self._seq + 1:
+                # Cannot happen on an ordered stream, but a wrong view is worse than a reconnect
+                raise RuntimeError(f"delta frame {message['seq']} does not follow {self._seq}")
+            apply_delta(self.document, message["set"])
+        elif kind is None:
+            self.document = message  # plain JSON: the full document every time
+        else:
+            return False  # subscribed / replay acknowledgements
+        self._seq = message.get("seq")
+        self.frames += 1
+        self.dirty = True
+        self.updated_at = time.monotonic()
+        if self.state != "live":
+            if self.reconnects:
+                logger.info(f"Node '{self.name}' is back after {self.reconnects} reconnect(s)")
+            self.state = "live"
+            self.error = None
+            self.connected_at = self.updated_at
+            self.backoff.reset()
+        return False
+
+    def view(self, now: float) -> Dict:
+        """This node's entry in the cluster view"""
+        if self.dirty:
+            self.summary = summarize_node(self.document)
+            self.dirty = False
+        age = now - self.updated_at if self.updated_at is not None else None
+        state = self.state
+        if state == "live" and age is not None and age > self.interval * STALE_INTERVALS:
+            state = "stale"
+        return {
+            "name": self.name,
+            "url": self.url,
+            "state": state,
+            "age": round(age, 3) if age is not None else None,
+            "reconnects": self.reconnects,
+            "error": self.error,
+            "subscribeError": self.subscribe_error,
+            **(self.summary or {})
+        }
+
+
+class ClusterHub:
+    """Merges the metrics streams of many nodes into one view, rebuilt once per interval
+
+    Receiving is per node (one task each); the view is assembled on a fixed
+    tick from whatever each node last sent. Per node a tick costs one summary
+    of its GPUs, and only if it sent a frame since the last tick.
+    """
+
+    def __init__(self, nodes: List[tuple], interval: float = 1.0):
+        if not WEBSOCKETS_AVAILABLE:
+            raise RuntimeError("Hub mode needs the 'websockets' package (pip install websockets)")
+        self.interval = interval
+        self.nodes: Dict[str, NodeConnection] = {}
+        for name, url in nodes:
+            if name in self.nodes:
+                raise ValueError(f"Duplicate node name '{name}'")
+            self.nodes[name] = NodeConnection(name, url, interval)
+        self.view: Dict = self._build(time.monotonic())
+        self.build_seconds = 0.0
+        # Called after every rebuild, e.g. to tell the scheduler the snapshot changed
+        self.on_update: Optional[Callable[[], None]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        logger.info(f"Hub mode: following {len(self.nodes)} node(s)")
+        for node in self.nodes.values():
+            node.start()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await asyncio.gather(*(node.stop() for node in self.nodes.values()))
+
+    async def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            started = time.monotonic()
+            try:
+                self.view = self._build(started)
+                if self.on_update:
+                    self.on_update()
+            except Exception as e:
+                logger.error(f"Error building the cluster view: {e}")
+            self.build_seconds = time.monotonic() - started
+            next_tick += self.interval
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+
+    def _build(self, now: float) -> Dict:
+        views = [node.view(now) for node in self.nodes.values()]
+        live = [view for view in views if view["state"] == "live" and "gpus" in view]
+        powers = [view["powerDraw"] for view in live if view["powerDraw"] is not None]
+        gpus = sum(view["gpus"] for view in live)
+        vram_total = sum(view["vramTotal"] for view in live)
+        vram_used = sum(view["vramUsed"] for view in live)
+        utilization_sum = sum(view["utilizationMean"] * view["gpus"] for view in live if view["utilizationMean"] is not None)
+        return {
+            "fleet": {
+                "nodes": len(views),
+                "nodesLive": len(live),
+                "nodesDown": sum(1 for view in views if view["state"] in ("down", "connecting")),
+                "gpus": gpus,
+                "gpusBusy": sum(view["gpusBusy"] for view in live),
+                "utilizationMean": round(utilization_sum / gpus, 1) if gpus else None,
+                "vramTotal": vram_total,
+                "vramUsed": vram_used,
+                "vramFree": max(0, vram_total - vram_used),
+                "powerDraw": round(sum(powers), 1) if powers else None,
+                "throttling": sum(view["throttling"] for view in live)
+            },
+            "nodes": views
+        }
+
+    def summary(self) -> Dict:
+        """The latest view (a scheduler extra; rebuilt by the hub's own tick, not per snapshot)"""
+        return self.view
+
+    def node(self, name: str) -> Optional[Dict]:
+        """The latest full document a node sent, with its entry in the view"""
+        node = self.nodes.get(name)
+        if node is None:
+            return None
+        return {**node.view(time.monotonic()), "metrics": node.document}
+
+    def status(self) -> Dict:
+        states: Dict[str, int] = {}
+        for node in self.nodes.values():
+            states[node.state] = states.get(node.state, 0) + 1
+        return {
+            "nodes": len(self.nodes),
+            "states": states,
+            "interval": self.interval,
+            "buildMs": round(self.build_seconds * 1000, 3),
+            "frames": sum(node.frames for node in self.nodes.values())
+        }
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Metrics frames for the WebSocket stream
+Plain JSON for existing clients, plus an opt-in keyframe + delta protocol
+"""
+
+import json
+from typing import Dict, List, Optional, Union
+
+# Try to import MessagePack for the binary encoding
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+# Every client that skips a frame or joins mid-stream gets a keyframe anyway;
+# the periodic one just bounds how long a confused client can drift
+KEYFRAME_INTERVAL = 60
+
+
+class Codec:
+    """A delta-protocol encoding, selected through the WebSocket subprotocol"""
+
+    def __init__(self, subprotocol: str, binary: bool):
+        self.subprotocol = subprotocol
+        self.binary = binary
+
+    def encode(self, message: Dict) -> Union[str, bytes]:
+        if self.binary:
+            return msgpack.packb(message, use_bin_type=True)
+        return json.dumps(message, separators=(",", ":"))
+
+
+CODECS = {
+    "multiverse.delta.msgpack": Codec("multiverse.delta.msgpack", binary=True),
+    "multiverse.delta.json": Codec("multiverse.delta.json", binary=False),
+}
+
+
+def decode(payload: Union[str, bytes]) -> Dict:
+    """Decode one message of either delta encoding (binary frames are MessagePack)"""
+    if isinstance(payload, bytes):
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+
+def negotiate(requested: List[str]) -> Optional[Codec]:
+    """Pick the first supported subprotocol the client offered (None means plain JSON)"""
+    for subprotocol in requested:
+        codec = CODECS.get(subprotocol)
+        if codec and (MSGPACK_AVAILABLE or not codec.binary):
+            return codec
+    return None
+
+
+def flatten(document, prefix: str = "", out: Optional[Dict] = None) -> Dict:
+    """Flatten nested dicts/lists into {'cpu.utilization': 12.5, 'gpus.0.model': ...}"""
+    if out is None:
+        out = {}
+    items = document.items() if isinstance(document, dict) else enumerate(document)
+    for key, value in items:
+        path = f"{prefix}{key}"
+        if isinstance(value, (dict, list)) and value:
+            flatten(value, path + ".", out)
+        else:
+            out[path] = value
+    return out
+
+
+def apply_delta(document: Dict, changes: Dict):
+    """Apply a delta frame's 'set' to a document rebuilt from the last keyframe (the inverse of flatten)"""
+    for path, value in changes.items():
+        *parents, last = path.split(".")
+        node = document
+        for key in parents:
+            node = node[int(key)] if isinstance(node, list) else node[key]
+        if isinstance(node, list):
+            node[int(last)] = value
+        else:
+            node[last] = value
+
+
+class Frame:
+    """One sampled metrics document; each encoding is built at most once and shared by all clients"""
+
+    def __init__(self, seq: int, timestamp: float, metrics: Dict, previous: Optional["Frame"] = None):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.metrics = metrics
+        self._previous_flat = previous.flat if previous else None
+        self._flat: Optional[Dict] = None
+        self._changes: Optional[Dict] = None
+        self._json: Optional[str] = None
+        self._encoded: Dict = {}
+
+    @property
+    def flat(self) -> Dict:
+        if self._flat is None:
+            # The ISO timestamp string is replaced by the numeric 'ts' field in the delta protocol
+            self._flat = flatten({k: v for k, v in self.metrics.items() if k != "timestamp"})
+        return self._flat
+
+    def json(self) -> str:
+        """The full document for plain JSON clients"""
+        if self._json is None:
+            self._json = json.dumps(self.metrics, separators=(",", ":"))
+        return self._json
+
+    def _delta(self) -> Optional[Dict]:
+        """Changed leaves since the previous frame, or None if the document's shape changed"""
+        previous = self._previous_flat
+        if previous is None or previous.keys() != self.flat.keys():
+            return None
+        if self._changes is None:
+            self._changes = {path: value for path, value in self.flat.items() if previous[path] != value}
+        return self._changes
+
+    def encode(self, codec: Codec, last_seq: Optional[int]) -> Union[str, bytes]:
+        """Encode a delta if the client saw the previous frame, otherwise a keyframe"""
+        wants_delta = last_seq is not None and last_seq == self.seq - 1 and self.seq % KEYFRAME_INTERVAL != 0
+        kind = "delta" if wants_delta and self._delta() is not None else "key"
+        cache_key = (codec.subprotocol, kind)
+        if cache_key not in self._encoded:
+            ts = round(self.timestamp * 1000)
+            if kind == "delta":
+                message = {"type": "delta", "seq": self.seq, "ts": ts, "set": self._delta()}
+            else:
+                message = {"type": "key", "seq": self.seq, "ts": ts,
+                           "data": {k: v for k, v in self.metrics.items() if k != "timestamp"}}
+            self._encoded[cache_key] = codec.encode(message)
+        return self._encoded[cache_key]
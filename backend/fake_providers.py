@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Recorded-fixture hardware providers
+Replay captured NVML responses, rocm-smi output and amdgpu sysfs snapshots so that
+MetricsCollector can be exercised and benchmarked on machines without the hardware
+"""
+
+import glob
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from amdgpu_sysfs import find_cards
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# The rocm-smi invocations MetricsCollector makes (JSON first, text as the fallback)
+ROCM_SMI_JSON_ARGS = ["rocm-smi", "--showid", "--showproductname", "--showmemuse", "--showtemp", "--showuse", "--json"]
+ROCM_SMI_TEXT_ARGS = ["rocm-smi", "-i", "0", "-d"]
+
+# amdgpu device attributes read by AmdGpuSysfsReader and gpu_inventory, relative to card*/device
+SYSFS_DEVICE_FILES = (
+    "vendor", "device", "product_name", "unique_id", "numa_node", "local_cpulist",
+    "current_link_speed", "current_link_width", "xgmi_hive_info/xgmi_hive_id",
+    "gpu_busy_percent", "mem_busy_percent", "mem_info_vram_used", "mem_info_vram_total",
+)
+SYSFS_HWMON_PATTERNS = ("*_label", "*_input", "*_average", "*_cap", "*_crit")
+# Attributes the driver regenerates on every read; only these change between recorded samples
+SYSFS_LIVE_SUFFIXES = ("_busy_percent", "vram_used", "_input", "_average", "_cap")
+
+
+def load_fixture(name: str, directory: str = FIXTURE_DIR) -> Dict:
+    """A fixture by name (e.g. "nvml-h100-sxm") from the fixture directory, or from a path"""
+    path = name if os.path.sep in name or name.endswith(".json") else os.path.join(directory, f"{name}.json")
+    with open(path) as f:
+        return json.load(f)
+
+
+def list_fixtures(kind: str, directory: str = FIXTURE_DIR) -> List[str]:
+    """Names of the fixtures of one kind ("nvml", "rocm-smi" or "sysfs") in a directory"""
+    return sorted(os.path.basename(path)[:-len(".json")]
+                  for path in glob.glob(os.path.join(directory, f"{kind}-*.json")))
+
+
+def fake_inventory(nvidia: bool = False, rocm_smi: bool = False, driver_version: Optional[str] = None) -> Dict:
+    """The parts of a gpu_inventory document MetricsCollector looks at"""
+    return {
+        "gpus": [],
+        "topology": {},
+        "nvidia": {"available": nvidia, "error": None, "driverVersion": driver_version},
+        "amd": {"available": False, "rocmSmi": {"available": rocm_smi, "path": None, "version": None}},
+        "cached": True
+    }
+
+
+class NVMLError(Exception):
+    """Raised like pynvml.NVMLError for queries the recorded device did not support"""
+
+
+class FakeNvml:
+    """Stands in for the pynvml module, answering from a recorded fixture
+
+    Each device replays its recorded samples in order and wraps around. A device
+    moves to its next sample when its utilization is read, which MetricsCollector
+    does once per device per tick. Fixture flags reproduce older pynvml releases:
+    ``nameBytes`` returns names as bytes and ``legacyThrottleReasons`` only offers
+    nvmlDeviceGetCurrentClocksThrottleReasons. A null sample value means the query
+    raises NVMLError (not supported on that device).
+    """
+
+    NVML_TEMPERATURE_GPU = 0
+    NVML_TEMPERATURE_THRESHOLD_SLOWDOWN = 1
+    NVML_CLOCK_GRAPHICS = 0
+    NVML_CLOCK_MEM = 2
+    NVMLError = NVMLError
+
+    def __init__(self, fixture: Dict):
+        self.fixture = fixture
+        self.devices: List[Dict] = fixture["devices"]
+        self.cursors = [0] * len(self.devices)
+        self.calls = 0
+        # Renamed from "throttle reasons" to "clock event reasons" in newer NVML
+        if fixture.get("legacyThrottleReasons"):
+            self.nvmlDeviceGetCurrentClocksThrottleReasons = self._throttle_reasons
+        else:
+            self.nvmlDeviceGetCurrentClocksEventReasons = self._throttle_reasons
+
+    def _sample(self, handle: int) -> Dict:
+        samples = self.devices[handle]["samples"]
+        return samples[self.cursors[handle] % len(samples)]
+
+    def _value(self, handle: int, key: str):
+        self.calls += 1
+        value = self._sample(handle).get(key)
+        if value is None:
+            raise NVMLError("Not Supported")
+        return value
+
+    def _static(self, handle: int, key: str):
+        self.calls += 1
+        value = self.devices[handle].get(key)
+        if value is None:
+            raise NVMLError("Not Supported")
+        return value
+
+    def nvmlInit(self):
+        self.calls += 1
+
+    def nvmlShutdown(self):
+        self.calls += 1
+
+    def nvmlSystemGetDriverVersion(self):
+        return self.fixture.get("driverVersion", "")
+
+    def nvmlDeviceGetCount(self) -> int:
+        self.calls += 1
+        return len(self.devices)
+
+    def nvmlDeviceGetHandleByIndex(self, index: int) -> int:
+        self.calls += 1
+        if index >= len(self.devices):
+            raise NVMLError("Invalid Argument")
+        return index
+
+    def nvmlDeviceGetName(self, handle: int):
+        name = self._static(handle, "name")
+        return name.encode("utf-8") if self.fixture.get("nameBytes") else name
+
+    def nvmlDeviceGetMemoryInfo(self, handle: int):
+        total = self._static(handle, "memoryTotal")
+        used = self._value(handle, "memoryUsed")
+        return SimpleNamespace(total=total, used=used, free=total - used)
+
+    def nvmlDeviceGetUtilizationRates(self, handle: int):
+        sample = self._sample(handle)
+        self.cursors[handle] += 1
+        self.calls += 1
+        return SimpleNamespace(gpu=sample["utilization"], memory=sample["memoryUtilization"])
+
+    def nvmlDeviceGetTemperature(self, handle: int, sensor: int) -> int:
+        return self._value(handle, "temperature")
+
+    def nvmlDeviceGetTemperatureThreshold(self, handle: int, threshold: int) -> int:
+        return self._static(handle, "slowdownTemperature")
+
+    def nvmlDeviceGetPowerUsage(self, handle: int) -> int:
+        return self._value(handle, "powerMilliwatts")
+
+    def nvmlDeviceGetEnforcedPowerLimit(self, handle: int) -> int:
+        return self._static(handle, "powerLimitMilliwatts")
+
+    def nvmlDeviceGetClockInfo(self, handle: int, clock: int) -> int:
+        return self._value(handle, "graphicsClock" if clock == self.NVML_CLOCK_GRAPHICS else "memoryClock")
+
+    def _throttle_reasons(self, handle: int) -> int:
+        return self._value(handle, "throttleReasons")
+
+
+class FakeRocmSmi:
+    """Stands in for subprocess.run, answering rocm-smi invocations with recorded output
+
+    ``json`` holds one recorded ``--json`` output per tick (replayed in order, wrapping
+    around); an entry may be a string for output that is not valid JSON. ``text`` is
+    the recorded ``rocm-smi -i 0 -d`` output used by the text fallback.
+    """
+
+    def __init__(self, fixture: Dict):
+        self.fixture = fixture
+        # Serialized once, so replay costs what reading the real command's stdout would
+        self.json_outputs = [output if isinstance(output, str) else json.dumps(output)
+                             for output in fixture.get("json", [])]
+        self.text_output = fixture.get("text")
+        self.calls = 0
+        self._next = 0
+
+    def __call__(self, args, capture_output: bool = False, text: bool = False, timeout: Optional[float] = None, **kwargs):
+        if not args or args[0] != "rocm-smi":
+            raise FileNotFoundError(args[0] if args else "")
+        self.calls += 1
+        if "--json" in args:
+            if not self.json_outputs:
+                return subprocess.CompletedProcess(args, 1, "", "no recorded output")
+            stdout = self.json_outputs[self._next % len(self.json_outputs)]
+            self._next += 1
+            return subprocess.CompletedProcess(args, 0, stdout, "")
+        if self.text_output is None:
+            return subprocess.CompletedProcess(args, 1, "", "no recorded output")
+        return subprocess.CompletedProcess(args, 0, self.text_output, "")
+
+
+class FakeSysfs:
+    """An amdgpu sysfs snapshot materialized under a temporary root
+
+    Cards are laid out like the kernel does it: sys/class/drm/cardN/device is a
+    symlink to the PCI device directory, with hwmon below it. The first recorded
+    sample is written up front and advance() rewrites the live attributes with the
+    next one, which AmdGpuSysfsReader picks up through its open file descriptors
+    exactly as it would on real hardware.
+    """
+
+    def __init__(self, snapshot: Dict, root: Optional[str] = None):
+        self.snapshot = snapshot
+        self.root = root or tempfile.mkdtemp(prefix="multiverse-sysfs-")
+        self._owns_root = root is None
+        self._next = 0
+        for card in snapshot["cards"]:
+            device = os.path.join(self.root, "sys", "bus", "pci", "devices", card["pciBus"])
+            for relative, value in card["files"].items():
+                self._write(os.path.join(device, relative), value)
+            drm = os.path.join(self.root, "sys", "class", "drm", card["card"])
+            os.makedirs(drm, exist_ok=True)
+            os.symlink(os.path.relpath(device, drm), os.path.join(drm, "device"))
+            # Connector entries sit next to the cards and must be skipped by discovery
+            for connector in card.get("connectors", ()):
+                os.makedirs(os.path.join(self.root, "sys", "class", "drm", f"{card['card']}-{connector}"), exist_ok=True)
+        self.advance()
+
+    @staticmethod
+    def _write(path: str, value: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(f"{value}\n")
+
+    def advance(self):
+        """Write the next recorded sample of every card's live attributes"""
+        for card in self.snapshot["cards"]:
+            samples = card.get("samples")
+            if not samples:
+                continue
+            device = os.path.join(self.root, "sys", "bus", "pci", "devices", card["pciBus"])
+            for relative, value in samples[self._next % len(samples)].items():
+                self._write(os.path.join(device, relative), value)
+        self._next += 1
+
+    def close(self):
+        if self._owns_root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+
+def capture_nvml(samples: int = 10, interval: float = 1.0) -> Dict:
+    """Record this machine's NVIDIA GPUs as an NVML fixture"""
+    import pynvml
+    pynvml.nvmlInit()
+    try:
+        def query(function, *args):
+            try:
+                return function(*args)
+            except Exception:
+                return None
+
+        reasons = (getattr(pynvml, "nvmlDeviceGetCurrentClocksEventReasons", None)
+                   or getattr(pynvml, "nvmlDeviceGetCurrentClocksThrottleReasons"))
+        handles = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(pynvml.nvmlDeviceGetCount())]
+        names = [pynvml.nvmlDeviceGetName(handle) for handle in handles]
+        devices = []
+        for handle, name in zip(handles, names):
+            devices.append({
+                "name": name.decode("utf-8") if isinstance(name, bytes) else name,
+                "memoryTotal": pynvml.nvmlDeviceGetMemoryInfo(handle).total,
+                "powerLimitMilliwatts": query(pynvml.nvmlDeviceGetEnforcedPowerLimit, handle),
+                "slowdownTemperature": query(pynvml.nvmlDeviceGetTemperatureThreshold, handle,
+                                             pynvml.NVML_TEMPERATURE_THRESHOLD_SLOWDOWN),
+                "samples": []
+            })
+        for tick in range(samples):
+            for handle, device in zip(handles, devices):
+                utilization = pynvml.nvmlDeviceGetUtilizationRates(handle)
+                device["samples"].append({
+                    "utilization": utilization.gpu,
+                    "memoryUtilization": utilization.memory,
+                    "memoryUsed": pynvml.nvmlDeviceGetMemoryInfo(handle).used,
+                    "temperature": query(pynvml.nvmlDeviceGetTemperature, handle, pynvml.NVML_TEMPERATURE_GPU),
+                    "powerMilliwatts": query(pynvml.nvmlDeviceGetPowerUsage, handle),
+                    "graphicsClock": query(pynvml.nvmlDeviceGetClockInfo, handle, pynvml.NVML_CLOCK_GRAPHICS),
+                    "memoryClock": query(pynvml.nvmlDeviceGetClockInfo, handle, pynvml.NVML_CLOCK_MEM),
+                    "throttleReasons": query(reasons, handle)
+                })
+            if tick < samples - 1:
+                time.sleep(interval)
+        driver_version = pynvml.nvmlSystemGetDriverVersion()
+        return {
+            "description": f"Captured on {os.uname().nodename if hasattr(os, 'uname') else 'unknown host'}",
+            "driverVersion": driver_version.decode("utf-8") if isinstance(driver_version, bytes) else driver_version,
+            "nameBytes": any(isinstance(name, bytes) for name in names),
+            "legacyThrottleReasons": not hasattr(pynvml, "nvmlDeviceGetCurrentClocksEventReasons"),
+            "devices": devices
+        }
+    finally:
+        pynvml.nvmlShutdown()
+
+
+def capture_rocm_smi(samples: int = 10, interval: float = 1.0) -> Dict:
+    """Record this machine's rocm-smi output as a rocm-smi fixture"""
+    outputs = []
+    for tick in range(samples):
+        result = subprocess.run(ROCM_SMI_JSON_ARGS, capture_output=True, text=True, timeout=5)
+        try:
+            outputs.append(json.loads(result.stdout))
+        except json.JSONDecodeError:
+            outputs.append(result.stdout)
+        if tick < samples - 1:
+            time.sleep(interval)
+    text = subprocess.run(ROCM_SMI_TEXT_ARGS, capture_output=True, text=True, timeout=5)
+    return {"json": outputs, "text": text.stdout if text.returncode == 0 else None}
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _read_all(directory: str, relatives: List[str]) -> Dict[str, str]:
+    """Attribute values by relative path, leaving out the ones that cannot be read (e.g. root-only)"""
+    values = {relative: _read(os.path.join(directory, relative)) for relative in relatives}
+    return {relative: value for relative, value in values.items() if value is not None}
+
+
+def capture_sysfs(root: str = "/", samples: int = 10, interval: float = 1.0) -> Dict:
+    """Record the amdgpu cards under a sysfs root as a sysfs fixture"""
+    cards = []
+    for card_path in find_cards(root):
+        name = os.path.basename(card_path)
+        device = os.path.join(card_path, "device")
+        relatives = [relative for relative in SYSFS_DEVICE_FILES if os.path.exists(os.path.join(device, relative))]
+        for pattern in SYSFS_HWMON_PATTERNS:
+            relatives += [os.path.relpath(path, device)
+                          for path in sorted(glob.glob(os.path.join(device, "hwmon", "hwmon*", pattern)))]
+        connectors = [os.path.basename(path)[len(name) + 1:]
+                      for path in sorted(glob.glob(os.path.join(root, "sys", "class", "drm", f"{name}-*")))]
+        cards.append({
+            "card": name,
+            "pciBus": os.path.basename(os.path.realpath(device)),
+            "connectors": connectors,
+            "files": _read_all(device, relatives),
+            "live": [relative for relative in relatives if relative.endswith(SYSFS_LIVE_SUFFIXES)],
+            "samples": []
+        })
+    for tick in range(samples):
+        for card in cards:
+            device = os.path.join(root, "sys", "class", "drm", card["card"], "device")
+            card["samples"].append(_read_all(device, card["live"]))
+        if tick < samples - 1:
+            time.sleep(interval)
+    for card in cards:
+        del card["live"]
+    return {"cards": cards}
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Per-generation hardware timelines and energy accounting
+Integrates sampled GPU power over each generation's exact start/end window
+"""
+
+import bisect
+import itertools
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_TRACE_SECONDS = 3600.0
+RESOLVE_GRACE = 10.0
+MAX_OPEN_GENERATIONS = 256
+
+# Common quantization markers in GGUF / HF model names (Q4_K_M, IQ3_XS, q8_0, fp16, AWQ, GPTQ, ...)
+QUANTIZATION_PATTERN = re.compile(
+    r"(?<![a-z0-9])(i?q\d(?:_[a-z0-9]+)*|f(?:p)?16|bf16|f(?:p)?32|fp8|int[48]|awq|gptq|exl2|mlx-?\d+bit|\d+bit)(?![a-z0-9])",
+    re.IGNORECASE
+)
+
+# (timestamp, per-GPU (powerDraw, utilization, graphicsClock))
+Sample = Tuple[float, Tuple[Tuple[Optional[float], Optional[float], Optional[float]], ...]]
+
+
+def parse_quantization(model: Optional[str]) -> Optional[str]:
+    """Best-effort quantization tag from a model name, e.g. 'llama-3-8b-instruct-Q4_K_M' -> 'Q4_K_M'"""
+    if not model:
+        return None
+    match = QUANTIZATION_PATTERN.search(model.replace(".gguf", ""))
+    return match.group(1).upper() if match else None
+
+
+class PowerTrace:
+    """Time-ordered GPU samples at collection resolution, kept for a bounded window"""
+
+    def __init__(self, seconds: float = DEFAULT_TRACE_SECONDS):
+        self.seconds = seconds
+        self.timestamps: List[float] = []
+        self.samples: List[Sample] = []
+
+    def record(self, gpus: Sequence[Dict], timestamp: Optional[float] = None):
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.timestamps and timestamp <= self.timestamps[-1]:
+            return
+        self.timestamps.append(timestamp)
+        self.samples.append((timestamp, tuple(
+            (gpu.get("powerDraw"), gpu.get("utilization"), gpu.get("graphicsClock")) for gpu in gpus
+        )))
+        # Trim in batches so appends stay O(1) amortized
+        cutoff = timestamp - self.seconds
+        if self.timestamps[0] < cutoff and len(self.timestamps) % 256 == 0:
+            drop = bisect.bisect_left(self.timestamps, cutoff)
+            del self.timestamps[:drop]
+            del self.samples[:drop]
+
+    @property
+    def latest(self) -> Optional[float]:
+        return self.timestamps[-1] if self.timestamps else None
+
+    @staticmethod
+    def _select(sample: Sample, field: int, gpus: Optional[Iterable[int]]):
+        values = sample[1]
+        indices = range(len(values)) if gpus is None else [i for i in gpus if i < len(values)]
+        return [values[i][field] for i in indices if values[i][field] is not None]
+
+    def _power(self, sample: Sample, gpus) -> Optional[float]:
+        values = self._select(sample, 0, gpus)
+        return sum(values) if values else None
+
+    def integrate(self, start: float, end: float, gpus: Optional[Sequence[int]] = None) -> Dict:
+        """Energy over [start, end] by trapezoidal integration of summed GPU power
+
+        The series is linearly interpolated at both window edges, so a window
+        shorter than the sampling period still gets a sensible estimate.
+        """
+        result = {"samples": 0, "energyJ": None, "avgPowerW": None, "peakPowerW": None,
+                  "avgUtilization": None, "avgGraphicsClock": None}
+        if end <= start or not self.timestamps:
+            return result
+        lo = bisect.bisect_left(self.timestamps, start)
+        hi = bisect.bisect_right(self.timestamps, end)
+        inside = [s for s in self.samples[lo:hi] if self._power(s, gpus) is not None]
+        before = self.samples[lo - 1] if lo > 0 else None
+        after = self.samples[hi] if hi < len(self.samples) else None
+        if before is not None and self._power(before, gpus) is None:
+            before = None
+        if after is not None and self._power(after, gpus) is None:
+            after = None
+
+        points = [(s[0], self._power(s, gpus)) for s in inside]
+        if before is None and not inside:
+            # The trace does not reach back to this window
+            return result
+        series = [(s[0], self._power(s, gpus)) for s in [before] + inside + [after] if s is not None]
+        # Edge values: interpolate between the samples either side, or hold the nearest one
+        points = [(start, self._edge(series, start))] + points + [(end, self._edge(series, end))]
+
+        energy = sum((t1 - t0) * (p0 + p1) / 2 for (t0, p0), (t1, p1) in zip(points, points[1:]))
+        utilization = [v for s in inside for v in self._select(s, 1, gpus)]
+        clocks = [v for s in inside for v in self._select(s, 2, gpus)]
+        result.update({
+            "samples": len(inside),
+            "energyJ": energy,
+            "avgPowerW": energy / (end - start),
+            "peakPowerW": max(p for _, p in points),
+            "avgUtilization": sum(utilization) / len(utilization) if utilization else None,
+            "avgGraphicsClock": sum(clocks) / len(clocks) if clocks else None
+        })
+        return result
+
+    @staticmethod
+    def _edge(points: List[Tuple[float, float]], at: float) -> float:
+        index = bisect.bisect_left([t for t, _ in points], at)
+        if index == 0:
+            return points[0][1]
+        if index >= len(points):
+            return points[-1][1]
+        (t0, p0), (t1, p1) = points[index - 1], points[index]
+        return p0 + (p1 - p0) * (at - t0) / (t1 - t0) if t1 > t0 else p1
+
+
+class GenerationLedger:
+    """Generations tagged with wall-clock windows, each resolved against the power trace"""
+
+    def __init__(self, trace: PowerTrace, keep: int = 1000, max_open: int = MAX_OPEN_GENERATIONS,
+                 max_open_seconds: Optional[float] = None):
+        self.trace = trace
+        self.records: Deque[Dict] = deque(maxlen=keep)
+        self.open: Dict[int, Dict] = {}
+        self.max_open = max_open
+        # A generation never ended (e.g. its client crashed) is dropped once the trace no longer covers its start
+        self.max_open_seconds = trace.seconds if max_open_seconds is None else max_open_seconds
+        self.expired = 0
+        self._ids = itertools.count(1)
+
+    def start(self, started_at: Optional[float] = None, **fields) -> Dict:
+        """Open a generation whose end will be reported later"""
+        record = self._new(started_at or time.time(), None, **fields)
+        self.expire_open()
+        while len(self.open) >= self.max_open:
+            # Oldest first: dicts keep insertion order
+            del self.open[next(iter(self.open))]
+            self.expired += 1
+        self.open[record["id"]] = record
+        return record
+
+    def expire_open(self, now: Optional[float] = None):
+        """Drop open generations older than max_open_seconds"""
+        cutoff = (now or time.time()) - self.max_open_seconds
+        for generation_id in [i for i, record in self.open.items() if record["startedAt"] < cutoff]:
+            del self.open[generation_id]
+            self.expired += 1
+
+    def open_until(self) -> Optional[float]:
+        """When the most recently started open generation will expire (None when none are open)"""
+        if not self.open:
+            return None
+        return max(record["startedAt"] for record in self.open.values()) + self.max_open_seconds
+
+    def end(self, generation_id: int, ended_at: Optional[float] = None, completion_tokens: Optional[int] = None,
+            prompt_tokens: Optional[int] = None) -> Optional[Dict]:
+        record = self.open.pop(generation_id, None)
+        if record is None:
+            return None
+        if completion_tokens is not None:
+            record["completionTokens"] = completion_tokens
+        if prompt_tokens is not None:
+            record["promptTokens"] = prompt_tokens
+        record["endedAt"] = ended_at or time.time()
+        self.records.append(record)
+        return record
+
+    def tag(self, started_at: float, ended_at: float, **fields) -> Dict:
+        """Record a generation whose window is already known"""
+        record = self._new(started_at, ended_at, **fields)
+        self.records.append(record)
+        return record
+
+    def _new(self, started_at: float, ended_at: Optional[float], model: Optional[str] = None,
+             quantization: Optional[str] = None, completion_tokens: Optional[int] = None,
+             prompt_tokens: Optional[int] = None, gpus: Optional[List[int]] = None,
+             source: str = "client", label: Optional[str] = None) -> Dict:
+        return {
+            "id": next(self._ids),
+            "source": source,
+            "label": label,
+            "model": model,
+            "quantization": quantization or parse_quantization(model),
+            "startedAt": started_at,
+            "endedAt": ended_at,
+            "completionTokens": completion_tokens,
+            "promptTokens": prompt_tokens,
+            "gpus": gpus,
+            "energy": None
+        }
+
+    def resolve(self, record: Dict) -> Dict:
+        """Fill in the energy figures once the trace covers the whole window (computed only once)"""
+        if record["energy"] is None and record["endedAt"] is not None:
+            latest = self.trace.latest
+            # Wait for a sample past the end, unless sampling has stopped and none is coming
+            if latest is not None and (latest >= record["endedAt"] or time.time() - record["endedAt"] > RESOLVE_GRACE):
+                record["energy"] = self.trace.integrate(record["startedAt"], record["endedAt"], record["gpus"])
+        energy = record["energy"] or {}
+        joules = energy.get("energyJ")
+        tokens = record["completionTokens"]
+        duration = record["endedAt"] - record["startedAt"] if record["endedAt"] else None
+        return {
+            **record,
+            "pending": record["endedAt"] is not None and record["energy"] is None,
+            "durationS": duration,
+            "tokensPerSecond": tokens / duration if tokens and duration else None,
+            "tokensPerJoule": tokens / joules if tokens and joules else None,
+            "joulesPerToken": joules / tokens if tokens and joules else None
+        }
+
+    def query(self, model: Optional[str] = None, quantization: Optional[str] = None,
+              since: Optional[float] = None, limit: int = 100) -> List[Dict]:
+        matches = [
+            r for r in self.records
+            if (model is None or r["model"] == model)
+            and (quantization is None or (r["quantization"] or "").lower() == quantization.lower())
+            and (since is None or r["startedAt"] >= since)
+        ]
+        return [self.resolve(r) for r in matches[-limit:]] if limit > 0 else []
+
+    def by_model(self, since: Optional[float] = None) -> List[Dict]:
+        """Efficiency per (model, quantization): total tokens over total joules, not a mean of ratios"""
+        groups: Dict[Tuple, Dict] = {}
+        for record in self.records:
+            if since is not None and record["startedAt"] < since:
+                continue
+            resolved = self.resolve(record)
+            energy = resolved["energy"] or {}
+            if not energy.get("energyJ") or not resolved["completionTokens"]:
+                continue
+            group = groups.setdefault((record["model"], record["quantization"]), {
+                "model": record["model"], "quantization": record["quantization"],
+                "generations": 0, "completionTokens": 0, "energyJ": 0.0, "durationS": 0.0
+            })
+            group["generations"] += 1
+            group["completionTokens"] += resolved["completionTokens"]
+            group["energyJ"] += energy["energyJ"]
+            group["durationS"] += resolved["durationS"]
+        for group in groups.values():
+            group["avgPowerW"] = group["energyJ"] / group["durationS"] if group["durationS"] else None
+            group["tokensPerJoule"] = group["completionTokens"] / group["energyJ"]
+            group["tokensPerSecond"] = group["completionTokens"] / group["durationS"] if group["durationS"] else None
+        return sorted(groups.values(), key=lambda g: g["tokensPerJoule"], reverse=True)
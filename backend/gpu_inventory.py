@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+GPU inventory and topology cache
+Probes every GPU once (in parallel), matches it against the spec table in gpu_specs.json
+and persists the result until the next reboot or driver change
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from amdgpu_sysfs import _read_text, find_cards
+
+logger = logging.getLogger(__name__)
+
+# Bump when the shape of the inventory changes so old cache files are ignored
+SCHEMA_VERSION = 1
+
+SPECS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gpu_specs.json")
+
+_specs: Optional[List[Dict]] = None
+
+
+def load_specs() -> List[Dict]:
+    """The static spec table, read once per process"""
+    global _specs
+    if _specs is None:
+        try:
+            with open(SPECS_PATH) as f:
+                _specs = json.load(f)["gpus"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load GPU spec table {SPECS_PATH}: {e}")
+            _specs = []
+    return _specs
+
+
+def match_spec(model: Optional[str], pci_device_id: Optional[str] = None) -> Optional[Dict]:
+    """First spec entry whose PCI device ID or model substring matches"""
+    specs = load_specs()
+    if pci_device_id:
+        device_id = pci_device_id.lower()
+        for spec in specs:
+            if device_id in spec.get("pciDeviceIds", ()):
+                return spec
+    name = (model or "").upper()
+    for spec in specs:
+        if any(pattern.upper() in name for pattern in spec.get("match", ())):
+            return spec
+    return None
+
+
+def default_cache_path() -> str:
+    if os.environ.get("MULTIVERSE_INVENTORY_CACHE"):
+        return os.environ["MULTIVERSE_INVENTORY_CACHE"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "multiverse", "gpu-inventory.json")
+
+
+def _read_int(path: str) -> Optional[int]:
+    text = _read_text(path)
+    try:
+        return int(text, 0) if text is not None else None
+    except ValueError:
+        return None
+
+
+def cache_key(root: str = "/") -> Dict:
+    """Everything that can change the inventory without the cache noticing otherwise
+
+    A reboot can add or remove devices and a driver upgrade can change what
+    they report, so the boot ID and driver versions invalidate the cache.
+    """
+    return {
+        "schema": SCHEMA_VERSION,
+        "sysfsRoot": os.path.abspath(root),
+        "bootId": _read_text(os.path.join(root, "proc", "sys", "kernel", "random", "boot_id")),
+        "kernel": os.uname().release if hasattr(os, "uname") else None,
+        "amdgpuVersion": _read_text(os.path.join(root, "sys", "module", "amdgpu", "version")),
+        "nvidiaVersion": _read_text(os.path.join(root, "sys", "module", "nvidia", "version"))
+    }
+
+
+def _probe_amd_card(card_path: str) -> Dict:
+    device = os.path.join(card_path, "device")
+    model = _read_text(os.path.join(device, "product_name")) or "AMD GPU"
+    pci_device_id = _read_text(os.path.join(device, "device"))
+    vram_total = _read_int(os.path.join(device, "mem_info_vram_total"))
+    numa_node = _read_int(os.path.join(device, "numa_node"))
+    spec = match_spec(model, pci_device_id)
+    return {
+        "vendor": "AMD",
+        "model": model,
+        "pciBus": os.path.basename(os.path.realpath(device)),
+        "pciDeviceId": pci_device_id,
+        "numaNode": numa_node if numa_node is not None and numa_node >= 0 else None,
+        "localCpus": _read_text(os.path.join(device, "local_cpulist")),
+        "memoryTotal": vram_total,
+        "uniqueId": _read_text(os.path.join(device, "unique_id")),
+        "xgmiHiveId": _read_text(os.path.join(device, "xgmi_hive_info", "xgmi_hive_id")),
+        "pcieLink": {
+            "speed": _read_text(os.path.join(device, "current_link_speed")),
+            "width": _read_int(os.path.join(device, "current_link_width"))
+        },
+        "spec": spec
+    }
+
+
+def probe_amd(root: str = "/") -> List[Dict]:
+    """amdgpu devices from sysfs, found and ordered by the same find_cards() AmdGpuSysfsReader uses"""
+    return [_probe_amd_card(card_path) for card_path in find_cards(root)]
+
+
+def _sysfs_pci_bus(nvml_bus_id: str) -> str:
+    """NVML reports 00000000:3B:00.0; sysfs names the same device 0000:3b:00.0"""
+    domain, _, rest = nvml_bus_id.partition(":")
+    return f"{domain[-4:]}:{rest}".lower()
+
+
+def _text(value) -> str:
+    # Older pynvml returns bytes, newer returns str
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def probe_nvidia(root: str = "/") -> Dict:
+    """NVIDIA devices and NVLink peers from NVML (initialized only for the probe)"""
+    try:
+        import pynvml
+    except ImportError:
+        return {"available": False, "error": "pynvml not installed", "driverVersion": None, "devices": []}
+    try:
+        pynvml.nvmlInit()
+    except Exception as e:
+        return {"available": False, "error": str(e), "driverVersion": None, "devices": []}
+
+    devices = []
+    try:
+        driver_version = _text(pynvml.nvmlSystemGetDriverVersion())
+        for index in range(pynvml.nvmlDeviceGetCount()):
+            handle = pynvml.nvmlDeviceGetHandleByIndex(index)
+            model = _text(pynvml.nvmlDeviceGetName(handle))
+            pci_bus = _sysfs_pci_bus(_text(pynvml.nvmlDeviceGetPciInfo(handle).busId))
+            numa_node = _read_int(os.path.join(root, "sys", "bus", "pci", "devices", pci_bus, "numa_node"))
+            peers = []
+            for link in range(getattr(pynvml, "NVML_NVLINK_MAX_LINKS", 18)):
+                try:
+                    if pynvml.nvmlDeviceGetNvLinkState(handle, link) != pynvml.NVML_FEATURE_ENABLED:
+                        continue
+                    remote = pynvml.nvmlDeviceGetNvLinkRemotePciInfo(handle, link)
+                    peers.append({"link": link, "pciBus": _sysfs_pci_bus(_text(remote.busId))})
+                except Exception:
+                    break  # NVLink unsupported, or no more links on this device
+            devices.append({
+                "vendor": "NVIDIA",
+                "model": model,
+                "pciBus": pci_bus,
+                "numaNode": numa_node if numa_node is not None and numa_node >= 0 else None,
+                "localCpus": _read_text(os.path.join(root, "sys", "bus", "pci", "devices", pci_bus, "local_cpulist")),
+                "memoryTotal": pynvml.nvmlDeviceGetMemoryInfo(handle).total,
+                "uniqueId": _text(pynvml.nvmlDeviceGetUUID(handle)),
+                "nvlinkPeers": peers,
+                "spec": match_spec(model)
+            })
+    except Exception as e:
+        logger.warning(f"NVML inventory probe failed: {e}")
+        return {"available": False, "error": str(e), "driverVersion": None, "devices": []}
+    finally:
+        try:
+            pynvml.nvmlShutdown()
+        except Exception:
+            pass
+    return {"available": bool(devices), "error": None, "driverVersion": driver_version, "devices": devices}
+
+
+def probe_rocm_smi() -> Dict:
+    """Whether the rocm-smi fallback is usable, and its version"""
+    path = shutil.which("rocm-smi")
+    if not path:
+        return {"available": False, "path": None, "version": None}
+    try:
+        result = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        return {"available": False, "path": path, "version": None}
+    lines = result.stdout.strip().splitlines()
+    return {"available": result.returncode == 0, "path": path, "version": lines[-1] if lines else None}
+
+
+def _topology(gpus: List[Dict]) -> Dict:
+    hives: Dict[str, List[str]] = {}
+    for gpu in gpus:
+        hive = gpu.get("xgmiHiveId")
+        if hive and hive not in ("0", "0x0"):
+            hives.setdefault(hive, []).append(gpu["pciBus"])
+    numa: Dict[str, List[str]] = {}
+    for gpu in gpus:
+        numa.setdefault(str(gpu["numaNode"]), []).append(gpu["pciBus"])
+    return {
+        "xgmiHives": [{"hiveId": hive, "gpus": members} for hive, members in hives.items()],
+        "nvlink": [{"pciBus": gpu["pciBus"], "peers": gpu["nvlinkPeers"]}
+                   for gpu in gpus if gpu.get("nvlinkPeers")],
+        "numaNodes": numa
+    }
+
+
+def probe(root: str = "/") -> Dict:
+    """Probe AMD sysfs, NVML and rocm-smi concurrently and assemble the inventory"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="gpu-inventory") as pool:
+        amd = pool.submit(probe_amd, root)
+        nvidia = pool.submit(probe_nvidia, root)
+        rocm_smi = pool.submit(probe_rocm_smi)
+        try:
+            amd_gpus = amd.result()
+        except Exception as e:
+            logger.warning(f"amdgpu inventory probe failed: {e}")
+            amd_gpus = []
+        nvidia_info = nvidia.result()
+        rocm_info = rocm_smi.result()
+
+    gpus = nvidia_info["devices"] + amd_gpus
+    for index, gpu in enumerate(gpus):
+        gpu["index"] = index
+    return {
+        "key": cache_key(root),
+        "probedAt": time.time(),
+        "probeMs": round((time.perf_counter() - started) * 1000, 1),
+        "gpus": gpus,
+        "topology": _topology(gpus),
+        "nvidia": {k: v for k, v in nvidia_info.items() if k != "devices"},
+        "amd": {"available": bool(amd_gpus), "rocmSmi": rocm_info}
+    }
+
+
+def _write_cache(path: str, inventory: Dict):
+    """Write atomically so a concurrent reader never sees half a file"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".gpu-inventory-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(inventory, f, indent=1)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load(root: str = "/", path: Optional[str] = None, refresh: bool = False) -> Dict:
+    """The cached inventory if it is still valid, otherwise a fresh probe (which is then cached)
+
+    ``inventory["cached"]`` tells which one it was.
+    """
+    path = path or default_cache_path()
+    refresh = refresh or os.environ.get("MULTIVERSE_INVENTORY_REFRESH", "0") == "1"
+    if not refresh:
+        try:
+            with open(path) as f:
+                inventory = json.load(f)
+            if inventory.get("key") == cache_key(root):
+                inventory["cached"] = True
+                return inventory
+        except (OSError, ValueError):
+            pass
+
+    inventory = probe(root)
+    try:
+        _write_cache(path, inventory)
+    except OSError as e:
+        logger.warning(f"Could not write GPU inventory cache {path}: {e}")
+    logger.info(f"Probed {len(inventory['gpus'])} GPU(s) in {inventory['probeMs']} ms")
+    inventory["cached"] = False
+    return inventory
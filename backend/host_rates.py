@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Host rate engine
+Per-core CPU utilization and per-device disk / network rates computed as vectorized
+deltas between consecutive counter snapshots, without sleeping
+"""
+
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import psutil
+
+# Guest time is already counted in user/nice on Linux, so it is left out of the total (as psutil does)
+CPU_EXCLUDED = ("guest", "guest_nice")
+CPU_IDLE = ("idle", "iowait")
+
+DISK_COUNTERS = ("read_bytes", "write_bytes", "read_count", "write_count", "busy_time")
+NET_COUNTERS = ("bytes_recv", "bytes_sent", "packets_recv", "packets_sent", "errin", "errout", "dropin", "dropout")
+
+# Virtual devices that would otherwise double count (partitions, loop and RAM disks, the loopback interface)
+SKIP_DISK_PREFIXES = ("loop", "ram", "zram")
+SKIP_NICS = ("lo",)
+
+
+class CounterRates:
+    """Per-second rates of a keyed table of cumulative counters
+
+    Each update is one row per device and one column per counter. While the
+    set of devices is unchanged the delta is a single array subtraction;
+    devices that appear get no rate until their second sample, and counters
+    that go backwards (wrap or driver reset) report 0 rather than a negative rate.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.values: Optional[np.ndarray] = None
+        self.timestamp: Optional[float] = None
+
+    def update(self, names: List[str], values: np.ndarray, now: Optional[float] = None) -> Optional[np.ndarray]:
+        """Store a snapshot and return rates aligned with ``names`` (NaN where unknown), or None on the first call"""
+        now = time.monotonic() if now is None else now
+        previous, previous_names, previous_time = self.values, self.names, self.timestamp
+        self.names, self.values, self.timestamp = names, values, now
+        if previous is None or now <= previous_time:
+            return None
+        if names != previous_names:
+            index = {name: row for row, name in enumerate(previous_names)}
+            aligned = np.full_like(values, np.nan)
+            for row, name in enumerate(names):
+                if name in index:
+                    aligned[row] = previous[index[name]]
+            previous = aligned
+        return np.maximum(values - previous, 0.0) / (now - previous_time)
+
+
+def _round(array: np.ndarray, digits: int = 1) -> List[Optional[float]]:
+    return [None if np.isnan(value) else value for value in np.round(array, digits).tolist()]
+
+
+class CpuRates:
+    """Per-core and overall utilization from psutil.cpu_times(percpu=True)"""
+
+    def __init__(self):
+        self._previous: Optional[np.ndarray] = None
+        self._columns = None
+
+    def collect(self) -> Optional[Dict]:
+        times = psutil.cpu_times(percpu=True)
+        if self._columns is None:
+            fields = times[0]._fields
+            self._columns = (
+                np.array([field not in CPU_EXCLUDED for field in fields]),
+                np.array([field in CPU_IDLE for field in fields]),
+                fields.index("iowait") if "iowait" in fields else None
+            )
+        counted, idle, iowait_column = self._columns
+        current = np.array(times, dtype=np.float64)
+        previous, self._previous = self._previous, current
+        if previous is None or previous.shape != current.shape:
+            return None  # first sample, or CPUs were hot-plugged
+
+        delta = np.maximum(current - previous, 0.0)
+        total = delta[:, counted].sum(axis=1)
+        busy = total - delta[:, idle].sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            per_core = np.where(total > 0, busy / total * 100.0, 0.0)
+        overall_total = total.sum()
+        overall = busy.sum() / overall_total * 100.0 if overall_total > 0 else 0.0
+        iowait = (delta[:, iowait_column].sum() / overall_total * 100.0
+                  if iowait_column is not None and overall_total > 0 else None)
+        return {
+            "utilization": round(float(overall), 1),
+            "perCore": _round(per_core),
+            "maxCoreUtilization": round(float(per_core.max()), 1) if per_core.size else 0.0,
+            "iowait": round(float(iowait), 1) if iowait is not None else None
+        }
+
+
+def _whole_disks() -> Optional[set]:
+    """Block devices that are whole disks (partitions have no /sys/block entry); None where sysfs is absent"""
+    try:
+        return set(os.listdir("/sys/block"))
+    except OSError:
+        return None
+
+
+class IoRates:
+    """Per-device disk read/write and per-interface network rx/tx rates"""
+
+    def __init__(self):
+        self.disks = CounterRates()
+        self.nics = CounterRates()
+
+    @staticmethod
+    def _disk_names(counters: Dict) -> List[str]:
+        names = [name for name in counters if not name.startswith(SKIP_DISK_PREFIXES)]
+        # Listed every tick (one readdir) so hot-plugged disks show up
+        whole_disks = _whole_disks()
+        if whole_disks is not None:
+            names = [name for name in names if name in whole_disks]
+        return sorted(names)
+
+    def collect(self) -> Dict:
+        now = time.monotonic()
+        disk_counters = psutil.disk_io_counters(perdisk=True) or {}
+        names = self._disk_names(disk_counters)
+        disk_values = np.array([[getattr(disk_counters[name], counter, 0) for counter in DISK_COUNTERS]
+                                for name in names], dtype=np.float64).reshape(len(names), len(DISK_COUNTERS))
+        disk_rates = self.disks.update(names, disk_values, now)
+
+        nic_counters = psutil.net_io_counters(pernic=True) or {}
+        nics = sorted(name for name in nic_counters if name not in SKIP_NICS)
+        nic_values = np.array([[getattr(nic_counters[name], counter) for counter in NET_COUNTERS] for name in nics],
+                              dtype=np.float64).reshape(len(nics), len(NET_COUNTERS))
+        nic_rates = self.nics.update(nics, nic_values, now)
+
+        return {
+            "disk": self._disk_summary(names, disk_rates),
+            "network": self._network_summary(nics, nic_rates)
+        }
+
+    @staticmethod
+    def _disk_summary(names: List[str], rates: Optional[np.ndarray]) -> Optional[Dict]:
+        if rates is None:
+            return None
+        read, write, reads, writes, busy = (rates[:, column] for column in range(len(DISK_COUNTERS)))
+        devices = [
+            {"name": name, "readBytesPerSec": r, "writeBytesPerSec": w, "readOpsPerSec": ro,
+             "writeOpsPerSec": wo, "busyPercent": b}
+            # busy_time is milliseconds per second, i.e. tenths of a percent
+            for name, r, w, ro, wo, b in zip(names, _round(read, 0), _round(write, 0), _round(reads),
+                                             _round(writes), _round(np.minimum(busy / 10.0, 100.0)))
+        ]
+        return {
+            "readBytesPerSec": round(float(np.nansum(read))),
+            "writeBytesPerSec": round(float(np.nansum(write))),
+            "maxBusyPercent": round(min(float(np.nanmax(busy, initial=0.0)) / 10.0, 100.0), 1),
+            "devices": devices
+        }
+
+    @staticmethod
+    def _network_summary(names: List[str], rates: Optional[np.ndarray]) -> Optional[Dict]:
+        if rates is None:
+            return None
+        rx, tx = rates[:, 0], rates[:, 1]
+        errors = rates[:, 4] + rates[:, 5]
+        drops = rates[:, 6] + rates[:, 7]
+        interfaces = [
+            {"name": name, "rxBytesPerSec": r, "txBytesPerSec": t, "rxPacketsPerSec": rp, "txPacketsPerSec": tp,
+             "errorsPerSec": e, "dropsPerSec": d}
+            for name, r, t, rp, tp, e, d in zip(names, _round(rx, 0), _round(tx, 0), _round(rates[:, 2]),
+                                                _round(rates[:, 3]), _round(errors), _round(drops))
+        ]
+        return {
+            "rxBytesPerSec": round(float(np.nansum(rx))),
+            "txBytesPerSec": round(float(np.nansum(tx))),
+            "interfaces": interfaces
+        }
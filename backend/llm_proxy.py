@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Instrumented OpenAI-compatible streaming proxy
+Relays /v1/chat/completions to a local LLM server and measures each generation server-side
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+import httpx
+
+DEFAULT_UPSTREAM = os.environ.get("MULTIVERSE_LLM_UPSTREAM", "http://localhost:1234")
+INCLUDE_USAGE = os.environ.get("MULTIVERSE_PROXY_INCLUDE_USAGE", "1") != "0"
+
+# Recorded as the error of a generation the client abandoned, so it never counts as a successful run
+CLIENT_DISCONNECTED = "client disconnected"
+# Hop-by-hop and length headers must not be copied between the two connections
+HOP_HEADERS = {"host", "content-length", "connection", "keep-alive", "transfer-encoding",
+               "te", "trailer", "upgrade", "proxy-authorization", "proxy-connection", "accept-encoding"}
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class SSEObserver:
+    """Incrementally scans an SSE byte stream for content deltas and usage, without altering it"""
+
+    def __init__(self, started: float):
+        self.started = started
+        self.content_times: List[float] = []
+        self.usage: Optional[Dict] = None
+        self.model: Optional[str] = None
+        self.chunks = 0
+        self.overhead = 0.0
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes):
+        received = time.perf_counter()
+        self.chunks += 1
+        self._buffer += chunk
+        while True:
+            end, separator = self._next_boundary()
+            if end < 0:
+                break
+            event = bytes(self._buffer[:end])
+            del self._buffer[:end + separator]
+            self._handle(event, received)
+        self.overhead += time.perf_counter() - received
+
+    def _next_boundary(self):
+        lf = self._buffer.find(b"\n\n")
+        crlf = self._buffer.find(b"\r\n\r\n")
+        if crlf >= 0 and (lf < 0 or crlf < lf):
+            return crlf, 4
+        return lf, 2
+
+    def _handle(self, event: bytes, received: float):
+        data = b"\n".join(line[5:].lstrip(b" ") for line in event.splitlines() if line.startswith(b"data:"))
+        if not data or data == b"[DONE]":
+            return
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            return
+        self.model = self.model or payload.get("model")
+        if payload.get("usage"):
+            self.usage = payload["usage"]
+        for choice in payload.get("choices") or []:
+            delta = choice.get("delta") or {}
+            if delta.get("content") or delta.get("reasoning_content") or choice.get("text"):
+                self.content_times.append(received)
+                break
+
+
+class InferenceStats:
+    """Aggregates per-generation measurements for the metrics stream"""
+
+    def __init__(self, keep: int = 256):
+        self.records: Deque[Dict] = deque(maxlen=keep)
+        self.requests = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.active = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.chunks = 0
+        self.overhead = 0.0
+        # Optional hooks for consumers that follow generations as they start and end
+        self.on_begin: Optional[Callable[[], None]] = None
+        self.on_finish: Optional[Callable[[Dict], None]] = None
+        self._ids = itertools.count(1)
+
+    def begin(self) -> int:
+        self.requests += 1
+        self.active += 1
+        if self.on_begin:
+            self.on_begin()
+        return next(self._ids)
+
+    def finish(self, record: Dict):
+        self.active -= 1
+        if record.get("cancelled"):
+            self.cancelled += 1
+        elif record.get("error"):
+            self.errors += 1
+        self.prompt_tokens += record.get("promptTokens") or 0
+        self.completion_tokens += record.get("completionTokens") or 0
+        self.chunks += record.get("chunks") or 0
+        self.overhead += record.get("proxyOverheadS") or 0.0
+        self.records.append(record)
+        if self.on_finish:
+            self.on_finish(record)
+
+    def summary(self, window: int = 32) -> Dict:
+        """Totals plus TTFT / inter-token latency / decode-rate statistics over recent generations"""
+        recent = [r for r in list(self.records)[-window:] if not r.get("error")]
+        ttfts = [r["ttftMs"] for r in recent if r.get("ttftMs") is not None]
+        itls = [r["itlMsMean"] for r in recent if r.get("itlMsMean") is not None]
+        rates = [r["decodeTokensPerSecond"] for r in recent if r.get("decodeTokensPerSecond")]
+        return {
+            "requests": self.requests,
+            "active": self.active,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "promptTokens": self.prompt_tokens,
+            "completionTokens": self.completion_tokens,
+            "ttftMsP50": percentile(ttfts, 0.5),
+            "ttftMsP95": percentile(ttfts, 0.95),
+            "itlMsMean": sum(itls) / len(itls) if itls else None,
+            "decodeTokensPerSecond": sum(rates) / len(rates) if rates else None,
+            "proxyOverheadUsPerChunk": (self.overhead / self.chunks * 1e6) if self.chunks else None,
+            "last": self.records[-1] if self.records else None
+        }
+
+
+def build_record(generation_id: int, model: Optional[str], stream: bool, started: float, wall_started: float,
+                 observer: Optional[SSEObserver], body: Optional[Dict], status: int, error: Optional[str],
+                 cancelled: bool = False) -> Dict:
+    """Turn raw timings into a generation record (a cancelled one also carries an error, so it is never a success)"""
+    ended = time.perf_counter()
+    usage = (observer.usage if observer else None) or ((body or {}).get("usage") if body else None) or {}
+    record = {
+        "id": generation_id,
+        "model": model,
+        "stream": stream,
+        "status": status,
+        "error": error,
+        "cancelled": cancelled,
+        "startedAt": wall_started,
+        "endedAt": wall_started + (ended - started),
+        "durationMs": (ended - started) * 1000,
+        "promptTokens": usage.get("prompt_tokens"),
+        "completionTokens": usage.get("completion_tokens"),
+        "tokenCountSource": "usage" if usage else None,
+        "ttftMs": None,
+        "itlMsMean": None,
+        "itlMsP50": None,
+        "itlMsP95": None,
+        "itlMsMax": None,
+        "decodeTokensPerSecond": None,
+        "chunks": observer.chunks if observer else 0,
+        "proxyOverheadS": observer.overhead if observer else 0.0
+    }
+    if observer and observer.content_times:
+        times = observer.content_times
+        record["ttftMs"] = (times[0] - started) * 1000
+        record["firstTokenAt"] = wall_started + (times[0] - started)
+        gaps = [(b - a) * 1000 for a, b in zip(times, times[1:])]
+        if gaps:
+            record["itlMsMean"] = sum(gaps) / len(gaps)
+            record["itlMsP50"] = percentile(gaps, 0.5)
+            record["itlMsP95"] = percentile(gaps, 0.95)
+            record["itlMsMax"] = max(gaps)
+        if record["completionTokens"] is None:
+            # No usage block from the server: fall back to counting content events
+            record["completionTokens"] = len(times)
+            record["tokenCountSource"] = "chunks"
+        decode_time = times[-1] - times[0]
+        if decode_time > 0 and record["completionTokens"] > 1:
+            record["decodeTokensPerSecond"] = (record["completionTokens"] - 1) / decode_time
+    return record
+
+
+class ChatCompletionsProxy:
+    """Pooled, keep-alive relay to an OpenAI-compatible upstream"""
+
+    def __init__(self, upstream: str = DEFAULT_UPSTREAM, stats: Optional[InferenceStats] = None):
+        self.upstream = upstream.rstrip("/")
+        self.stats = stats or InferenceStats()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.upstream,
+                # Bytes are relayed raw and scanned for SSE events, so the upstream must not compress them
+                headers={"Accept-Encoding": "identity"},
+                timeout=httpx.Timeout(connect=10.0, read=300.0, write=30.0, pool=30.0),
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=16, keepalive_expiry=60.0)
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def forward_headers(headers) -> Dict[str, str]:
+        return {key: value for key, value in headers.items() if key.lower() not in HOP_HEADERS}
+
+    @staticmethod
+    def prepare_body(raw: bytes):
+        """Parse the request and ask for a usage block on streams so token counts are real"""
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return None, raw
+        if not isinstance(payload, dict):
+            return None, raw
+        if INCLUDE_USAGE and payload.get("stream") and "stream_options" not in payload:
+            payload["stream_options"] = {"include_usage": True}
+            raw = json.dumps(payload).encode()
+        return payload, raw
+
+    async def open(self, path: str, payload: Optional[Dict], raw: bytes, headers) -> "ProxiedGeneration":
+        """Send a prepared request upstream and return a handle for relaying the response"""
+        generation = ProxiedGeneration(self, payload)
+        request = self.client.build_request("POST", path, content=raw, headers=self.forward_headers(headers))
+        try:
+            generation.response = await self.client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            generation.fail(f"Upstream request failed: {e}")
+            raise
+        return generation
+
+
+class ProxiedGeneration:
+    """One relayed request: streams bytes through untouched and records timings as they pass"""
+
+    def __init__(self, proxy: ChatCompletionsProxy, payload: Optional[Dict]):
+        self.proxy = proxy
+        self.payload = payload or {}
+        self.stream = bool(self.payload.get("stream"))
+        self.model = self.payload.get("model")
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.id = proxy.stats.begin()
+        self.response: Optional[httpx.Response] = None
+        self.observer = SSEObserver(self.started) if self.stream else None
+        # Called with the exact upstream chunks once a response completes successfully
+        self.on_complete: Optional[Callable[[int, str, List[bytes]], Awaitable[None]]] = None
+        self._finished = False
+
+    def fail(self, error: str, status: int = 502):
+        self._finish(status, error, None)
+
+    def _finish(self, status: int, error: Optional[str], body: Optional[Dict], cancelled: bool = False):
+        if self._finished:
+            return
+        self._finished = True
+        model = (self.observer.model if self.observer else None) or (body or {}).get("model") or self.model
+        self.proxy.stats.finish(build_record(self.id, model, self.stream, self.started, self.wall_started,
+                                             self.observer, body, status, error, cancelled))
+
+    async def iter_stream(self) -> AsyncIterator[bytes]:
+        """Yield upstream bytes as they arrive; the observer only looks at them"""
+        error = None
+        cancelled = False
+        chunks: List[bytes] = []
+        try:
+            async for chunk in self.response.aiter_raw():
+                self.observer.feed(chunk)
+                if self.on_complete:
+                    chunks.append(chunk)
+                yield chunk
+        except httpx.HTTPError as e:
+            error = f"Upstream stream failed: {e}"
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client disconnected or the shared pump was cancelled: the generation is truncated
+            error, cancelled = CLIENT_DISCONNECTED, True
+            raise
+        finally:
+            await self.response.aclose()
+            status = self.response.status_code
+            self._finish(status, error or (None if status < 400 else f"Upstream returned {status}"), None, cancelled)
+        if self.on_complete and status < 400:
+            await self.on_complete(status, self.response.headers.get("content-type", "text/event-stream"), chunks)
+
+    async def read(self) -> bytes:
+        """Read a complete (non-streaming) response"""
+        try:
+            content = await self.response.aread()
+        except asyncio.CancelledError:
+            self._finish(self.response.status_code, CLIENT_DISCONNECTED, None, cancelled=True)
+            raise
+        finally:
+            await self.response.aclose()
+        status = self.response.status_code
+        try:
+            body = json.loads(content)
+        except ValueError:
+            body = None
+        self._finish(status, None if status < 400 else f"Upstream returned {status}",
+                     body if isinstance(body, dict) else None)
+        if self.on_complete and status < 400:
+            await self.on_complete(status, self.response.headers.get("content-type", "application/json"), [content])
+        return content
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Fixed-memory metrics history
+Array-backed ring buffers with vectorized min/avg/max downsampling
+"""
+
+import math
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_CAPACITY = 24 * 60 * 60  # 24 h at 1 s resolution
+DEFAULT_MAX_GPUS = 8
+MAX_BUCKETS = 10000
+
+NODE_FIELDS = (
+    "cpu.utilization",
+    "cpu.frequency",
+    "cpu.maxCoreUtilization",
+    "cpu.iowait",
+    "memory.percent",
+    "memory.used",
+    "gpuSummary.utilizationMean",
+    "gpuSummary.utilizationMax",
+    "gpuSummary.memoryUsed",
+    "gpuSummary.powerDraw",
+    "disk.readBytesPerSec",
+    "disk.writeBytesPerSec",
+    "network.rxBytesPerSec",
+    "network.txBytesPerSec",
+    "process.total.cpuPercent",
+    "process.total.rss",
+    "throttle.throttling",
+    "throttle.maxSeverity",
+    "throttle.maxClockDrop",
+)
+GPU_FIELDS = ("utilization", "memoryUsed", "temperature", "powerDraw", "graphicsClock")
+
+
+def history_fields(max_gpus: int = DEFAULT_MAX_GPUS) -> List[str]:
+    """Node fields followed by the per-GPU fields of the first max_gpus devices"""
+    return list(NODE_FIELDS) + [f"gpus.{index}.{field}" for index in range(max_gpus) for field in GPU_FIELDS]
+
+
+def extract(sample: Dict, fields: Sequence[str]) -> List[float]:
+    """One row of recorded values from a metrics document"""
+    return [_lookup(sample, field) for field in fields]
+
+
+def _lookup(sample: Dict, path: str) -> float:
+    """Resolve a dotted path like 'cpu.utilization' or 'gpus.3.powerDraw' to a float (NaN if absent)"""
+    value = sample
+    for part in path.split("."):
+        if isinstance(value, list):
+            index = int(part)
+            value = value[index] if index < len(value) else None
+        elif isinstance(value, dict):
+            value = value.get(part)
+        else:
+            return math.nan
+        if value is None:
+            return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class MetricsHistory:
+    """One ring buffer column per metric, all sharing a timestamp column
+
+    Memory is allocated up front: capacity * (8 + 4 * len(fields)) bytes.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, max_gpus: int = DEFAULT_MAX_GPUS):
+        self.capacity = capacity
+        self.fields = history_fields(max_gpus)
+        self._column = {field: i for i, field in enumerate(self.fields)}
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        # float32 halves the footprint; the precision is plenty for dashboards
+        self.values = np.full((capacity, len(self.fields)), np.nan, dtype=np.float32)
+        self.head = 0
+        self.count = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.values.nbytes
+
+    def record(self, sample: Dict, timestamp: Optional[float] = None):
+        """Append one sample, overwriting the oldest once the buffer is full"""
+        self.append(extract(sample, self.fields), timestamp)
+
+    def append(self, row: Sequence[float], timestamp: Optional[float] = None):
+        """Append a row already extracted with extract(sample, self.fields)"""
+        self.timestamps[self.head] = time.time() if timestamp is None else timestamp
+        self.values[self.head] = row
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def _ordered_timestamps(self) -> np.ndarray:
+        if self.count < self.capacity:
+            return self.timestamps[:self.count]
+        return np.concatenate((self.timestamps[self.head:], self.timestamps[:self.head]))
+
+    def _physical(self, lo: int, hi: int) -> np.ndarray:
+        """Map logical (oldest-first) positions [lo, hi) to buffer rows"""
+        start = self.head if self.count == self.capacity else 0
+        return (start + np.arange(lo, hi)) % self.capacity
+
+    def window(self, since: float, until: float, fields: Optional[Sequence[str]] = None):
+        """Return (timestamps, values) for samples in [since, until), oldest first"""
+        columns = [self._column[field] for field in fields] if fields else slice(None)
+        ordered = self._ordered_timestamps()
+        lo, hi = np.searchsorted(ordered, [since, until])
+        rows = self._physical(lo, hi)
+        return ordered[lo:hi], self.values[rows][:, columns]
+
+    def query(self, since: float, until: float, step: float, fields: Optional[Sequence[str]] = None) -> Dict:
+        """Downsample [since, until) into step-second buckets of min/avg/max per field"""
+        fields = list(fields) if fields else self.fields
+        unknown = [field for field in fields if field not in self._column]
+        if unknown:
+            raise KeyError(f"Unknown history fields: {', '.join(unknown)}")
+        # Never hand back more buckets than a chart can use
+        step = max(step, (until - since) / MAX_BUCKETS)
+
+        timestamps, values = self.window(since, until, fields)
+        result = {"since": since, "until": until, "step": step, "timestamps": [], "series": {}}
+        if len(timestamps) == 0:
+            result["series"] = {field: {"min": [], "avg": [], "max": []} for field in fields}
+            return result
+
+        # Samples are time-ordered, so each bucket is a contiguous run of rows
+        buckets = ((timestamps - since) // step).astype(np.int64)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+
+        present = ~np.isnan(values)
+        counts = np.add.reduceat(present, starts, axis=0, dtype=np.int64)
+        sums = np.add.reduceat(np.nan_to_num(values), starts, axis=0, dtype=np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averages = sums / counts
+        minimums = np.fmin.reduceat(values, starts, axis=0)
+        maximums = np.fmax.reduceat(values, starts, axis=0)
+
+        result["timestamps"] = (since + buckets[starts] * step).tolist()
+        for column, field in enumerate(fields):
+            result["series"][field] = {
+                "min": _to_json(minimums[:, column]),
+                "avg": _to_json(averages[:, column]),
+                "max": _to_json(maximums[:, column]),
+            }
+        return result
+
+
+def _to_json(column: np.ndarray) -> List[Optional[float]]:
+    """Convert a column to a JSON-safe list (NaN becomes null)"""
+    return np.where(np.isnan(column), None, np.round(column.astype(np.float64), 3)).tolist()
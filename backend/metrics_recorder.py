@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+On-disk metrics recorder
+Appends each sample as a fixed-width record to one file per (UTC) day; files are
+NumPy structured arrays behind a small header, so readers memory-map them and seek
+by timestamp with a binary search
+"""
+
+import csv
+import datetime
+import glob
+import io
+import json
+import logging
+import os
+import queue
+import re
+import struct
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from metrics_history import history_fields
+
+# Byte-range locks pick the one writer when several workers share a directory (POSIX only)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Try to import pyarrow for Parquet export
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MVREC001"
+# Magic, then the length of the whole header (data starts there), then the JSON description
+PREAMBLE = struct.Struct("<8sI")
+PAGE = 4096
+FILE_PATTERN = re.compile(r"metrics-(\d{4}-\d{2}-\d{2})(?:\.(\d+))?\.bin$")
+EXPORT_CHUNK_ROWS = 10000
+
+
+def record_dtype(fields: Sequence[str]) -> np.dtype:
+    """Unix timestamp followed by one float32 per field (the same precision as the in-memory history)"""
+    return np.dtype([("timestamp", "<f8")] + [(field, "<f4") for field in fields])
+
+
+def day_of(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+class RecordingFile:
+    """A read-only, memory-mapped view of one recording file as it was when opened
+
+    Records are appended in time order, so the timestamp column is sorted and
+    a time range is found with two binary searches over the mapping.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, header_size = PREAMBLE.unpack(f.read(PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a metrics recording")
+            header = json.loads(f.read(header_size - PREAMBLE.size).rstrip(b"\0 "))
+        self.fields: List[str] = header["fields"]
+        self.dtype = record_dtype(self.fields)
+        self.header_size = header_size
+        # A writer may be appending: only whole records count
+        self.count = max(0, (os.path.getsize(path) - header_size) // self.dtype.itemsize)
+        self.records = (np.memmap(path, dtype=self.dtype, mode="r", offset=header_size, shape=(self.count,))
+                        if self.count else np.zeros(0, dtype=self.dtype))
+
+    @property
+    def first(self) -> Optional[float]:
+        return float(self.records["timestamp"][0]) if self.count else None
+
+    @property
+    def last(self) -> Optional[float]:
+        return float(self.records["timestamp"][-1]) if self.count else None
+
+    def window(self, since: float, until: float) -> np.ndarray:
+        """Records with since <= timestamp < until (a view into the mapping)"""
+        lo, hi = np.searchsorted(self.records["timestamp"], [since, until])
+        return self.records[lo:hi]
+
+
+class MetricsRecorder:
+    """Append-only daily recording files, written by a background thread
+
+    append() only puts the row on a queue, so the caller (the event loop) pays
+    microseconds; the writer thread batches whatever has queued up into one
+    write() per file. When several server processes record into the same
+    directory, the one holding the directory's lock file writes and the others
+    skip their (identical) samples until the writer goes away.
+    """
+
+    def __init__(self, directory: str, fields: Optional[Sequence[str]] = None, retention_days: int = 0):
+        self.directory = directory
+        self.fields = list(fields) if fields is not None else history_fields()
+        self.dtype = record_dtype(self.fields)
+        self.retention_days = retention_days
+        self.written = 0
+        self.dropped = 0
+        self.skipped = 0
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._fd: Optional[int] = None
+        self._day: Optional[str] = None
+        self._last_timestamp = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._lock_fd: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def writing(self) -> bool:
+        """Whether this process is the one writing the recording"""
+        return self._lock_fd is not None or not FCNTL_AVAILABLE
+
+    def _acquire(self) -> bool:
+        if self.writing:
+            return True
+        fd = os.open(os.path.join(self.directory, ".writer.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        logger.info(f"This process writes the metrics recording in {self.directory}")
+        return True
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-recorder", daemon=True)
+            self._thread.start()
+            logger.info(f"Recording metrics to {self.directory}")
+
+    def append(self, row: Sequence[float], timestamp: Optional[float] = None):
+        """Queue one row (values in self.fields order) for writing"""
+        self._queue.put((time.time() if timestamp is None else timestamp, row))
+
+    def close(self, timeout: float = 5.0):
+        """Write out everything queued and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [item for item in batch if item is not None]
+            try:
+                if self._acquire():
+                    self._write(batch)
+                else:
+                    self.skipped += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.error(f"Error writing metrics recording: {e}")
+        self._close_file()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _write(self, batch: List[Tuple[float, Sequence[float]]]):
+        # A clock stepping backwards would break the sorted order readers rely on; such samples are skipped
+        rows = []
+        for timestamp, row in batch:
+            if timestamp <= self._last_timestamp:
+                self.dropped += 1
+                continue
+            self._last_timestamp = timestamp
+            rows.append((timestamp, *row))
+        start = 0
+        while start < len(rows):
+            day = day_of(rows[start][0])
+            end = start
+            while end < len(rows) and day_of(rows[end][0]) == day:
+                end += 1
+            if day != self._day:
+                self._open_day(day)
+            os.write(self._fd, np.array(rows[start:end], dtype=self.dtype).tobytes())
+            self.written += end - start
+            start = end
+
+    def _open_day(self, day: str):
+        """Switch to the file for a new day, continuing it if it was written with the same fields"""
+        self._close_file()
+        self._day = day
+        for suffix in range(1000):
+            path = os.path.join(self.directory, f"metrics-{day}{f'.{suffix}' if suffix else ''}.bin")
+            if not os.path.exists(path):
+                self._fd = self._create(path)
+                break
+            try:
+                existing = RecordingFile(path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable recording {path}: {e}")
+                continue
+            if existing.fields == self.fields:
+                self._fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+                # Drop a record torn by a crash mid-write, so every record stays aligned
+                os.ftruncate(self._fd, existing.header_size + existing.count * self.dtype.itemsize)
+                if existing.count:
+                    self._last_timestamp = max(self._last_timestamp, existing.last)
+                break
+            # Fields changed (an upgrade, or a different GPU count setting): start a sibling file
+        else:
+            raise OSError(f"Too many recording files for {day}")
+        self._expire()
+
+    def _create(self, path: str) -> int:
+        description = json.dumps({"fields": self.fields, "created": time.time()}).encode()
+        header_size = -(-(PREAMBLE.size + len(description)) // PAGE) * PAGE
+        header = PREAMBLE.pack(MAGIC, header_size) + description
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o644)
+        os.write(fd, header.ljust(header_size, b" "))
+        return fd
+
+    def _close_file(self):
+        if self._fd is not None:
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._fd = None
+
+    def _expire(self):
+        if self.retention_days <= 0:
+            return
+        cutoff = day_of(time.time() - self.retention_days * 86400)
+        for day, path in self.files():
+            if day < cutoff:
+                try:
+                    os.remove(path)
+                    logger.info(f"Removed expired recording {path}")
+                except OSError:
+                    pass
+
+    def status(self) -> Dict:
+        return {"directory": self.directory, "writing": self.writing, "written": self.written,
+                "dropped": self.dropped, "skipped": self.skipped}
+
+    def files(self) -> List[Tuple[str, str]]:
+        """(day, path) for every recording file, oldest first"""
+        found = []
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.bin")):
+            match = FILE_PATTERN.search(os.path.basename(path))
+            if match:
+                found.append((match.group(1), int(match.group(2) or 0), path))
+        return [(day, path) for day, _, path in sorted(found)]
+
+    def recordings(self) -> List[Dict]:
+        """Summary of each recording file"""
+        summaries = []
+        for day, path in self.files():
+            try:
+                recording = RecordingFile(path)
+            except (OSError, ValueError):
+                continue
+            summaries.append({
+                "day": day,
+                "file": os.path.basename(path),
+                "bytes": os.path.getsize(path),
+                "samples": recording.count,
+                "first": recording.first,
+                "last": recording.last,
+                "fields": len(recording.fields)
+            })
+        return summaries
+
+    def read(self, since: float, until: float) -> Iterator[RecordingFile]:
+        """Recording files that may hold samples in [since, until), in time order"""
+        first_day, last_day = day_of(since), day_of(max(since, until - 1e-6))
+        for day, path in self.files():
+            if first_day <= day <= last_day:
+                try:
+                    yield RecordingFile(path)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable recording {path}: {e}")
+
+    def load(self, since: float, until: float, fields: Optional[Sequence[str]] = None) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """(timestamps, values, fields) for [since, until), with fields missing from a file as NaN"""
+        fields = list(fields) if fields else self.fields
+        timestamps, blocks = [], []
+        for recording in self.read(since, until):
+            records = recording.window(since, until)
+            if not len(records):
+                continue
+            block = np.full((len(records), len(fields)), np.nan, dtype=np.float32)
+            for column, field in enumerate(fields):
+                if field in recording.dtype.names:
+                    block[:, column] = records[field]
+            timestamps.append(np.asarray(records["timestamp"]))
+            blocks.append(block)
+        if not timestamps:
+            return np.zeros(0), np.zeros((0, len(fields)), dtype=np.float32), fields
+        timestamps = np.concatenate(timestamps)
+        values = np.concatenate(blocks)
+        # Sibling files of one day are sorted per file; merge them into one timeline
+        order = np.argsort(timestamps, kind="stable")
+        return timestamps[order], values[order], fields
+
+    def export_csv(self, since: float, until: float, fields: Optional[Sequence[str]] = None) -> Iterator[str]:
+        """CSV text in chunks: a header row, then one row per sample"""
+        timestamps, values, fields = self.load(since, until, fields)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["timestamp"] + fields)
+        for start in range(0, len(timestamps), EXPORT_CHUNK_ROWS):
+            chunk = values[start:start + EXPORT_CHUNK_ROWS].astype(object)
+            chunk[np.isnan(values[start:start + EXPORT_CHUNK_ROWS])] = ""
+            for timestamp, row in zip(timestamps[start:start + EXPORT_CHUNK_ROWS].tolist(), chunk.tolist()):
+                writer.writerow([timestamp] + row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def export_parquet(self, since: float, until: float, fields: Optional[Sequence[str]] = None) -> bytes:
+        """A Parquet file with a timestamp column and one float32 column per field (needs pyarrow)"""
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        timestamps, values, fields = self.load(since, until, fields)
+        columns = {"timestamp": pyarrow.array(timestamps, type=pyarrow.float64())}
+        for column, field in enumerate(fields):
+            columns[field] = pyarrow.array(values[:, column], from_pandas=True)  # NaN becomes null
+        sink = io.BytesIO()
+        pyarrow.parquet.write_table(pyarrow.table(columns), sink, compression="zstd")
+        return sink.getvalue()
+
+
+def to_document(timestamp: float, fields: Sequence[str], row: Sequence[float]) -> Dict:
+    """Rebuild a (partial) metrics document from one recorded row, for replay"""
+    document: Dict = {"timestamp": datetime.datetime.fromtimestamp(timestamp).isoformat()}
+    gpus: Dict[int, Dict] = {}
+    for field, value in zip(fields, row):
+        if value != value:  # NaN: not recorded
+            continue
+        parts = field.split(".")
+        if parts[0] == "gpus":
+            gpus.setdefault(int(parts[1]), {})[parts[2]] = round(value, 3)
+            continue
+        node = document
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = round(value, 3)
+    document["gpus"] = [{"index": index, **gpus[index]} for index in sorted(gpus)]
+    document["gpu"] = document["gpus"][0] if document["gpus"] else None
+    return document
@@ -7,15 +7,38 @@ Provides real-time system metrics via WebSocket
 import asyncio
 import json
 import logging
+import os
 import platform
 import re
 import subprocess
-from datetime import datetime
-from typing import Dict, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Set, Union
 
+import httpx
 import psutil
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Response
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+from amdgpu_sysfs import AmdGpuSysfsReader
+from cluster_hub import ClusterHub, parse_nodes
+from delta_frames import Codec, Frame, negotiate
+from generation_energy import GenerationLedger, PowerTrace
+import gpu_inventory
+from host_rates import CpuRates, IoRates
+from llm_proxy import ChatCompletionsProxy, InferenceStats
+from metrics_history import MetricsHistory, extract
+from metrics_recorder import MetricsRecorder, to_document
+from openmetrics import CONTENT_TYPE as OPENMETRICS_CONTENT_TYPE, Histogram, render as render_openmetrics
+from process_tracker import ProcessTracker
+from response_cache import CachedResponse, ResponseCache, cache_key
+from shared_metrics import FCNTL_AVAILABLE, SharedSampling
+from single_flight import Coalescer, Flight
+from throttle_detector import ThrottleDetector, decode_nvml_reasons
 
 # Try to import NVIDIA ML library
 try:
@@ -39,59 +62,105 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize NVIDIA if available
-if NVIDIA_AVAILABLE:
-    try:
-        pynvml.nvmlInit()
-        logger.info("NVIDIA ML initialized successfully")
-    except Exception as e:
-        logger.warning(f"Failed to initialize NVIDIA ML: {e}")
-        NVIDIA_AVAILABLE = False
-
 
 class MetricsCollector:
     """Collects system metrics from various sources"""
     
-    def __init__(self):
-        self.nvidia_available = NVIDIA_AVAILABLE
+    def __init__(self, sysfs_root: Optional[str] = None, inventory: Optional[Dict] = None,
+                 nvml=None, run_command: Optional[Callable] = None):
+        """Reads the real hardware unless a sysfs root, inventory, NVML module or command runner is passed (see fake_providers)"""
+        sysfs_root = sysfs_root or os.environ.get("MULTIVERSE_SYSFS_ROOT", "/")
+        # Devices, specs and topology come from a cache that is valid until the next reboot or driver change,
+        # so startup does not wait on NVML or rocm-smi
+        self.inventory = inventory if inventory is not None else gpu_inventory.load(sysfs_root)
+        self.nvml = nvml if nvml is not None else (pynvml if NVIDIA_AVAILABLE else None)
+        self.run_command = run_command or subprocess.run
+        
+        # Only initialize NVML when the inventory has NVIDIA devices
+        self.nvidia_available = self.nvml is not None and self.inventory["nvidia"]["available"]
+        self.nvidia_device_count = 0
+        # Handles and names never change, so look them up once instead of every tick
+        self.nvidia_handles = []
+        self.nvidia_names = []
+        self.nvidia_temperature_limits = []
+        self.nvidia_throttle_reasons = None
         if self.nvidia_available:
             try:
-                self.nvidia_device_count = pynvml.nvmlDeviceGetCount()
-            except:
+                self.nvml.nvmlInit()
+                self.nvidia_device_count = self.nvml.nvmlDeviceGetCount()
+                self.nvidia_handles = [self.nvml.nvmlDeviceGetHandleByIndex(i) for i in range(self.nvidia_device_count)]
+                self.nvidia_names = [self._nvidia_name(handle) for handle in self.nvidia_handles]
+                self.nvidia_temperature_limits = [self._nvidia_temperature_limit(handle) for handle in self.nvidia_handles]
+                # Renamed from "throttle reasons" to "clock event reasons" in newer NVML
+                self.nvidia_throttle_reasons = (getattr(self.nvml, "nvmlDeviceGetCurrentClocksEventReasons", None)
+                                                or getattr(self.nvml, "nvmlDeviceGetCurrentClocksThrottleReasons", None))
+                logger.info("NVIDIA ML initialized successfully")
+            except Exception as e:
+                logger.warning(f"Failed to initialize NVIDIA ML: {e}")
+                self.nvidia_available = False
                 self.nvidia_device_count = 0
+                self.nvidia_handles = []
+                self.nvidia_names = []
         
-        # Check for ROCm/AMD GPU availability
-        self.rocm_available = self._check_rocm_available()
-    
-    def _check_rocm_available(self) -> bool:
-        """Check if ROCm/AMD GPU tools are available"""
-        try:
-            result = subprocess.run(
-                ["rocm-smi", "--version"],
-                capture_output=True,
-                text=True,
-                timeout=1
-            )
-            return result.returncode == 0
-        except (FileNotFoundError, subprocess.TimeoutExpired):
-            return False
+        # Read amdgpu sysfs directly; rocm-smi is only a fallback
+        self.amd_sysfs = AmdGpuSysfsReader(sysfs_root)
+        
+        # Check for ROCm/AMD GPU availability (probed once with the inventory)
+        self.rocm_available = self.inventory["amd"]["rocmSmi"]["available"]
+        
+        # Inference server processes: MULTIVERSE_INFERENCE_PROCESSES lists names or PIDs, otherwise auto-discovered
+        targets = [t.strip() for t in os.environ.get("MULTIVERSE_INFERENCE_PROCESSES", "").split(",") if t.strip()]
+        self.processes = ProcessTracker(targets)
+        
+        # Counter snapshots for per-core CPU and per-device disk / network rates (one engine per source thread)
+        self.cpu_rates = CpuRates()
+        self.io_rates = IoRates()
     
     def get_cpu_metrics(self) -> Dict:
         """Get CPU metrics using psutil"""
+        return {**self.get_cpu_load(), **self.get_static_info()}
+    
+    def get_cpu_load(self) -> Dict:
+        """Get overall and per-core CPU utilization since the previous call without sleeping"""
+        try:
+            cpu_freq = psutil.cpu_freq()
+            rates = self.cpu_rates.collect()
+            if rates is None:
+                # First snapshot: nothing to diff against yet
+                rates = {"utilization": psutil.cpu_percent(interval=None), "perCore": [],
+                         "maxCoreUtilization": None, "iowait": None}
+            return {**rates, "frequency": cpu_freq.current if cpu_freq else None}
+        except Exception as e:
+            logger.error(f"Error getting CPU load: {e}")
+            return {"utilization": 0, "frequency": None}
+    
+    def get_io_metrics(self) -> Dict:
+        """Get per-device disk and per-interface network rates since the previous call"""
+        try:
+            return self.io_rates.collect()
+        except Exception as e:
+            logger.error(f"Error getting I/O metrics: {e}")
+            return {"disk": None, "network": None}
+    
+    def get_static_info(self) -> Dict:
+        """Get CPU facts that rarely change (core count, max frequency)"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            cpu_count = psutil.cpu_count(logical=True)
             cpu_freq = psutil.cpu_freq()
-            
             return {
-                "utilization": cpu_percent,
-                "cores": cpu_count,
-                "frequency": cpu_freq.current if cpu_freq else None,
+                "cores": psutil.cpu_count(logical=True),
                 "maxFrequency": cpu_freq.max if cpu_freq else None
             }
         except Exception as e:
-            logger.error(f"Error getting CPU metrics: {e}")
-            return {"utilization": 0, "cores": 0, "frequency": None, "maxFrequency": None}
+            logger.error(f"Error getting static CPU info: {e}")
+            return {"cores": 0, "maxFrequency": None}
+    
+    def get_process_metrics(self) -> Dict:
+        """Get CPU, RSS, thread, context-switch and I/O metrics of the inference server processes"""
+        try:
+            return self.processes.collect()
+        except Exception as e:
+            logger.error(f"Error getting inference process metrics: {e}")
+            return {"processes": [], "total": None}
     
     def get_memory_metrics(self) -> Dict:
         """Get memory metrics using psutil"""
@@ -112,40 +181,60 @@ class MetricsCollector:
             logger.error(f"Error getting memory metrics: {e}")
             return {"total": 0, "used": 0, "available": 0, "percent": 0}
     
+    def _nvidia_name(self, handle) -> str:
+        name = self.nvml.nvmlDeviceGetName(handle)
+        # Older pynvml returns bytes, newer returns str
+        return name.decode('utf-8') if isinstance(name, bytes) else name
+    
+    def _nvidia_temperature_limit(self, handle) -> Optional[float]:
+        """Temperature at which the GPU starts slowing its clocks"""
+        try:
+            return self.nvml.nvmlDeviceGetTemperatureThreshold(handle, self.nvml.NVML_TEMPERATURE_THRESHOLD_SLOWDOWN)
+        except Exception:
+            return None
+    
     def get_nvidia_gpu_metrics(self, device_index: int = 0) -> Optional[Dict]:
         """Get NVIDIA GPU metrics using pynvml"""
-        if not self.nvidia_available or device_index >= self.nvidia_device_count:
+        if not self.nvidia_available or device_index >= len(self.nvidia_handles):
             return None
         
         try:
-            handle = pynvml.nvmlDeviceGetHandleByIndex(device_index)
-            
-            # Get GPU name
-            name = pynvml.nvmlDeviceGetName(handle).decode('utf-8')
+            handle = self.nvidia_handles[device_index]
+            name = self.nvidia_names[device_index]
             
             # Get memory info
-            mem_info = pynvml.nvmlDeviceGetMemoryInfo(handle)
+            mem_info = self.nvml.nvmlDeviceGetMemoryInfo(handle)
             
             # Get utilization
-            util = pynvml.nvmlDeviceGetUtilizationRates(handle)
+            util = self.nvml.nvmlDeviceGetUtilizationRates(handle)
             
             # Get temperature
-            temp = pynvml.nvmlDeviceGetTemperature(handle, pynvml.NVML_TEMPERATURE_GPU)
+            temp = self.nvml.nvmlDeviceGetTemperature(handle, self.nvml.NVML_TEMPERATURE_GPU)
             
             # Get power usage
             try:
-                power = pynvml.nvmlDeviceGetPowerUsage(handle) / 1000.0  # Convert mW to W
+                power = self.nvml.nvmlDeviceGetPowerUsage(handle) / 1000.0  # Convert mW to W
             except:
                 power = None
             
             # Get clock speeds
             try:
-                graphics_clock = pynvml.nvmlDeviceGetClockInfo(handle, pynvml.NVML_CLOCK_GRAPHICS)
-                memory_clock = pynvml.nvmlDeviceGetClockInfo(handle, pynvml.NVML_CLOCK_MEM)
+                graphics_clock = self.nvml.nvmlDeviceGetClockInfo(handle, self.nvml.NVML_CLOCK_GRAPHICS)
+                memory_clock = self.nvml.nvmlDeviceGetClockInfo(handle, self.nvml.NVML_CLOCK_MEM)
             except:
                 graphics_clock = None
                 memory_clock = None
             
+            # Get power limit and throttle reasons
+            try:
+                power_limit = self.nvml.nvmlDeviceGetEnforcedPowerLimit(handle) / 1000.0
+            except Exception:
+                power_limit = None
+            try:
+                throttle_reasons = decode_nvml_reasons(self.nvidia_throttle_reasons(handle))
+            except Exception:
+                throttle_reasons = None
+            
             return {
                 "model": name,
                 "vendor": "NVIDIA",
@@ -157,6 +246,9 @@ class MetricsCollector:
                 "memoryUtilization": util.memory,
                 "temperature": temp,
                 "powerDraw": power,
+                "powerLimit": power_limit,
+                "temperatureLimit": self.nvidia_temperature_limits[device_index],
+                "throttleReasons": throttle_reasons,
                 "graphicsClock": graphics_clock,
                 "memoryClock": memory_clock
             }
@@ -165,10 +257,24 @@ class MetricsCollector:
             return None
     
     def get_rocm_gpu_metrics(self) -> Optional[Dict]:
-        """Get AMD ROCm GPU metrics using rocm-smi"""
+        """Get metrics for the first AMD GPU"""
+        gpus = self.get_all_rocm_gpu_metrics()
+        return gpus[0] if gpus else None
+    
+    def get_all_rocm_gpu_metrics(self) -> List[Dict]:
+        """Get metrics for every AMD GPU from amdgpu sysfs, falling back to rocm-smi"""
+        if self.amd_sysfs.available:
+            try:
+                return self.amd_sysfs.read_all()
+            except Exception as e:
+                logger.error(f"Error reading amdgpu sysfs metrics: {e}")
+        return self.get_rocm_smi_gpu_metrics()
+    
+    def get_rocm_smi_gpu_metrics(self) -> List[Dict]:
+        """Get metrics for every AMD GPU from a single rocm-smi invocation"""
         try:
             # Try JSON format first
-            result = subprocess.run(
+            result = self.run_command(
                 ["rocm-smi", "--showid", "--showproductname", "--showmemuse", "--showtemp", "--showuse", "--json"],
                 capture_output=True,
                 text=True,
@@ -180,103 +286,33 @@ class MetricsCollector:
                     data = json.loads(result.stdout)
                     # Parse rocm-smi JSON output
                     # Format can be: {"card0": {...}} or {"card": [...]} or direct object
-                    gpu = None
+                    gpus = []
                     
                     # Try card0, card1, etc. format first
-                    for key in data.keys():
-                        if key.startswith("card"):
-                            gpu = data[key]
-                            break
+                    for key in sorted((k for k in data.keys() if re.fullmatch(r"card\d+", k)),
+                                      key=lambda k: int(k[4:])):
+                        gpus.append(data[key])
                     
                     # Try card array format
-                    if not gpu and "card" in data:
+                    if not gpus and "card" in data:
                         cards = data["card"]
-                        if isinstance(cards, list) and len(cards) > 0:
-                            gpu = cards[0]
+                        if isinstance(cards, list):
+                            gpus = [card for card in cards if isinstance(card, dict)]
                         elif isinstance(cards, dict):
-                            gpu = cards
+                            gpus = [cards]
                     
                     # If still no GPU, try direct object
-                    if not gpu and isinstance(data, dict) and "Device Name" in data:
-                        gpu = data
+                    if not gpus and isinstance(data, dict) and "Device Name" in data:
+                        gpus = [data]
                     
-                    if gpu:
-                        # Try different field names that rocm-smi might use
-                        model = (gpu.get("Card Series") or 
-                                gpu.get("Card series") or 
-                                gpu.get("Device Name") or 
-                                gpu.get("Card Model") or 
-                                gpu.get("Card SKU") or 
-                                gpu.get("Card Vendor") or 
-                                "AMD GPU")
-                        
-                        # Check for Strix Halo in SKU or model
-                        model_lower = model.lower()
-                        sku = gpu.get("Card SKU", "").lower()
-                        if "strix" in model_lower or "halo" in model_lower or "strix" in sku or "halo" in sku:
-                            model = "AMD Strix Halo (RDNA 3.5)"
-                        
-                        # Memory in bytes - try different field names
-                        mem_total = 0
-                        mem_used = 0
-                        
-                        # Try to get memory from various fields
-                        vram_total = (gpu.get("VRAM Total Memory (B)") or 
-                                     gpu.get("VRAM Total Memory(B)") or 
-                                     gpu.get("vram_total_memory") or 0)
-                        vram_used = (gpu.get("VRAM Total Used Memory (B)") or 
-                                   gpu.get("VRAM Total Used Memory(B)") or 
-                                   gpu.get("vram_used_memory") or 0)
-                        
-                        # If memory not found, try to estimate from VRAM% or use defaults
-                        if vram_total > 0:
-                            mem_total = int(vram_total) if isinstance(vram_total, str) else vram_total
-                            mem_used = int(vram_used) if isinstance(vram_used, str) else vram_used
-                        else:
-                            # Estimate from model or use defaults
-                            if "strix" in model_lower or "halo" in model_lower:
-                                mem_total = 16 * 1024 * 1024 * 1024  # 16GB for Strix Halo
-                            else:
-                                mem_total = 8 * 1024 * 1024 * 1024  # 8GB default
-                            
-                            # Try to get memory usage from VRAM% if available
-                            vram_percent = gpu.get("GPU Memory Allocated (VRAM%)")
-                            if vram_percent:
-                                try:
-                                    vram_pct = float(str(vram_percent).replace("%", ""))
-                                    mem_used = int(mem_total * vram_pct / 100)
-                                except:
-                                    pass
-                        
-                        # Utilization and temperature - handle string values
-                        utilization_str = (gpu.get("GPU use (%)") or 
-                                         gpu.get("GPU use(%)") or 
-                                         gpu.get("gpu_use_percent") or "0")
-                        utilization = float(str(utilization_str).replace("%", "")) if utilization_str else 0
-                        
-                        temp_str = (gpu.get("Temperature (Sensor edge) (C)") or 
-                                   gpu.get("Temperature (Sensor 1) (C)") or 
-                                   gpu.get("Temperature(Sensor 1)(C)") or 
-                                   gpu.get("temperature") or "0")
-                        temp = float(str(temp_str).replace("C", "").strip()) if temp_str else 0
-                        
-                        return {
-                            "model": model,
-                            "vendor": "AMD",
-                            "memoryTotal": mem_total,
-                            "memoryUsed": mem_used,
-                            "memoryFree": max(0, mem_total - mem_used),
-                            "memoryPercent": (mem_used / mem_total * 100) if mem_total > 0 else 0,
-                            "utilization": utilization,
-                            "memoryUtilization": utilization,  # Use GPU utilization as memory utilization
-                            "temperature": temp
-                        }
+                    if gpus:
+                        return [self._parse_rocm_smi_card(gpu) for gpu in gpus]
                 except json.JSONDecodeError:
                     # If JSON parsing fails, try text format
                     pass
             
             # Fallback: Try text format parsing
-            result = subprocess.run(
+            result = self.run_command(
                 ["rocm-smi", "-i", "0", "-d"],
                 capture_output=True,
                 text=True,
@@ -308,7 +344,6 @@ class MetricsCollector:
                     # Try to extract memory
                     if 'memory' in line_lower or 'vram' in line_lower:
                         # Look for memory values
-                        import re
                         mem_match = re.search(r'(\d+)\s*(gb|mb|b)', line_lower)
                         if mem_match:
                             value = int(mem_match.group(1))
@@ -331,7 +366,7 @@ class MetricsCollector:
                             temp = float(temp_match.group(1))
                 
                 if mem_total > 0 or model != "AMD GPU":
-                    return {
+                    return [{
                         "model": model,
                         "vendor": "AMD",
                         "memoryTotal": mem_total,
@@ -341,14 +376,90 @@ class MetricsCollector:
                         "utilization": utilization,
                         "memoryUtilization": utilization,
                         "temperature": temp
-                    }
+                    }]
                     
         except FileNotFoundError:
             logger.debug("rocm-smi not found")
         except Exception as e:
             logger.error(f"Error getting ROCm GPU metrics: {e}")
         
-        return None
+        return []
+    
+    def _parse_rocm_smi_card(self, gpu: Dict) -> Dict:
+        """Convert one card entry of rocm-smi JSON output to GPU metrics"""
+        # Try different field names that rocm-smi might use
+        model = (gpu.get("Card Series") or 
+                gpu.get("Card series") or 
+                gpu.get("Device Name") or 
+                gpu.get("Card Model") or 
+                gpu.get("Card SKU") or 
+                gpu.get("Card Vendor") or 
+                "AMD GPU")
+
+        # Check for Strix Halo in SKU or model
+        model_lower = model.lower()
+        sku = gpu.get("Card SKU", "").lower()
+        if "strix" in model_lower or "halo" in model_lower or "strix" in sku or "halo" in sku:
+            model = "AMD Strix Halo (RDNA 3.5)"
+
+        # Memory in bytes - try different field names
+        mem_total = 0
+        mem_used = 0
+
+        # Try to get memory from various fields
+        vram_total = (gpu.get("VRAM Total Memory (B)") or 
+                     gpu.get("VRAM Total Memory(B)") or 
+                     gpu.get("vram_total_memory") or 0)
+        vram_used = (gpu.get("VRAM Total Used Memory (B)") or 
+                   gpu.get("VRAM Total Used Memory(B)") or 
+                   gpu.get("vram_used_memory") or 0)
+        # rocm-smi reports these as strings
+        vram_total = int(vram_total)
+        vram_used = int(vram_used)
+
+        # If memory not found, try to estimate from VRAM% or use defaults
+        if vram_total > 0:
+            mem_total = vram_total
+            mem_used = vram_used
+        else:
+            # Estimate from model or use defaults
+            if "strix" in model_lower or "halo" in model_lower:
+                mem_total = 16 * 1024 * 1024 * 1024  # 16GB for Strix Halo
+            else:
+                mem_total = 8 * 1024 * 1024 * 1024  # 8GB default
+
+            # Try to get memory usage from VRAM% if available
+            vram_percent = gpu.get("GPU Memory Allocated (VRAM%)")
+            if vram_percent:
+                try:
+                    vram_pct = float(str(vram_percent).replace("%", ""))
+                    mem_used = int(mem_total * vram_pct / 100)
+                except:
+                    pass
+
+        # Utilization and temperature - handle string values
+        utilization_str = (gpu.get("GPU use (%)") or 
+                         gpu.get("GPU use(%)") or 
+                         gpu.get("gpu_use_percent") or "0")
+        utilization = float(str(utilization_str).replace("%", "")) if utilization_str else 0
+
+        temp_str = (gpu.get("Temperature (Sensor edge) (C)") or 
+                   gpu.get("Temperature (Sensor 1) (C)") or 
+                   gpu.get("Temperature(Sensor 1)(C)") or 
+                   gpu.get("temperature") or "0")
+        temp = float(str(temp_str).replace("C", "").strip()) if temp_str else 0
+
+        return {
+            "model": model,
+            "vendor": "AMD",
+            "memoryTotal": mem_total,
+            "memoryUsed": mem_used,
+            "memoryFree": max(0, mem_total - mem_used),
+            "memoryPercent": (mem_used / mem_total * 100) if mem_total > 0 else 0,
+            "utilization": utilization,
+            "memoryUtilization": utilization,  # Use GPU utilization as memory utilization
+            "temperature": temp
+        }
     
     def get_battery_metrics(self) -> Optional[Dict]:
         """Get battery metrics using psutil"""
@@ -365,56 +476,1158 @@ class MetricsCollector:
         
         return None
     
+    def get_all_gpu_metrics(self) -> List[Dict]:
+        """Get metrics for every GPU in one pass, preferring NVIDIA and falling back to ROCm"""
+        gpus = []
+        if self.nvidia_available:
+            gpus = [m for m in (self.get_nvidia_gpu_metrics(i) for i in range(len(self.nvidia_handles))) if m]
+        if not gpus:
+            gpus = self.get_all_rocm_gpu_metrics()
+        for index, gpu in enumerate(gpus):
+            gpu["index"] = index
+        return gpus
+    
+    def get_gpu_metrics(self) -> Optional[Dict]:
+        """Get metrics for the first GPU"""
+        gpus = self.get_all_gpu_metrics()
+        return gpus[0] if gpus else None
+    
     def get_all_metrics(self) -> Dict:
         """Collect all available metrics"""
-        metrics = {
+        gpus = self.get_all_gpu_metrics()
+        return {
             "timestamp": datetime.now().isoformat(),
             "cpu": self.get_cpu_metrics(),
             "memory": self.get_memory_metrics(),
-            "gpu": None,
+            "gpu": gpus[0] if gpus else None,
+            "gpus": gpus,
+            "gpuSummary": summarize_gpus(gpus),
             "battery": self.get_battery_metrics()
         }
-        
-        # Try NVIDIA first
-        if self.nvidia_available:
-            gpu_metrics = self.get_nvidia_gpu_metrics(0)
-            if gpu_metrics:
-                metrics["gpu"] = gpu_metrics
-        
-        # Try ROCm if NVIDIA not available
-        if not metrics["gpu"]:
-            gpu_metrics = self.get_rocm_gpu_metrics()
-            if gpu_metrics:
-                metrics["gpu"] = gpu_metrics
-        
+
+
+def summarize_gpus(gpus: List[Dict]) -> Optional[Dict]:
+    """Node-level aggregates across all GPUs"""
+    if not gpus:
+        return None
+    utilizations = [gpu.get("utilization") or 0 for gpu in gpus]
+    powers = [gpu["powerDraw"] for gpu in gpus if gpu.get("powerDraw") is not None]
+    memory_total = sum(gpu.get("memoryTotal") or 0 for gpu in gpus)
+    memory_used = sum(gpu.get("memoryUsed") or 0 for gpu in gpus)
+    return {
+        "count": len(gpus),
+        "memoryTotal": memory_total,
+        "memoryUsed": memory_used,
+        "memoryFree": max(0, memory_total - memory_used),
+        "memoryPercent": (memory_used / memory_total * 100) if memory_total > 0 else 0,
+        "utilizationMean": sum(utilizations) / len(utilizations),
+        "utilizationMax": max(utilizations),
+        "powerDraw": sum(powers) if powers else None
+    }
+
+
+class MetricSource:
+    """A single collection function sampled on its own cadence with its own timeout"""
+
+    def __init__(self, name: str, collect: Callable[[], object], interval: float, timeout: float, default=None):
+        self.name = name
+        self.collect = collect
+        # The configured cadence is the fastest this source will ever be sampled
+        self.min_interval = interval
+        self.interval = interval
+        self.timeout = timeout
+        self.value = default
+        self.updated_at: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.timeouts = 0
+        self.errors = 0
+        self.durations = Histogram()
+        # Called with every new value, for consumers that need each sample rather than the latest
+        self.listeners: List[Callable[[object], None]] = []
+        self._pending: Optional[asyncio.Future] = None
+        self._wakeup = asyncio.Event()
+
+    def status(self) -> Dict:
+        """Summarize freshness and failures for health reporting"""
+        return {
+            "interval": self.interval,
+            "age": round(time.monotonic() - self.updated_at, 3) if self.updated_at else None,
+            "lastDuration": round(self.last_duration, 4) if self.last_duration is not None else None,
+            "busy": self._pending is not None and not self._pending.done(),
+            "timeouts": self.timeouts,
+            "errors": self.errors
+        }
+
+
+class CollectionScheduler:
+    """Runs the metric sources that somebody needs off the event loop and keeps the latest value of each
+    
+    Consumers (WebSocket streams, the history recorder, HTTP requests) declare which
+    sources they need and how often; each source runs at the fastest requested rate,
+    never faster than its own cadence, and not at all when nobody needs it.
+    """
+
+    def __init__(self, collector: MetricsCollector):
+        self.collector = collector
+        self.sources: Dict[str, MetricSource] = {
+            source.name: source for source in [
+                MetricSource("cpu", collector.get_cpu_load, interval=0.25, timeout=1.0,
+                             default={"utilization": 0, "frequency": None}),
+                MetricSource("gpu", collector.get_all_gpu_metrics, interval=0.25, timeout=3.0, default=[]),
+                MetricSource("memory", collector.get_memory_metrics, interval=1.0, timeout=1.0,
+                             default={"total": 0, "used": 0, "available": 0, "percent": 0}),
+                MetricSource("io", collector.get_io_metrics, interval=1.0, timeout=2.0,
+                             default={"disk": None, "network": None}),
+                MetricSource("process", collector.get_process_metrics, interval=1.0, timeout=2.0,
+                             default={"processes": [], "total": None}),
+                MetricSource("battery", collector.get_battery_metrics, interval=30.0, timeout=2.0),
+                MetricSource("static", collector.get_static_info, interval=30.0, timeout=2.0,
+                             default={"cores": 0, "maxFrequency": None}),
+            ]
+        }
+        # One worker per source: a hung probe only ever ties up its own thread
+        self._executor = ThreadPoolExecutor(max_workers=len(self.sources), thread_name_prefix="metrics")
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._demand: Dict[str, Dict[str, float]] = {}
+        self._leases: Dict[str, float] = {}
+        # Bumped on every source update so consumers can cache anything derived from a snapshot
+        self.version = 0
+        self._updated = asyncio.Event()
+        # Non-hardware sections (e.g. inference stats) added to every snapshot
+        self.extras: Dict[str, Callable[[], object]] = {}
+        # When set, another process samples the hardware and demand is forwarded to it (see shared_metrics)
+        self.remote = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def require(self, owner: str, needs: Dict[str, float]):
+        """Declare (or replace) the sources an owner needs, mapped to the interval it wants them at"""
+        self._demand[owner] = dict(needs)
+        self._leases.pop(owner, None)
+        self._apply_demand()
+
+    def release(self, owner: str):
+        """Drop an owner's demand; sources nobody needs stop being sampled"""
+        self._demand.pop(owner, None)
+        self._leases.pop(owner, None)
+        self._apply_demand()
+
+    def lease(self, owner: str, needs: Dict[str, float], ttl: float):
+        """Require sources for a limited time, for consumers without a connection (HTTP polling)"""
+        renewing = owner in self._leases
+        if self._demand.get(owner) != needs:
+            self._demand[owner] = dict(needs)
+            self._apply_demand()
+        self._leases[owner] = time.monotonic() + ttl
+        if not renewing:
+            asyncio.get_running_loop().call_later(ttl, self._expire, owner)
+
+    def _expire(self, owner: str):
+        expires = self._leases.get(owner)
+        if expires is None:
+            return
+        remaining = expires - time.monotonic()
+        if remaining > 0:
+            # Renewed since the timer was set; check again when the renewed lease runs out
+            asyncio.get_running_loop().call_later(remaining, self._expire, owner)
+        else:
+            self.release(owner)
+
+    def use_remote(self, remote):
+        """Take samples from another process instead of polling here, or poll locally again with None"""
+        self.remote = remote
+        self._apply_demand()
+
+    def _apply_demand(self):
+        wanted: Dict[str, float] = {}
+        for needs in self._demand.values():
+            for name, interval in needs.items():
+                wanted[name] = min(wanted.get(name, float("inf")), interval)
+        if self.remote is not None:
+            for task in self._tasks.values():
+                task.cancel()
+            self._tasks.clear()
+            self.remote.request({name: max(self.sources[name].min_interval, interval)
+                                 for name, interval in wanted.items()})
+            return
+        for name, source in self.sources.items():
+            if name in wanted:
+                interval = max(source.min_interval, wanted[name])
+                if interval < source.interval:
+                    source._wakeup.set()
+                source.interval = interval
+                if name not in self._tasks:
+                    self._tasks[name] = asyncio.create_task(self._poll(source))
+                    logger.info(f"Sampling '{name}' every {interval}s")
+            elif name in self._tasks:
+                self._tasks.pop(name).cancel()
+                logger.info(f"Stopped sampling '{name}' (no consumers)")
+
+    async def stop(self):
+        """Cancel all polling tasks"""
+        self._demand.clear()
+        self._leases.clear()
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def mark_updated(self):
+        """Record that a source has a new value and wake everyone waiting for one"""
+        self.version += 1
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def wait_for_update(self, version: int, timeout: float) -> bool:
+        """Wait until the version moves past the given one; False if the timeout ran out first"""
+        if self.version != version:
+            return True
+        try:
+            await asyncio.wait_for(self._updated.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def has_reported(self, names) -> bool:
+        return all(self.sources[name].updated_at for name in names)
+
+    async def wait_ready(self, names=None, timeout: float = 1.0):
+        """Wait until the given sources (default: all running ones) have reported once, or until the timeout"""
+        names = list(names if names is not None else self._tasks)
+        deadline = time.monotonic() + timeout
+        while not self.has_reported(names) and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+
+    async def _poll(self, source: MetricSource):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = time.monotonic()
+            source._wakeup.clear()
+            # Never stack calls: if the last probe is still running, keep waiting on it
+            if source._pending is None or source._pending.done():
+                source._pending = loop.run_in_executor(self._executor, self._timed, source)
+            try:
+                value, duration = await asyncio.wait_for(asyncio.shield(source._pending), source.timeout)
+                source.value = value
+                source.last_duration = duration
+                source.durations.observe(duration)
+                source.updated_at = time.monotonic()
+                self.mark_updated()
+                for listener in source.listeners:
+                    listener(value)
+            except asyncio.TimeoutError:
+                source.timeouts += 1
+                logger.warning(f"Metric source '{source.name}' timed out after {source.timeout}s")
+            except Exception as e:
+                source.errors += 1
+                logger.error(f"Error collecting '{source.name}' metrics: {e}")
+            # Sleep until the next sample is due, or until a consumer asks for a faster rate
+            try:
+                remaining = max(0.0, source.interval - (time.monotonic() - started))
+                await asyncio.wait_for(source._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def _timed(source: MetricSource):
+        started = time.perf_counter()
+        value = source.collect()
+        return value, time.perf_counter() - started
+
+    def snapshot(self) -> Dict:
+        """Assemble the latest value of every source into one metrics document"""
+        values = {name: source.value for name, source in self.sources.items()}
+        gpus = values["gpu"]
+        metrics = {
+            "timestamp": datetime.now().isoformat(),
+            "cpu": {**values["cpu"], **values["static"]},
+            "memory": values["memory"],
+            "gpu": gpus[0] if gpus else None,
+            "gpus": gpus,
+            "gpuSummary": summarize_gpus(gpus),
+            "disk": values["io"]["disk"],
+            "network": values["io"]["network"],
+            "process": values["process"],
+            "battery": values["battery"]
+        }
+        for name, extra in self.extras.items():
+            metrics[name] = extra()
         return metrics
 
+    def status(self) -> Dict:
+        if self.remote is not None:
+            return self.remote.status()
+        return {name: {**source.status(), "active": name in self._tasks} for name, source in self.sources.items()}
+
+
+# Metric groups clients can subscribe to, and the sources each one needs
+METRIC_GROUPS = {
+    "cpu": ("cpu", "static"),
+    "memory": ("memory",),
+    "gpu": ("gpu",),
+    "io": ("io",),
+    "process": ("process",),
+    "battery": ("battery",),
+    "inference": (),
+    "throttle": ("gpu",),
+    "cluster": (),
+}
+ALL_GROUPS = tuple(METRIC_GROUPS)
+GPU_GROUP_PATTERN = re.compile(r"gpu\[(\d+)\]")
+MIN_STREAM_INTERVAL = 0.25
+MAX_STREAM_INTERVAL = 60.0
+
+
+def parse_groups(groups) -> tuple:
+    """Normalize a list like ["cpu", "gpu[0]", "gpu[3]"]; raises ValueError on unknown names"""
+    parsed = set()
+    for group in groups:
+        if group not in METRIC_GROUPS and not GPU_GROUP_PATTERN.fullmatch(group):
+            raise ValueError(f"Unknown metric group '{group}' (expected one of {', '.join(ALL_GROUPS)} or gpu[i])")
+        parsed.add(group)
+    if not parsed:
+        raise ValueError("Subscribe to at least one metric group")
+    return tuple(sorted(parsed))
+
+
+def sources_for(groups) -> Set[str]:
+    """Sources needed to serve a set of metric groups"""
+    names = set()
+    for group in groups:
+        names.update(METRIC_GROUPS.get(group, ("gpu",)))
+    return names
+
+
+def project(metrics: Dict, groups) -> Dict:
+    """Keep only the parts of a metrics document that belong to the given groups"""
+    view = {"timestamp": metrics["timestamp"]}
+    for group in ("cpu", "memory", "process", "battery", "inference", "throttle", "cluster"):
+        if group in groups and group in metrics:
+            view[group] = metrics[group]
+    if "io" in groups:
+        view["disk"] = metrics["disk"]
+        view["network"] = metrics["network"]
+    if "gpu" in groups:
+        view["gpu"] = metrics["gpu"]
+        view["gpus"] = metrics["gpus"]
+        view["gpuSummary"] = metrics["gpuSummary"]
+    else:
+        indices = {int(m.group(1)) for m in map(GPU_GROUP_PATTERN.fullmatch, groups) if m}
+        if indices:
+            selected = [gpu for gpu in metrics["gpus"] if gpu.get("index") in indices]
+            view["gpu"] = selected[0] if selected else None
+            view["gpus"] = selected
+    return view
+
 
 collector = MetricsCollector()
+scheduler = CollectionScheduler(collector)
+inference_stats = InferenceStats()
+proxy = ChatCompletionsProxy(stats=inference_stats)
+scheduler.extras["inference"] = inference_stats.summary
+
+# Deterministic (temperature 0) completions are served from cache; MULTIVERSE_CACHE=0 turns it off
+response_cache = ResponseCache(
+    max_bytes=int(os.environ.get("MULTIVERSE_CACHE_MAX_BYTES", 64 * 2**20)),
+    ttl=float(os.environ.get("MULTIVERSE_CACHE_TTL", 3600)),
+    disk_dir=os.environ.get("MULTIVERSE_CACHE_DIR") or None,
+    disk_max_bytes=int(os.environ.get("MULTIVERSE_CACHE_DISK_MAX_BYTES", 2**30))
+) if os.environ.get("MULTIVERSE_CACHE", "1") != "0" else None
+# Identical deterministic requests in flight share one upstream generation; MULTIVERSE_COALESCE=0 turns it off
+coalescer = Coalescer() if os.environ.get("MULTIVERSE_COALESCE", "1") != "0" else None
+
+# Every GPU sample feeds the power trace that generation energy is integrated over
+power_trace = PowerTrace(seconds=float(os.environ.get("MULTIVERSE_ENERGY_TRACE_SECONDS", 3600)))
+generations = GenerationLedger(power_trace)
+scheduler.sources["gpu"].listeners.append(power_trace.record)
+# Every GPU sample also updates the throttle baselines; episodes show up in the document and the event log
+throttle_detector = ThrottleDetector()
+scheduler.sources["gpu"].listeners.append(throttle_detector.record)
+scheduler.extras["throttle"] = throttle_detector.summary
+ENERGY_SAMPLE_INTERVAL = 0.25
+ENERGY_TAIL_SECONDS = 2.0
+
+
+def _update_energy_demand():
+    """Sample GPUs at full rate while any generation is running, plus a short tail to cover its end
+
+    Client-opened generations only hold the rate until they would expire, so
+    one that is never ended cannot keep GPUs at full rate for good.
+    """
+    generations.expire_open()
+    open_until = generations.open_until()
+    if inference_stats.active:
+        scheduler.require("energy", {"gpu": ENERGY_SAMPLE_INTERVAL})
+    elif open_until is not None:
+        ttl = min(open_until - time.time(), generations.max_open_seconds)
+        scheduler.lease("energy", {"gpu": ENERGY_SAMPLE_INTERVAL}, max(ttl, 0.0) + ENERGY_TAIL_SECONDS)
+    else:
+        scheduler.lease("energy", {"gpu": ENERGY_SAMPLE_INTERVAL}, ENERGY_TAIL_SECONDS)
+
+
+def _tag_proxied(record: Dict):
+    """Every generation relayed by the proxy is tagged with its measured window"""
+    if not record.get("error"):
+        generations.tag(record["startedAt"], record["endedAt"], model=record.get("model"),
+                        completion_tokens=record.get("completionTokens"), prompt_tokens=record.get("promptTokens"),
+                        source="proxy", label=f"proxy:{record['id']}")
+    _update_energy_demand()
+
+
+inference_stats.on_begin = _update_energy_demand
+inference_stats.on_finish = _tag_proxied
+
+
+class Subscriber:
+    """A WebSocket client's mailbox holding only the most recent frame"""
+
+    def __init__(self, codec: Optional[Codec] = None):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.codec = codec
+        self.stream: Optional["MetricsStream"] = None
+        self.last_seq: Optional[int] = None
+        self.dropped = 0
+        self.closed = False
+        self.replay: Optional[asyncio.Task] = None
+
+    def offer(self, frame: Union[Frame, Dict, None]):
+        """Queue a frame (or a control message), replacing any frame the client has not picked up yet"""
+        if self.closed:
+            return
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(frame)
+
+    def close(self):
+        """Wake the sender with a sentinel so it can exit"""
+        if self.replay is not None:
+            self.replay.cancel()
+        self.offer(None)
+        self.closed = True
+
+    def encode(self, frame: Frame):
+        """Encode a frame for this client's protocol (plain JSON, or keyframe/delta)"""
+        if self.codec is None:
+            return frame.json()
+        payload = frame.encode(self.codec, self.last_seq)
+        self.last_seq = frame.seq
+        return payload
+
+
+class MetricsStream:
+    """Frames for one (metric groups, interval) subscription, shared by every client that asked for it"""
+
+    def __init__(self, groups: tuple, interval: float):
+        self.groups = groups
+        self.interval = interval
+        self.sources = sources_for(groups)
+        self.subscribers: Set[Subscriber] = set()
+        self.latest_frame: Optional[Frame] = None
+        self.created_at = time.monotonic()
+        self.next_due = self.created_at
+        self._seq = 0
+
+    def publish(self, metrics: Dict):
+        """Project, wrap and hand one frame to every subscriber of this stream"""
+        self._seq += 1
+        # Each encoding is built once per frame and shared by every client that needs it
+        self.latest_frame = Frame(self._seq, time.time(), project(metrics, self.groups), self.latest_frame)
+        for subscriber in list(self.subscribers):
+            subscriber.offer(self.latest_frame)
+        self.next_due += self.interval
+        if self.next_due < time.monotonic():
+            self.next_due = time.monotonic() + self.interval
+
+
+class MetricsBroadcaster:
+    """Runs one sampling loop per process and fans each encoded frame out to all subscribers
+    
+    Clients with the same groups and interval share a stream, so encoding cost
+    grows with the number of distinct subscriptions, not the number of clients.
+    """
+
+    def __init__(self, scheduler: CollectionScheduler, interval: float = 1.0):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.streams: Dict[tuple, MetricsStream] = {}
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscribers(self) -> Set[Subscriber]:
+        return {subscriber for stream in self.streams.values() for subscriber in stream.subscribers}
+
+    def subscribe(self, codec: Optional[Codec] = None, groups=ALL_GROUPS, interval: Optional[float] = None) -> Subscriber:
+        """Register a new subscriber (all groups at the default rate) and make sure the sampler is running"""
+        subscriber = Subscriber(codec)
+        self.update(subscriber, groups, interval or self.interval)
+        return subscriber
+
+    def update(self, subscriber: Subscriber, groups, interval: float):
+        """Move a subscriber to the stream for the given groups and interval"""
+        groups = parse_groups(groups)
+        interval = min(MAX_STREAM_INTERVAL, max(MIN_STREAM_INTERVAL, float(interval)))
+        self._detach(subscriber)
+        stream = self.streams.get((groups, interval))
+        if stream is None:
+            stream = self.streams[(groups, interval)] = MetricsStream(groups, interval)
+        stream.subscribers.add(subscriber)
+        subscriber.stream = stream
+        subscriber.last_seq = None
+        if stream.latest_frame is not None:
+            subscriber.offer(stream.latest_frame)
+        self._apply()
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """Remove a subscriber; the sampler stops once nobody is left"""
+        self._detach(subscriber)
+        self._apply()
+
+    def _detach(self, subscriber: Subscriber):
+        stream = subscriber.stream
+        if stream is not None:
+            stream.subscribers.discard(subscriber)
+            if not stream.subscribers:
+                self.streams.pop((stream.groups, stream.interval), None)
+            subscriber.stream = None
+
+    def _apply(self):
+        """Tell the scheduler what the streams need, and start or wake the sampler"""
+        needs: Dict[str, float] = {}
+        for stream in self.streams.values():
+            for name in stream.sources:
+                needs[name] = min(needs.get(name, float("inf")), stream.interval)
+        if needs:
+            self.scheduler.require("websocket", needs)
+        else:
+            self.scheduler.release("websocket")
+        self._changed.set()
+        if self.streams and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        """Publish each stream when it is due, sleeping until the earliest next one"""
+        logger.info("Metrics sampler started")
+        while self.streams:
+            self._changed.clear()
+            now = time.monotonic()
+            try:
+                metrics = None
+                for stream in list(self.streams.values()):
+                    if stream.next_due > now:
+                        continue
+                    # Give a new stream's sources a moment to report before its first frame
+                    if not self.scheduler.has_reported(stream.sources) and now - stream.created_at < 1.0:
+                        stream.next_due = now + 0.05
+                        continue
+                    if metrics is None:
+                        metrics = self.scheduler.snapshot()
+                    stream.publish(metrics)
+            except Exception as e:
+                logger.error(f"Error sampling metrics: {e}")
+            if not self.streams:
+                break
+            delay = max(0.0, min(stream.next_due for stream in self.streams.values()) - time.monotonic())
+            try:
+                await asyncio.wait_for(self._changed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Metrics sampler stopped (no subscribers)")
+
+
+broadcaster = MetricsBroadcaster(scheduler)
+history = MetricsHistory(capacity=int(os.environ.get("MULTIVERSE_HISTORY_SECONDS", 24 * 60 * 60)))
+background_tasks: List[asyncio.Task] = []
+HTTP_LEASE_SECONDS = 30.0
+
+# MULTIVERSE_RECORD_DIR keeps every history sample on disk, one file per day, for replay and export
+recorder: Optional[MetricsRecorder] = None
+if os.environ.get("MULTIVERSE_RECORD_DIR"):
+    recorder = MetricsRecorder(os.environ["MULTIVERSE_RECORD_DIR"], fields=history.fields,
+                               retention_days=int(os.environ.get("MULTIVERSE_RECORD_RETENTION_DAYS", 0)))
+REPLAY_MIN_SPEED = 1.0
+REPLAY_MAX_SPEED = 100.0
+# Periods with no samples (the server was down) are skipped rather than waited through
+REPLAY_MAX_GAP = 5.0
+
+# With several uvicorn workers, point MULTIVERSE_SHARED_METRICS at a segment (e.g. /dev/shm/multiverse-metrics):
+# one worker samples the hardware and the others read its samples, so collection cost does not grow with workers
+shared_sampling: Optional[SharedSampling] = None
+if os.environ.get("MULTIVERSE_SHARED_METRICS"):
+    if FCNTL_AVAILABLE:
+        shared_sampling = SharedSampling(scheduler, os.environ["MULTIVERSE_SHARED_METRICS"],
+                                         int(os.environ.get("MULTIVERSE_SHARED_METRICS_BYTES", 2**20)))
+    else:
+        logger.warning("MULTIVERSE_SHARED_METRICS needs POSIX file locks; sampling in every worker instead")
+
+# Hub mode: MULTIVERSE_HUB_NODES lists other metrics servers (host:port, ws:// or http:// URLs, optionally name=url);
+# their streams are merged into the "cluster" group, which dashboards receive like any other metric group
+cluster_hub: Optional[ClusterHub] = None
+if os.environ.get("MULTIVERSE_HUB_NODES"):
+    cluster_hub = ClusterHub(parse_nodes(os.environ["MULTIVERSE_HUB_NODES"]),
+                             interval=float(os.environ.get("MULTIVERSE_HUB_INTERVAL", 1.0)))
+    # Each rebuilt view is a new snapshot for ETags, long polls and streams
+    cluster_hub.on_update = scheduler.mark_updated
+    scheduler.extras["cluster"] = cluster_hub.summary
+
+
+async def _record_history(interval: float = 1.0):
+    """Record the latest assembled sample into the history ring buffer (and the recording) once per second"""
+    needs = {name: interval for name in sources_for(("cpu", "memory", "gpu", "io", "process"))}
+    scheduler.require("history", needs)
+    await scheduler.wait_ready(needs)
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            started = loop.time()
+            try:
+                timestamp = time.time()
+                row = extract(scheduler.snapshot(), history.fields)
+                if history.capacity > 0:
+                    history.append(row, timestamp)
+                if recorder:
+                    recorder.append(row, timestamp)
+            except Exception as e:
+                logger.error(f"Error recording metrics history: {e}")
+            await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
+    finally:
+        scheduler.release("history")
+
+
+def _replay_window(request: Dict) -> tuple:
+    """(since, until, speed) from a replay request: a UTC "day" or a since/until pair of Unix timestamps"""
+    if recorder is None:
+        raise ValueError("Recording is not enabled (set MULTIVERSE_RECORD_DIR)")
+    if request.get("day"):
+        try:
+            day = datetime.strptime(str(request["day"]), "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        except ValueError:
+            raise ValueError("'day' must look like 2024-01-31")
+        since = day.timestamp()
+        until = since + 86400
+    else:
+        since, until = request.get("since"), request.get("until")
+        if not isinstance(since, (int, float)) or not isinstance(until, (int, float)) or since >= until:
+            raise ValueError("Replay needs a 'day' or Unix 'since' < 'until'")
+    speed = float(request.get("speed") or 1.0)
+    return since, until, min(REPLAY_MAX_SPEED, max(REPLAY_MIN_SPEED, speed))
+
+
+async def _play_recording(subscriber: Subscriber, timestamps, values, fields: List[str], speed: float):
+    """Offer recorded samples to one subscriber, paced by their recorded spacing divided by speed"""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    elapsed = 0.0
+    previous = float(timestamps[0])
+    frame = None
+    subscriber.last_seq = None
+    for seq, (timestamp, row) in enumerate(zip(timestamps.tolist(), values.tolist()), 1):
+        elapsed += min(timestamp - previous, REPLAY_MAX_GAP)
+        previous = timestamp
+        delay = started + elapsed / speed - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        frame = Frame(seq, timestamp, to_document(timestamp, fields, row), frame)
+        subscriber.offer(frame)
+    # Let the client take the last frame before the end notice replaces it in the one-slot mailbox
+    while not subscriber.queue.empty() and not subscriber.closed:
+        await asyncio.sleep(0.01)
+    subscriber.offer({"type": "replay-end", "samples": len(timestamps)})
+
+
+async def _start_replay(websocket: WebSocket, subscriber: Subscriber, request: Dict):
+    since, until, speed = _replay_window(request)
+    timestamps, values, fields = await asyncio.to_thread(recorder.load, since, until)
+    if not len(timestamps):
+        raise ValueError(f"No recorded samples between {since} and {until}")
+    # Live frames stop while the recording plays; a subscribe message switches back
+    broadcaster.unsubscribe(subscriber)
+    await websocket.send_json({"type": "replay", "since": float(timestamps[0]), "until": float(timestamps[-1]),
+                               "samples": len(timestamps), "speed": speed})
+    subscriber.replay = asyncio.create_task(_play_recording(subscriber, timestamps, values, fields, speed))
+
+
+async def _watch_client(websocket: WebSocket, subscriber: Subscriber):
+    """Handle subscribe and replay messages until the socket disconnects, then close the subscriber
+    
+    {"type": "subscribe", "groups": ["cpu", "gpu[0]"], "interval": 5}
+    {"type": "replay", "day": "2024-01-31", "speed": 10}
+    """
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                request = json.loads(message.get("text") or message.get("bytes") or "")
+                if not isinstance(request, dict) or request.get("type") not in ("subscribe", "replay"):
+                    raise ValueError("Expected a message like {\"type\": \"subscribe\", \"groups\": [...], \"interval\": 1}")
+                if subscriber.replay is not None:
+                    subscriber.replay.cancel()
+                    subscriber.replay = None
+                if request["type"] == "replay":
+                    await _start_replay(websocket, subscriber, request)
+                    continue
+                groups = request.get("groups") or ALL_GROUPS
+                if not isinstance(groups, list) and not isinstance(groups, tuple):
+                    raise ValueError("'groups' must be a list")
+                broadcaster.update(subscriber, groups, request.get("interval") or broadcaster.interval)
+                stream = subscriber.stream
+                await websocket.send_json({"type": "subscribed", "groups": list(stream.groups), "interval": stream.interval})
+            except (ValueError, TypeError) as e:
+                await websocket.send_json({"type": "error", "message": str(e)})
+    finally:
+        subscriber.close()
 
 
 @app.websocket("/ws/metrics")
 async def websocket_metrics(websocket: WebSocket):
-    """WebSocket endpoint for real-time metrics"""
-    await websocket.accept()
-    logger.info("WebSocket connection established")
+    """WebSocket endpoint for real-time metrics
+    
+    Clients that offer the "multiverse.delta.msgpack" or "multiverse.delta.json"
+    subprotocol get a keyframe followed by frames of changed fields only;
+    everyone else gets the full JSON document every tick. Clients may send a
+    subscribe message to pick metric groups and an interval.
+    """
+    codec = negotiate(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=codec.subprotocol if codec else None)
+    logger.info(f"WebSocket connection established ({codec.subprotocol if codec else 'json'})")
+    subscriber = broadcaster.subscribe(codec)
+    watcher = asyncio.create_task(_watch_client(websocket, subscriber))
     
     try:
         while True:
-            metrics = collector.get_all_metrics()
-            await websocket.send_json(metrics)
-            await asyncio.sleep(1)  # Send metrics every second
+            frame = await subscriber.queue.get()
+            if frame is None:
+                logger.info("WebSocket connection closed")
+                break
+            if isinstance(frame, dict):
+                # Control messages (end of a replay) are sent as they are
+                await websocket.send_json(frame)
+                continue
+            payload = subscriber.encode(frame)
+            if isinstance(payload, bytes):
+                await websocket.send_bytes(payload)
+            else:
+                await websocket.send_text(payload)
     except WebSocketDisconnect:
         logger.info("WebSocket connection closed")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         await websocket.close()
+    finally:
+        watcher.cancel()
+        broadcaster.unsubscribe(subscriber)
+
+
+# ETags are "<process instance>-<scheduler version>", so a restarted server never repeats an old tag
+METRICS_ETAG_PREFIX = f"{os.getpid():x}.{int(time.time()):x}"
+MAX_LONG_POLL_SECONDS = 60.0
+_metrics_cache = {"version": None, "body": b"", "etag": None}
+
+
+def _cached_metrics() -> tuple:
+    """The latest snapshot serialized once per scheduler version, with its ETag"""
+    if _metrics_cache["version"] != scheduler.version:
+        version = scheduler.version
+        _metrics_cache["body"] = json.dumps(scheduler.snapshot(), separators=(",", ":")).encode()
+        _metrics_cache["etag"] = f'"{METRICS_ETAG_PREFIX}-{version}"'
+        _metrics_cache["version"] = version
+    return _metrics_cache["body"], _metrics_cache["etag"]
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
 
 
 @app.get("/api/metrics")
-async def get_metrics():
-    """HTTP endpoint for one-time metrics fetch"""
-    return collector.get_all_metrics()
+async def get_metrics(request: Request, wait: Optional[float] = None):
+    """HTTP endpoint for one-time metrics fetch
+    
+    Serves the latest sampled snapshot (never probes the hardware in the
+    request) with an ETag; If-None-Match gets a 304 while nothing has changed.
+    With ?wait=N and a matching If-None-Match, the request is held for up to
+    N seconds until a new sample arrives (long polling).
+    """
+    # Pollers keep every source warm for a while instead of paying a cold start each time
+    needs = {name: 1.0 for name in scheduler.sources}
+    scheduler.lease("http", needs, HTTP_LEASE_SECONDS)
+    await scheduler.wait_ready(needs)
+    if_none_match = request.headers.get("if-none-match")
+    body, etag = _cached_metrics()
+    if wait and _etag_matches(if_none_match, etag):
+        if await scheduler.wait_for_update(_metrics_cache["version"], min(wait, MAX_LONG_POLL_SECONDS)):
+            body, etag = _cached_metrics()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+SSE_KEEPALIVE_SECONDS = 15.0
+SSE_RETRY_MILLISECONDS = 2000
+
+
+@app.get("/api/metrics/stream")
+async def stream_metrics(groups: Optional[str] = None, interval: float = 1.0):
+    """Server-Sent Events stream of metrics frames, for clients that cannot use WebSockets
+    
+    Takes the same groups (comma-separated) and interval as a WebSocket
+    subscribe message and shares the WebSocket streams' frames. Each event's
+    id is the frame sequence number.
+    """
+    try:
+        parsed = parse_groups(groups.split(",")) if groups else ALL_GROUPS
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    subscriber = broadcaster.subscribe(None, parsed, interval)
+    
+    async def events():
+        try:
+            yield f"retry: {SSE_RETRY_MILLISECONDS}\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # A comment line keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                if frame is None:
+                    break
+                if isinstance(frame, Frame):
+                    yield f"id: {frame.seq}\nevent: metrics\ndata: {frame.json()}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscriber)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """OpenAI-compatible relay to the local LLM server
+    
+    Streams SSE chunks through unbuffered while measuring server-side TTFT,
+    inter-token latency and token counts (from the upstream usage block).
+    Deterministic requests are answered from the response cache when possible,
+    and identical ones already in flight share a single upstream generation.
+    """
+    path = "/v1/chat/completions"
+    payload, raw = proxy.prepare_body(await request.body())
+    key = cache_key(proxy.upstream, path, payload) if response_cache or coalescer else None
+    if response_cache and key is None:
+        response_cache.stats["bypassed"] += 1
+    if key and response_cache:
+        cached = await response_cache.get(key)
+        if cached:
+            return _replay(cached)
+    if key and coalescer:
+        flight = coalescer.join(key)
+        if flight:
+            return await _follow(flight, "COALESCED")
+        flight = coalescer.lead(key)
+    else:
+        flight = None
+    try:
+        generation = await proxy.open(path, payload, raw, request.headers)
+    except httpx.HTTPError as e:
+        logger.error(f"LLM upstream unavailable: {e}")
+        error = {"error": {"message": str(e), "type": "upstream_error"}}
+        if flight:
+            coalescer.abandon(flight, 502, json.dumps(error).encode())
+            flight.detach()
+        return JSONResponse(status_code=502, content=error)
+    except asyncio.CancelledError:
+        # The leader disconnected before the upstream answered: clients that joined must not wait forever
+        if flight:
+            error = {"error": {"message": "The request that started this generation was cancelled",
+                               "type": "upstream_error"}}
+            coalescer.abandon(flight, 502, json.dumps(error).encode())
+            flight.detach()
+        raise
+    headers = {}
+    if key:
+        if response_cache:
+            async def store(status: int, content_type: str, chunks: List[bytes]):
+                await response_cache.put(key, CachedResponse(status, content_type, chunks))
+            generation.on_complete = store
+        headers["X-Multiverse-Cache"] = "MISS"
+    if flight:
+        coalescer.run(flight, generation)
+        return await _follow(flight, "MISS")
+    upstream = generation.response
+    if generation.stream and upstream.status_code < 400:
+        return StreamingResponse(
+            generation.iter_stream(),
+            status_code=upstream.status_code,
+            headers={"Content-Type": upstream.headers.get("content-type", "text/event-stream"),
+                     "Cache-Control": "no-cache", "X-Accel-Buffering": "no", **headers}
+        )
+    content = await generation.read()
+    headers["Content-Type"] = upstream.headers.get("content-type", "application/json")
+    return Response(content=content, status_code=upstream.status_code, headers=headers)
+
+
+async def _follow(flight: Flight, cache_status: str) -> Response:
+    """Serve an attached client from a shared flight (replay of earlier chunks, then live)
+
+    Every path out of here detaches exactly once, including a client that
+    disconnects while waiting or before the streaming body is first iterated.
+    """
+    release = flight.releaser()
+    # The upstream content type is passed as a header so Starlette does not append a second charset
+    headers = {"Content-Type": flight.content_type, "X-Multiverse-Cache": cache_status}
+    try:
+        await flight.ready.wait()
+        if flight.streaming:
+            # The body detaches when it ends; the background task covers a body that never started
+            return StreamingResponse(flight.iter_chunks(release), status_code=flight.status,
+                                     background=BackgroundTask(release),
+                                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **headers})
+        await flight.wait_done()
+    except BaseException:
+        release()
+        raise
+    release()
+    return Response(content=b"".join(flight.chunks), status_code=flight.status, headers=headers)
+
+
+def _replay(cached: CachedResponse) -> Response:
+    """Serve a cached response; streams are re-sent with their original chunk boundaries"""
+    headers = {"Content-Type": cached.content_type, "X-Multiverse-Cache": "HIT"}
+    if not cached.content_type.startswith("text/event-stream"):
+        return Response(content=b"".join(cached.chunks), status_code=cached.status, headers=headers)
+
+    async def chunks():
+        for chunk in cached.chunks:
+            yield chunk
+            # One chunk per loop turn, like a live stream, so clients see separate reads
+            await asyncio.sleep(0)
+
+    return StreamingResponse(chunks(), status_code=cached.status,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **headers})
+
+
+@app.get("/v1/models")
+async def list_models(request: Request):
+    """Pass the upstream model list through so clients can point at the proxy"""
+    try:
+        upstream = await proxy.client.get("/v1/models", headers=proxy.forward_headers(request.headers))
+    except httpx.HTTPError as e:
+        return JSONResponse(status_code=502, content={"error": {"message": str(e), "type": "upstream_error"}})
+    return Response(content=upstream.content, status_code=upstream.status_code,
+                    media_type=upstream.headers.get("content-type", "application/json"))
+
+
+@app.get("/api/inference")
+async def get_inference_stats(limit: int = 50):
+    """Proxy-measured generation statistics and the most recent generations"""
+    return {
+        "upstream": proxy.upstream,
+        "summary": inference_stats.summary(),
+        "generations": list(inference_stats.records)[-limit:] if limit > 0 else [],
+        "cache": response_cache.summary() if response_cache else None,
+        "coalescing": coalescer.summary() if coalescer else None
+    }
+
+
+@app.get("/api/cache")
+async def get_cache_stats():
+    """Response cache hit/miss and byte statistics"""
+    if not response_cache:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.summary()}
+
+
+@app.delete("/api/cache")
+async def clear_cache():
+    """Drop every cached response (memory and disk)"""
+    if not response_cache:
+        return {"enabled": False}
+    await response_cache.clear()
+    return {"enabled": True, "cleared": True}
+
+
+class GenerationWindow(BaseModel):
+    """A generation reported by a client; omit endedAt to start one and end it later"""
+    startedAt: Optional[float] = None
+    endedAt: Optional[float] = None
+    model: Optional[str] = None
+    quantization: Optional[str] = None
+    completionTokens: Optional[int] = None
+    promptTokens: Optional[int] = None
+    gpus: Optional[List[int]] = None
+    label: Optional[str] = None
+
+
+class GenerationEnd(BaseModel):
+    endedAt: Optional[float] = None
+    completionTokens: Optional[int] = None
+    promptTokens: Optional[int] = None
+
+
+@app.post("/api/generations")
+async def tag_generation(window: GenerationWindow):
+    """Tag a generation with its wall-clock window (Unix seconds) for energy accounting"""
+    fields = {"model": window.model, "quantization": window.quantization, "gpus": window.gpus,
+              "completion_tokens": window.completionTokens, "prompt_tokens": window.promptTokens,
+              "label": window.label}
+    if window.endedAt is None:
+        record = generations.start(window.startedAt, **fields)
+        _update_energy_demand()
+    else:
+        if window.startedAt is None or window.endedAt <= window.startedAt:
+            raise HTTPException(status_code=400, detail="'startedAt' must be set and earlier than 'endedAt'")
+        record = generations.tag(window.startedAt, window.endedAt, **fields)
+    return generations.resolve(record)
+
+
+@app.post("/api/generations/{generation_id}/end")
+async def end_generation(generation_id: int, end: GenerationEnd):
+    """Close a generation opened with POST /api/generations"""
+    record = generations.end(generation_id, end.endedAt, end.completionTokens, end.promptTokens)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"No open generation {generation_id}")
+    _update_energy_demand()
+    return generations.resolve(record)
+
+
+@app.get("/api/generations")
+async def get_generations(
+    model: Optional[str] = None,
+    quantization: Optional[str] = None,
+    since: Optional[float] = None,
+    limit: int = 100
+):
+    """Tagged generations with integrated energy, plus tokens per joule per model and quantization"""
+    generations.expire_open()
+    return {
+        "generations": generations.query(model, quantization, since, limit),
+        "byModel": [
+            group for group in generations.by_model(since)
+            if (model is None or group["model"] == model)
+            and (quantization is None or (group["quantization"] or "").lower() == quantization.lower())
+        ],
+        "open": len(generations.open),
+        "expired": generations.expired
+    }
+
+
+_openmetrics_cache = {"version": None, "body": ""}
+SCRAPE_INTERVAL = 5.0
+SCRAPE_LEASE_SECONDS = 120.0
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus/OpenMetrics exposition of the most recent sample
+    
+    Scrapes only read the cached sample; the lease keeps sources sampled in
+    the background so the next scrape has fresh values.
+    """
+    scheduler.lease("prometheus", {name: SCRAPE_INTERVAL for name in scheduler.sources}, SCRAPE_LEASE_SECONDS)
+    if _openmetrics_cache["version"] != scheduler.version:
+        _openmetrics_cache["body"] = render_openmetrics(scheduler.snapshot(), scheduler.sources)
+        _openmetrics_cache["version"] = scheduler.version
+    return Response(content=_openmetrics_cache["body"], media_type=OPENMETRICS_CONTENT_TYPE)
+
+
+@app.get("/api/metrics/history")
+async def get_metrics_history(
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    step: Optional[float] = None,
+    fields: Optional[str] = None
+):
+    """Min/avg/max buckets of recorded metrics between two Unix timestamps"""
+    until = time.time() if until is None else until
+    since = until - 3600 if since is None else since
+    if since >= until:
+        raise HTTPException(status_code=400, detail="'since' must be earlier than 'until'")
+    if step is not None and step <= 0:
+        raise HTTPException(status_code=400, detail="'step' must be positive")
+    step = step or max(1.0, (until - since) / 500)
+    try:
+        # Wide windows touch megabytes of rows; keep that off the event loop
+        return await asyncio.to_thread(history.query, since, until, step, fields.split(",") if fields else None)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+
+
+@app.get("/api/recordings")
+async def list_recordings():
+    """Recording files on disk, with their sample counts and time ranges"""
+    if recorder is None:
+        return {"recording": None, "files": []}
+    return {"recording": recorder.status(), "files": await asyncio.to_thread(recorder.recordings)}
+
+
+@app.get("/api/recordings/export")
+async def export_recording(
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    format: str = "csv",
+    fields: Optional[str] = None
+):
+    """Recorded samples between two Unix timestamps (default: the last 24 hours) as CSV or Parquet"""
+    if recorder is None:
+        raise HTTPException(status_code=404, detail="Recording is not enabled (set MULTIVERSE_RECORD_DIR)")
+    until = time.time() if until is None else until
+    since = until - 86400 if since is None else since
+    if since >= until:
+        raise HTTPException(status_code=400, detail="'since' must be earlier than 'until'")
+    selected = fields.split(",") if fields else None
+    unknown = [field for field in selected or () if field not in recorder.fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown recording fields: {', '.join(unknown)}")
+    filename = f"multiverse-metrics-{int(since)}-{int(until)}"
+    if format == "csv":
+        # StreamingResponse runs a plain iterator in the thread pool, so reading the files stays off the event loop
+        return StreamingResponse(recorder.export_csv(since, until, selected), media_type="text/csv",
+                                 headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'})
+    if format == "parquet":
+        try:
+            body = await asyncio.to_thread(recorder.export_parquet, since, until, selected)
+        except RuntimeError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+        return Response(content=body, media_type="application/vnd.apache.parquet",
+                        headers={"Content-Disposition": f'attachment; filename="{filename}.parquet"'})
+    raise HTTPException(status_code=400, detail="'format' must be csv or parquet")
+
+
+@app.get("/api/throttle/events")
+async def get_throttle_events(since: Optional[float] = None, until: Optional[float] = None, after: Optional[int] = None):
+    """Logged throttle-start/throttle-end events, by Unix time window or after a given event id"""
+    return {"events": throttle_detector.query(since, until, after), "gpus": throttle_detector.status()}
+
+
+@app.get("/api/cluster")
+async def get_cluster():
+    """Hub mode: per-node summaries and fleet-wide totals"""
+    if cluster_hub is None:
+        raise HTTPException(status_code=404, detail="Hub mode is off (set MULTIVERSE_HUB_NODES)")
+    return {**cluster_hub.summary(), "hub": cluster_hub.status()}
+
+
+@app.get("/api/cluster/nodes/{name}")
+async def get_cluster_node(name: str):
+    """Hub mode: the latest metrics one node sent"""
+    if cluster_hub is None:
+        raise HTTPException(status_code=404, detail="Hub mode is off (set MULTIVERSE_HUB_NODES)")
+    node = cluster_hub.node(name)
+    if node is None:
+        raise HTTPException(status_code=404, detail=f"Unknown node '{name}'")
+    return node
 
 
 @app.get("/")
@@ -426,6 +1639,17 @@ async def root():
         "endpoints": {
             "websocket": "/ws/metrics",
             "metrics": "/api/metrics",
+            "metrics_stream": "/api/metrics/stream",
+            "history": "/api/metrics/history",
+            "throttle_events": "/api/throttle/events",
+            "cluster": "/api/cluster",
+            "recordings": "/api/recordings",
+            "prometheus": "/metrics",
+            "chat_completions_proxy": "/v1/chat/completions",
+            "inference": "/api/inference",
+            "cache": "/api/cache",
+            "generations": "/api/generations",
+            "inventory": "/api/inventory",
             "health": "/api/health"
         },
         "note": "WebSocket endpoints cannot be accessed via HTTP GET. Use a WebSocket client or the frontend app.",
@@ -453,6 +1677,11 @@ async def favicon():
     """Favicon endpoint - return 204 No Content to avoid 404"""
     return Response(status_code=204)
 
+@app.get("/api/inventory")
+async def gpu_inventory_info():
+    """Static GPU inventory: specs, PCI bus, NUMA node and XGMI/NVLink topology"""
+    return collector.inventory
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
@@ -460,12 +1689,54 @@ async def health_check():
         "status": "healthy",
         "nvidia_available": collector.nvidia_available,
         "rocm_available": collector.rocm_available,
-        "gpu_support": "NVIDIA" if collector.nvidia_available else ("AMD/ROCm" if collector.rocm_available else "None"),
-        "platform": platform.system()
+        "amdgpu_sysfs_available": collector.amd_sysfs.available,
+        "gpu_support": "NVIDIA" if collector.nvidia_available else (
+            "AMD/ROCm" if collector.rocm_available or collector.amd_sysfs.available else "None"),
+        "platform": platform.system(),
+        "sources": scheduler.status(),
+        "sharedMetrics": shared_sampling.summary() if shared_sampling else None,
+        "recording": recorder.status() if recorder else None,
+        "cluster": cluster_hub.status() if cluster_hub else None
     }
 
 
+@app.on_event("startup")
+async def startup():
+    """Start recording history so new dashboards open with a filled chart"""
+    if shared_sampling:
+        # Before any demand is registered, so readers never start polling hardware themselves
+        shared_sampling.start()
+    if recorder:
+        recorder.start()
+    if cluster_hub:
+        cluster_hub.start()
+    if history.capacity > 0 or recorder:
+        background_tasks.append(asyncio.create_task(_record_history()))
+    if history.capacity > 0:
+        logger.info(f"Recording metrics history ({history.capacity} samples, {history.nbytes / 2**20:.1f} MiB)")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop background collection"""
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    if recorder:
+        await asyncio.to_thread(recorder.close)
+    await scheduler.stop()
+    if shared_sampling:
+        await shared_sampling.close()
+    if cluster_hub:
+        await cluster_hub.close()
+    if coalescer:
+        await coalescer.close()
+    await proxy.close()
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # permessage-deflate is negotiated with clients that support it
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_per_message_deflate=True)
 
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+OpenMetrics exposition for Prometheus
+Renders the latest assembled sample; never collects anything itself
+"""
+
+import bisect
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from throttle_detector import SEVERITY_LEVELS
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Collection durations range from microseconds (psutil) to seconds (a slow rocm-smi)
+DURATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with O(log buckets) observations"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> Iterable[Tuple[str, int]]:
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield ("+Inf" if bound == float("inf") else repr(bound)), total
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels: Dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class _Family:
+    def __init__(self, name: str, kind: str, help_text: str, unit: str = ""):
+        self.header = [f"# TYPE {name} {kind}", f"# HELP {name} {help_text}"]
+        if unit:
+            self.header.insert(1, f"# UNIT {name} {unit}")
+        self.name = name
+        self.samples: List[str] = []
+
+    def add(self, value, labels: Optional[Dict] = None, suffix: str = ""):
+        if value is None:
+            return
+        self.samples.append(f"{self.name}{suffix}{_labels(labels)} {float(value)!r}")
+
+
+GPU_GAUGES = (
+    ("utilization", "multiverse_gpu_utilization_percent", "GPU utilization", "percent"),
+    ("memoryUtilization", "multiverse_gpu_memory_utilization_percent", "GPU memory controller utilization", "percent"),
+    ("memoryUsed", "multiverse_gpu_memory_used_bytes", "GPU memory in use", "bytes"),
+    ("memoryTotal", "multiverse_gpu_memory_total_bytes", "GPU memory capacity", "bytes"),
+    ("temperature", "multiverse_gpu_temperature_celsius", "GPU temperature", "celsius"),
+    ("powerDraw", "multiverse_gpu_power_watts", "GPU power draw", "watts"),
+    ("powerLimit", "multiverse_gpu_power_limit_watts", "GPU power limit", "watts"),
+    ("temperatureLimit", "multiverse_gpu_temperature_limit_celsius", "Temperature at which the GPU slows down", "celsius"),
+    ("graphicsClock", "multiverse_gpu_graphics_clock_mhz", "GPU graphics clock", "mhz"),
+    ("memoryClock", "multiverse_gpu_memory_clock_mhz", "GPU memory clock", "mhz"),
+)
+
+DISK_GAUGES = (
+    ("readBytesPerSec", "multiverse_disk_read_bytes_per_second", "Disk read throughput"),
+    ("writeBytesPerSec", "multiverse_disk_write_bytes_per_second", "Disk write throughput"),
+    ("readOpsPerSec", "multiverse_disk_reads_per_second", "Disk read operations"),
+    ("writeOpsPerSec", "multiverse_disk_writes_per_second", "Disk write operations"),
+    ("busyPercent", "multiverse_disk_busy_percent", "Share of time the disk had I/O in flight"),
+)
+
+NETWORK_GAUGES = (
+    ("rxBytesPerSec", "multiverse_network_receive_bytes_per_second", "Network receive throughput"),
+    ("txBytesPerSec", "multiverse_network_transmit_bytes_per_second", "Network transmit throughput"),
+    ("errorsPerSec", "multiverse_network_errors_per_second", "Network receive and transmit errors"),
+    ("dropsPerSec", "multiverse_network_drops_per_second", "Dropped network packets"),
+)
+
+PROCESS_GAUGES = (
+    ("cpuPercent", "multiverse_process_cpu_percent", "Inference server process CPU usage (100 = one core)", "percent"),
+    ("rss", "multiverse_process_resident_memory_bytes", "Inference server process resident memory", "bytes"),
+    ("threads", "multiverse_process_threads", "Inference server process threads", ""),
+    ("ctxSwitchesVoluntary", "multiverse_process_voluntary_context_switches_per_second",
+     "Inference server process voluntary context switches per second", ""),
+    ("ctxSwitchesInvoluntary", "multiverse_process_involuntary_context_switches_per_second",
+     "Inference server process involuntary context switches per second", ""),
+    ("readBytesPerSec", "multiverse_process_read_bytes_per_second", "Inference server process disk reads", ""),
+    ("writeBytesPerSec", "multiverse_process_write_bytes_per_second", "Inference server process disk writes", ""),
+)
+
+
+def render(metrics: Dict, sources: Dict) -> str:
+    """Render a metrics document plus per-source collection statistics"""
+    families: List[_Family] = []
+
+    def family(*args) -> _Family:
+        families.append(_Family(*args))
+        return families[-1]
+
+    cpu = metrics.get("cpu") or {}
+    family("multiverse_cpu_utilization_percent", "gauge", "Host CPU utilization", "percent").add(cpu.get("utilization"))
+    family("multiverse_cpu_frequency_mhz", "gauge", "Current CPU frequency", "mhz").add(cpu.get("frequency"))
+    family("multiverse_cpu_cores", "gauge", "Logical CPU cores").add(cpu.get("cores"))
+    family("multiverse_cpu_iowait_percent", "gauge", "Host CPU time waiting on I/O", "percent").add(cpu.get("iowait"))
+    per_core = family("multiverse_cpu_core_utilization_percent", "gauge", "Per-core CPU utilization", "percent")
+    for core, utilization in enumerate(cpu.get("perCore") or []):
+        per_core.add(utilization, {"core": core})
+
+    memory = metrics.get("memory") or {}
+    family("multiverse_memory_total_bytes", "gauge", "Host memory capacity", "bytes").add(memory.get("total"))
+    family("multiverse_memory_used_bytes", "gauge", "Host memory in use", "bytes").add(memory.get("used"))
+    family("multiverse_memory_available_bytes", "gauge", "Host memory available", "bytes").add(memory.get("available"))
+    family("multiverse_swap_used_bytes", "gauge", "Swap in use", "bytes").add(memory.get("swapUsed"))
+
+    gpus = metrics.get("gpus") or []
+    for key, name, help_text, unit in GPU_GAUGES:
+        gauge = family(name, "gauge", help_text, unit)
+        for gpu in gpus:
+            labels = {"gpu": gpu.get("index", 0), "vendor": gpu.get("vendor", ""), "model": gpu.get("model", "")}
+            gauge.add(gpu.get(key), labels)
+    family("multiverse_gpu_count", "gauge", "GPUs on this node").add(len(gpus))
+    throttle = metrics.get("throttle")
+    if throttle is not None:
+        active = {state["index"]: state for state in throttle.get("active") or []}
+        throttling = family("multiverse_gpu_throttling", "gauge", "Whether the GPU is in a throttle episode")
+        severity = family("multiverse_gpu_throttle_severity", "gauge",
+                          "Throttle episode severity (0 none, 1 minor, 2 moderate, 3 severe)")
+        for gpu in gpus:
+            labels = {"gpu": gpu.get("index", 0), "vendor": gpu.get("vendor", ""), "model": gpu.get("model", "")}
+            state = active.get(gpu.get("index", 0))
+            throttling.add(1 if state else 0, labels)
+            severity.add(SEVERITY_LEVELS[state["severity"]] if state else 0, labels)
+
+    disks = (metrics.get("disk") or {}).get("devices") or []
+    for key, name, help_text in DISK_GAUGES:
+        gauge = family(name, "gauge", help_text)
+        for disk in disks:
+            gauge.add(disk.get(key), {"device": disk["name"]})
+    interfaces = (metrics.get("network") or {}).get("interfaces") or []
+    for key, name, help_text in NETWORK_GAUGES:
+        gauge = family(name, "gauge", help_text)
+        for interface in interfaces:
+            gauge.add(interface.get(key), {"interface": interface["name"]})
+
+    processes = (metrics.get("process") or {}).get("processes") or []
+    for key, name, help_text, unit in PROCESS_GAUGES:
+        gauge = family(name, "gauge", help_text, unit)
+        for process in processes:
+            labels = {"pid": process["pid"], "server": process["server"], "name": process["name"]}
+            gauge.add(process.get(key), labels)
+
+    battery = metrics.get("battery")
+    if battery:
+        family("multiverse_battery_percent", "gauge", "Battery charge", "percent").add(battery.get("level"))
+
+    durations = family("multiverse_collection_duration_seconds", "histogram",
+                       "Time spent collecting each metric source", "seconds")
+    timeouts = family("multiverse_collection_timeouts", "counter", "Collections that exceeded their timeout")
+    errors = family("multiverse_collection_errors", "counter", "Collections that raised an error")
+    for name, source in sources.items():
+        labels = {"source": name}
+        for bound, count in source.durations.cumulative():
+            durations.add(count, {**labels, "le": bound}, "_bucket")
+        durations.add(source.durations.count, labels, "_count")
+        durations.add(source.durations.sum, labels, "_sum")
+        timeouts.add(source.timeouts, labels, "_total")
+        errors.add(source.errors, labels, "_total")
+
+    lines = []
+    for fam in families:
+        if fam.samples:
+            lines.extend(fam.header)
+            lines.extend(fam.samples)
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Inference-server process metrics
+Finds the LLM server processes once, keeps their psutil.Process handles alive across
+ticks and reports CPU, RSS, threads, context switches and I/O rates as deltas
+"""
+
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Process names (or command-line fragments) of the servers we know how to find
+KNOWN_SERVERS = (
+    ("LM Studio", ("lm studio", "lm-studio", "lmstudio", "llmworker")),
+    ("Ollama", ("ollama",)),
+    ("llama.cpp", ("llama-server", "llama.cpp", "llama-cpp")),
+    ("vLLM", ("vllm",)),
+    ("TGI", ("text-generation-launcher", "text-generation-router", "text-generation-server")),
+    ("SGLang", ("sglang",)),
+    ("KoboldCpp", ("koboldcpp",)),
+)
+
+# Full process scans are far more expensive than reading known processes, so they are rate limited
+DISCOVERY_INTERVAL = 10.0
+
+
+def _match(name: str, cmdline: List[str], patterns) -> bool:
+    # Interpreted servers (vLLM, SGLang) show up as python, so the program and module in the command line count
+    # too; arguments with spaces (a shell's -c script that merely mentions a server) do not
+    candidates = [(name or "").lower()]
+    candidates += [os.path.basename(arg).lower() for arg in (cmdline or [])[:3]
+                   if arg and not any(c.isspace() for c in arg)]
+    return any(pattern in candidate for candidate in candidates for pattern in patterns)
+
+
+class TrackedProcess:
+    """A process handle plus the counters from the previous tick"""
+
+    def __init__(self, process: psutil.Process, server: str):
+        self.process = process
+        self.server = server
+        self.name = process.name()
+        self.create_time = process.create_time()
+        self.previous: Optional[tuple] = None
+        self.io_available = True
+
+    def sample(self) -> Dict:
+        """Read every counter in one oneshot() pass and turn the cumulative ones into rates"""
+        process = self.process
+        with process.oneshot():
+            cpu = process.cpu_times()
+            rss = process.memory_info().rss
+            threads = process.num_threads()
+            switches = process.num_ctx_switches()
+            io = None
+            if self.io_available:
+                try:
+                    io = process.io_counters()
+                except (psutil.AccessDenied, AttributeError, NotImplementedError):
+                    # Not permitted for other users' processes, or not supported on this platform
+                    self.io_available = False
+        now = time.monotonic()
+        current = (now, cpu.user + cpu.system, switches.voluntary, switches.involuntary,
+                   io.read_bytes if io else None, io.write_bytes if io else None)
+        previous, self.previous = self.previous, current
+
+        def rate(index: int) -> Optional[float]:
+            if previous is None or current[index] is None or previous[index] is None:
+                return None
+            elapsed = current[0] - previous[0]
+            return max(0.0, (current[index] - previous[index]) / elapsed) if elapsed > 0 else None
+
+        cpu_rate = rate(1)
+        return {
+            "pid": process.pid,
+            "name": self.name,
+            "server": self.server,
+            "cpuPercent": cpu_rate * 100 if cpu_rate is not None else None,
+            "rss": rss,
+            "threads": threads,
+            "ctxSwitchesVoluntary": rate(2),
+            "ctxSwitchesInvoluntary": rate(3),
+            "readBytesPerSec": rate(4),
+            "writeBytesPerSec": rate(5),
+            "uptime": time.time() - self.create_time
+        }
+
+
+class ProcessTracker:
+    """Inference-server processes, found by name/PID or auto-discovered
+
+    ``targets`` is a list of PIDs and/or names (matched against the process
+    name and the start of its command line). Without targets, every process of
+    a known inference server is tracked. Discovery re-runs every
+    DISCOVERY_INTERVAL seconds (to pick up restarted servers and new model
+    runners); between discoveries only the known processes are read.
+    """
+
+    def __init__(self, targets: Optional[List[str]] = None):
+        self.pids = {int(target) for target in targets or () if target.isdigit()}
+        names = tuple(target.lower() for target in targets or () if not target.isdigit())
+        self.servers = [("custom", names)] if names else ([] if self.pids else list(KNOWN_SERVERS))
+        self.tracked: Dict[int, TrackedProcess] = {}
+        self._next_discovery = 0.0
+        self._own_pid = os.getpid()
+
+    def _discover(self):
+        for pid in self.pids:
+            if pid not in self.tracked:
+                try:
+                    self.tracked[pid] = TrackedProcess(psutil.Process(pid), "custom")
+                except psutil.Error:
+                    pass
+        if not self.servers:
+            return
+        for process in psutil.process_iter(["name", "cmdline"]):
+            if process.pid in self.tracked or process.pid == self._own_pid:
+                continue
+            info = process.info
+            for server, patterns in self.servers:
+                if _match(info["name"], info["cmdline"], patterns):
+                    try:
+                        self.tracked[process.pid] = TrackedProcess(process, server)
+                        logger.info(f"Tracking {server} process {process.pid} ({info['name']})")
+                    except psutil.Error:
+                        pass
+                    break
+
+    def collect(self) -> Dict:
+        """Sample every tracked process; exited ones are dropped and trigger a rediscovery"""
+        now = time.monotonic()
+        if now >= self._next_discovery:
+            self._next_discovery = now + DISCOVERY_INTERVAL
+            try:
+                self._discover()
+            except Exception as e:
+                logger.warning(f"Inference process discovery failed: {e}")
+
+        processes = []
+        for pid, tracked in list(self.tracked.items()):
+            try:
+                processes.append(tracked.sample())
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                del self.tracked[pid]
+                self._next_discovery = 0.0
+            except psutil.AccessDenied:
+                del self.tracked[pid]
+        return {"processes": processes, "total": summarize_processes(processes)}
+
+
+def summarize_processes(processes: List[Dict]) -> Optional[Dict]:
+    """Aggregate across processes (a server with worker/runner children counts as one)"""
+    if not processes:
+        return None
+
+    def total(key: str) -> Optional[float]:
+        values = [process[key] for process in processes if process[key] is not None]
+        return sum(values) if values else None
+
+    return {
+        "count": len(processes),
+        "cpuPercent": total("cpuPercent"),
+        "rss": total("rss"),
+        "threads": total("threads"),
+        "ctxSwitchesVoluntary": total("ctxSwitchesVoluntary"),
+        "ctxSwitchesInvoluntary": total("ctxSwitchesInvoluntary"),
+        "readBytesPerSec": total("readBytesPerSec"),
+        "writeBytesPerSec": total("writeBytesPerSec")
+    }
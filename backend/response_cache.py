@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Shared response cache for relayed chat completions
+LRU + TTL in memory with a byte cap, plus an optional on-disk tier
+"""
+
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Parameters that change what the model generates; everything else is ignored for the key
+KEY_PARAMS = ("model", "messages", "temperature", "top_p", "top_k", "min_p", "max_tokens", "max_completion_tokens",
+              "stop", "seed", "presence_penalty", "frequency_penalty", "repeat_penalty", "logit_bias",
+              "response_format", "tools", "tool_choice", "stream", "n")
+HEADER = struct.Struct("<I")
+
+
+def cache_key(upstream: str, path: str, payload: Optional[Dict]) -> Optional[str]:
+    """Canonical hash of endpoint + generation parameters, or None when the request is not deterministic"""
+    if not isinstance(payload, dict) or not isinstance(payload.get("messages"), list):
+        return None
+    if payload.get("temperature") != 0 or (payload.get("n") or 1) != 1:
+        return None
+    canonical = {"endpoint": upstream.rstrip("/") + path}
+    canonical.update({name: payload[name] for name in KEY_PARAMS if name in payload})
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class CachedResponse:
+    """A complete upstream response, kept as the exact chunks it arrived in"""
+
+    def __init__(self, status: int, content_type: str, chunks: List[bytes], created: Optional[float] = None):
+        self.status = status
+        self.content_type = content_type
+        self.chunks = chunks
+        self.created = time.time() if created is None else created
+        self.size = sum(len(chunk) for chunk in chunks)
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({"status": self.status, "contentType": self.content_type, "created": self.created,
+                             "lengths": [len(chunk) for chunk in self.chunks]}).encode()
+        return HEADER.pack(len(header)) + header + b"".join(self.chunks)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CachedResponse":
+        (header_length,) = HEADER.unpack_from(data)
+        header = json.loads(data[HEADER.size:HEADER.size + header_length])
+        chunks, offset = [], HEADER.size + header_length
+        for length in header["lengths"]:
+            chunks.append(data[offset:offset + length])
+            offset += length
+        return cls(header["status"], header["contentType"], chunks, header["created"])
+
+
+class ResponseCache:
+    """Byte-capped LRU with TTL, optionally backed by a directory of entry files"""
+
+    def __init__(self, max_bytes: int = 64 * 2**20, ttl: float = 3600.0,
+                 disk_dir: Optional[str] = None, disk_max_bytes: int = 2**30):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.bytes = 0
+        self.stats = {"hits": 0, "memoryHits": 0, "diskHits": 0, "misses": 0, "bypassed": 0,
+                      "stores": 0, "evictions": 0, "expired": 0, "bytesServed": 0, "bytesStored": 0}
+        self.disk_bytes = 0
+        # Disk reads and writes run in worker threads; serialize them so size accounting stays exact
+        self._disk_lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.disk_bytes = sum(os.path.getsize(path) for path in self._disk_files())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key + ".bin")
+
+    def _disk_files(self) -> List[str]:
+        return glob.glob(os.path.join(self.disk_dir, "*", "*.bin"))
+
+    def _expired(self, entry: CachedResponse) -> bool:
+        return time.time() - entry.created > self.ttl
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        """Look up memory first, then disk; expired entries count as misses"""
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry):
+            self._remove(key)
+            self.stats["expired"] += 1
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.stats["memoryHits"] += 1
+        elif self.disk_dir:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                self.stats["diskHits"] += 1
+                self._insert(key, entry)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self.stats["bytesServed"] += entry.size
+        return entry
+
+    async def put(self, key: str, entry: CachedResponse):
+        """Store a completed response; entries larger than the whole cache are skipped"""
+        if entry.size > self.max_bytes:
+            return
+        self._insert(key, entry)
+        self.stats["stores"] += 1
+        self.stats["bytesStored"] += entry.size
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, entry)
+
+    def _insert(self, key: str, entry: CachedResponse):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def _read_disk(self, key: str) -> Optional[CachedResponse]:
+        with self._disk_lock:
+            return self._read_disk_locked(key)
+
+    def _read_disk_locked(self, key: str) -> Optional[CachedResponse]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = CachedResponse.from_bytes(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            entry = None
+        if entry is None or self._expired(entry):
+            self._delete_file(path)
+            return None
+        return entry
+
+    def _write_disk(self, key: str, entry: CachedResponse):
+        with self._disk_lock:
+            self._write_disk_locked(key, entry)
+
+    def _write_disk_locked(self, key: str, entry: CachedResponse):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = entry.to_bytes()
+        if os.path.exists(path):
+            self._delete_file(path)
+        temp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp, "wb") as f:
+                f.write(data)
+            os.replace(temp, path)
+            self.disk_bytes += len(data)
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry {path}: {e}")
+            return
+        if self.disk_bytes > self.disk_max_bytes:
+            self._trim_disk()
+
+    def _delete_file(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.disk_bytes -= size
+        except OSError:
+            pass
+
+    def _trim_disk(self):
+        """Drop least recently written files until the disk tier fits its cap again"""
+        for path in sorted(self._disk_files(), key=os.path.getmtime):
+            if self.disk_bytes <= self.disk_max_bytes:
+                break
+            self._delete_file(path)
+
+    async def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+        if self.disk_dir:
+            await asyncio.to_thread(self._clear_disk)
+
+    def _clear_disk(self):
+        with self._disk_lock:
+            for path in self._disk_files():
+                self._delete_file(path)
+
+    def summary(self) -> Dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hitRate": self.stats["hits"] / lookups if lookups else None,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "maxBytes": self.max_bytes,
+            "ttl": self.ttl,
+            "diskDir": self.disk_dir,
+            "diskBytes": self.disk_bytes if self.disk_dir else None
+        }
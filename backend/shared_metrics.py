@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Shared-memory metrics segment for multi-worker deployments
+One worker samples the hardware and publishes every sample into an mmap'd segment
+guarded by a seqlock; the other workers read the latest frame instead of sampling
+"""
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, List, Optional
+
+# Leader election and demand slots use POSIX byte-range locks
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MVMS"
+LAYOUT_VERSION = 1
+DEFAULT_SIZE = 1 << 20
+
+# Header: magic, layout version | seq (odd while a frame is being written) | length, crc32 | written at | writer pid
+HEADER = struct.Struct("<4sI")
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 8
+FRAME_INFO = struct.Struct("<IIdI")
+FRAME_INFO_OFFSET = 16
+
+# Demand table: one row per reader (lease deadline, then the wanted interval of each source, 0 = not needed)
+MAX_WORKERS = 64
+MAX_SOURCES = 8
+DEMAND_ROW = struct.Struct(f"<d{MAX_SOURCES}d")
+DEMAND_OFFSET = 64
+DEMAND_TABLE = struct.Struct("<" + f"d{MAX_SOURCES}d" * MAX_WORKERS)
+PAYLOAD_OFFSET = 8192
+
+READ_RETRIES = 100
+
+
+class SharedMetricsSegment:
+    """Fixed-layout mmap segment: a seqlock-protected frame plus a table of reader demand
+
+    Only the leader writes the frame. A reader loads the sequence number, copies
+    the frame, and loads the sequence number again; an odd or changed number
+    (or a CRC mismatch) means the writer was mid-update, so it retries. Readers
+    never block the writer, and an unchanged frame costs one 8-byte read.
+    """
+
+    def __init__(self, path: str, size: int = DEFAULT_SIZE):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self.size = os.fstat(fd).st_size
+            self.mm = mmap.mmap(fd, self.size)
+        except BaseException:
+            os.close(fd)
+            raise
+        # Kept open for the life of the segment: closing any descriptor of the file drops our locks
+        self.fd = fd
+        self.capacity = self.size - PAYLOAD_OFFSET
+        self.slot: Optional[int] = None
+        self.leader = False
+        self._seq = 0
+        self._last_read_seq: Optional[int] = None
+        self.frames_written = 0
+        self.frames_read = 0
+        self.read_retries = 0
+
+    def _try_lock(self, byte: int) -> bool:
+        try:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, byte)
+            return True
+        except OSError:
+            return False
+
+    def try_lead(self) -> bool:
+        """Become the writer if no live process holds the leader lock (released automatically when it dies)"""
+        if self.leader:
+            return True
+        if not self._try_lock(0):
+            return False
+        self.leader = True
+        magic, version = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            self.mm[:PAYLOAD_OFFSET] = bytes(PAYLOAD_OFFSET)
+            HEADER.pack_into(self.mm, 0, MAGIC, LAYOUT_VERSION)
+        # A previous leader may have died mid-write and left the sequence odd
+        seq, = SEQ.unpack_from(self.mm, SEQ_OFFSET)
+        self._seq = seq + (seq & 1)
+        self.release_slot()
+        return True
+
+    def claim_slot(self) -> Optional[int]:
+        """Lock a demand row for this process (rows of dead processes become free again)"""
+        if self.slot is None:
+            for slot in range(MAX_WORKERS):
+                if self._try_lock(1 + slot):
+                    self.slot = slot
+                    break
+        return self.slot
+
+    def release_slot(self):
+        if self.slot is None:
+            return
+        DEMAND_ROW.pack_into(self.mm, DEMAND_OFFSET + self.slot * DEMAND_ROW.size, *([0.0] * (1 + MAX_SOURCES)))
+        fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, 1 + self.slot)
+        self.slot = None
+
+    def write(self, payload: bytes) -> bool:
+        """Publish a frame (leader only)"""
+        length = len(payload)
+        if length > self.capacity:
+            logger.error(f"Metrics frame of {length} bytes does not fit the {self.capacity}-byte shared segment")
+            return False
+        mm = self.mm
+        SEQ.pack_into(mm, SEQ_OFFSET, self._seq + 1)
+        mm[PAYLOAD_OFFSET:PAYLOAD_OFFSET + length] = payload
+        FRAME_INFO.pack_into(mm, FRAME_INFO_OFFSET, length, zlib.crc32(payload), time.time(), os.getpid())
+        self._seq += 2
+        SEQ.pack_into(mm, SEQ_OFFSET, self._seq)
+        self.frames_written += 1
+        return True
+
+    def read(self) -> Optional[bytes]:
+        """The latest frame if it changed since the last call, otherwise None"""
+        mm = self.mm
+        for _ in range(READ_RETRIES):
+            seq, = SEQ.unpack_from(mm, SEQ_OFFSET)
+            if seq == self._last_read_seq or seq == 0:
+                return None
+            if seq & 1:
+                self.read_retries += 1
+                continue
+            length, crc, _, _ = FRAME_INFO.unpack_from(mm, FRAME_INFO_OFFSET)
+            payload = mm[PAYLOAD_OFFSET:PAYLOAD_OFFSET + min(length, self.capacity)]
+            if SEQ.unpack_from(mm, SEQ_OFFSET)[0] == seq and zlib.crc32(payload) == crc:
+                self._last_read_seq = seq
+                self.frames_read += 1
+                return payload
+            self.read_retries += 1
+        return None
+
+    def frame_info(self) -> Dict:
+        seq, = SEQ.unpack_from(self.mm, SEQ_OFFSET)
+        length, _, written_at, writer = FRAME_INFO.unpack_from(self.mm, FRAME_INFO_OFFSET)
+        return {"seq": seq, "bytes": length, "writtenAt": written_at or None, "writerPid": writer or None}
+
+    def write_demand(self, intervals: List[float], ttl: float):
+        """Publish this reader's wanted interval per source, valid for ``ttl`` seconds"""
+        if self.claim_slot() is None:
+            return
+        row = (intervals + [0.0] * MAX_SOURCES)[:MAX_SOURCES]
+        # Deadline last, so the leader never takes a half-written row as live
+        offset = DEMAND_OFFSET + self.slot * DEMAND_ROW.size
+        DEMAND_ROW.pack_into(self.mm, offset, 0.0, *row)
+        struct.pack_into("<d", self.mm, offset, time.time() + ttl)
+
+    def read_demand(self) -> List[float]:
+        """Fastest live interval per source across all readers (0 = nobody needs it)"""
+        values = DEMAND_TABLE.unpack_from(self.mm, DEMAND_OFFSET)
+        now = time.time()
+        wanted = [0.0] * MAX_SOURCES
+        for start in range(0, len(values), 1 + MAX_SOURCES):
+            if values[start] < now:
+                continue
+            for index, interval in enumerate(values[start + 1:start + 1 + MAX_SOURCES]):
+                if interval > 0 and (wanted[index] == 0 or interval < wanted[index]):
+                    wanted[index] = interval
+        return wanted
+
+    def close(self):
+        if self.slot is not None:
+            self.release_slot()
+        self.mm.close()
+        os.close(self.fd)
+
+
+class SharedSampling:
+    """Connects a CollectionScheduler to a shared segment as either the sampler or a reader
+
+    The leader samples for everyone: its scheduler runs the sources that it or
+    any reader needs and every new sample is written to the segment. Readers
+    forward their demand and copy each new frame into their own sources, so the
+    rest of the server (streams, history, energy) works unchanged. If the
+    leader exits, the next reader to find the lock free takes over.
+    """
+
+    POLL_INTERVAL = 0.05
+    DEMAND_TTL = 3.0
+    ELECTION_INTERVAL = 1.0
+
+    def __init__(self, scheduler, path: str, size: int = DEFAULT_SIZE):
+        self.scheduler = scheduler
+        self.names = list(scheduler.sources)[:MAX_SOURCES]
+        self.segment = SharedMetricsSegment(path, size)
+        self.wanted: Dict[str, float] = {}
+        self._samples: Dict[str, int] = {}
+        self._remote_status: Dict[str, Dict] = {}
+        self._demand_written = 0.0
+        self._applied: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._counts = {name: 0 for name in self.names}
+        for name in self.names:
+            scheduler.sources[name].listeners.append(lambda value, name=name: self._sampled(name))
+
+    @property
+    def leader(self) -> bool:
+        return self.segment.leader
+
+    def start(self):
+        """Pick a role before any demand is registered, then keep the segment in sync in the background"""
+        if self.segment.try_lead():
+            logger.info(f"Sampling hardware for all workers into {self.segment.path} (pid {os.getpid()})")
+        else:
+            logger.info(f"Reading metrics from the shared segment {self.segment.path}")
+            self.scheduler.use_remote(self)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self.segment.close()
+
+    # Leader side
+
+    def _sampled(self, name: str):
+        """Source listener: publish the sources' latest values whenever one of them updates"""
+        self._counts[name] += 1
+        if not self.leader:
+            return
+        now_wall, now = time.time(), time.monotonic()
+        status = self.scheduler.status()
+        frame = {}
+        for source_name in self.names:
+            source = self.scheduler.sources[source_name]
+            frame[source_name] = {
+                "value": source.value,
+                "samples": self._counts[source_name],
+                "updatedAt": now_wall - (now - source.updated_at) if source.updated_at else None,
+                "lastDuration": source.last_duration,
+                "status": status[source_name]
+            }
+        self.segment.write(json.dumps(frame, separators=(",", ":")).encode())
+
+    def _apply_remote_demand(self):
+        wanted = self.segment.read_demand()
+        needs = {name: interval for name, interval in zip(self.names, wanted) if interval > 0}
+        if needs != self._applied:
+            self._applied = needs
+            if needs:
+                self.scheduler.require("shared", needs)
+            else:
+                self.scheduler.release("shared")
+
+    # Reader side
+
+    def request(self, wanted: Dict[str, float]):
+        """Scheduler hook: this worker's demand changed"""
+        self.wanted = dict(wanted)
+        self._write_demand()
+
+    def _write_demand(self):
+        self.segment.write_demand([self.wanted.get(name, 0.0) for name in self.names], self.DEMAND_TTL)
+        self._demand_written = time.monotonic()
+
+    def _apply_frame(self, payload: bytes):
+        frame = json.loads(payload)
+        now_wall, now = time.time(), time.monotonic()
+        for name in self.names:
+            entry = frame.get(name)
+            if entry is None:
+                continue
+            self._remote_status[name] = entry["status"]
+            if entry["samples"] == self._samples.get(name) or entry["updatedAt"] is None:
+                continue
+            self._samples[name] = entry["samples"]
+            source = self.scheduler.sources[name]
+            source.value = entry["value"]
+            source.updated_at = now - max(0.0, now_wall - entry["updatedAt"])
+            source.last_duration = entry["lastDuration"]
+            self.scheduler.mark_updated()
+            for listener in source.listeners:
+                listener(source.value)
+
+    def status(self) -> Dict:
+        """Source status as reported by the leader, with ages measured from here"""
+        status = {}
+        for name, source in self.scheduler.sources.items():
+            remote = self._remote_status.get(name, {})
+            status[name] = {
+                **source.status(),
+                "timeouts": remote.get("timeouts", 0),
+                "errors": remote.get("errors", 0),
+                "busy": remote.get("busy", False),
+                "interval": remote.get("interval", source.interval),
+                "active": remote.get("active", False)
+            }
+        return status
+
+    async def _run(self):
+        next_election = time.monotonic() + self.ELECTION_INTERVAL
+        while True:
+            try:
+                if self.leader:
+                    self._apply_remote_demand()
+                else:
+                    payload = self.segment.read()
+                    if payload is not None:
+                        self._apply_frame(payload)
+                    if self.wanted and time.monotonic() - self._demand_written > self.DEMAND_TTL / 3:
+                        self._write_demand()
+                    if time.monotonic() >= next_election:
+                        next_election = time.monotonic() + self.ELECTION_INTERVAL
+                        if self.segment.try_lead():
+                            logger.info(f"Took over hardware sampling for all workers (pid {os.getpid()})")
+                            self.scheduler.use_remote(None)
+            except Exception as e:
+                logger.error(f"Shared metrics segment error: {e}")
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    def summary(self) -> Dict:
+        return {
+            "path": self.segment.path,
+            "role": "sampler" if self.leader else "reader",
+            "pid": os.getpid(),
+            "slot": self.segment.slot,
+            "framesWritten": self.segment.frames_written,
+            "framesRead": self.segment.frames_read,
+            "readRetries": self.segment.read_retries,
+            "frame": self.segment.frame_info()
+        }
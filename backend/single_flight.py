@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing for relayed chat completions
+Identical deterministic requests in flight share one upstream generation
+"""
+
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+
+from llm_proxy import ProxiedGeneration
+
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    """One upstream generation and every client attached to it
+
+    Chunks are kept for the lifetime of the flight so a client that joins
+    mid-stream can be replayed everything it missed before following live.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks: List[bytes] = []
+        self.status: Optional[int] = None
+        self.content_type: Optional[str] = None
+        self.streaming = False
+        self.done = False
+        self.listeners = 0
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def start(self, status: int, content_type: str, streaming: bool):
+        self.status = status
+        self.content_type = content_type
+        self.streaming = streaming
+        self.ready.set()
+
+    def append(self, chunk: bytes):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self):
+        self.done = True
+        self.ready.set()
+        self._notify()
+
+    async def wait_done(self):
+        while not self.done:
+            await self._changed.wait()
+
+    async def iter_chunks(self, release: Callable[[], None]) -> AsyncIterator[bytes]:
+        """Replay the chunks emitted so far, then follow the live generation; calls release at the end"""
+        position = 0
+        try:
+            while True:
+                changed = self._changed
+                while position < len(self.chunks):
+                    yield self.chunks[position]
+                    position += 1
+                if self.done:
+                    return
+                await changed.wait()
+        finally:
+            release()
+
+    def attach(self):
+        self.listeners += 1
+
+    def releaser(self) -> Callable[[], None]:
+        """A detach for one attached listener that counts once however many cleanup paths reach it
+
+        A listener may leave before its response body is ever iterated, so
+        the generator's own cleanup cannot be the only place that detaches.
+        """
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.detach()
+        return release
+
+    def detach(self):
+        self.listeners -= 1
+        # Nobody is left to read it: stop the upstream generation like a direct client disconnect would
+        if self.listeners == 0 and not self.done and self.task:
+            self.task.cancel()
+
+
+class Coalescer:
+    """Registry of in-flight generations keyed by the canonical request hash"""
+
+    def __init__(self):
+        self.flights: Dict[str, Flight] = {}
+        self.stats = {"upstreamGenerations": 0, "coalesced": 0, "joinedMidStream": 0}
+
+    def join(self, key: str) -> Optional[Flight]:
+        """Attach to an identical generation already in flight, if there is one"""
+        flight = self.flights.get(key)
+        if flight is None:
+            return None
+        flight.attach()
+        self.stats["coalesced"] += 1
+        if flight.chunks:
+            self.stats["joinedMidStream"] += 1
+        return flight
+
+    def lead(self, key: str) -> Flight:
+        """Register a new flight; the caller opens the upstream request and hands it to run()"""
+        flight = Flight(key)
+        flight.attach()
+        self.flights[key] = flight
+        self.stats["upstreamGenerations"] += 1
+        return flight
+
+    def abandon(self, flight: Flight, status: int, body: bytes):
+        """The upstream request could not be opened; every attached client gets the same error"""
+        flight.start(status, "application/json", streaming=False)
+        flight.append(body)
+        self._land(flight)
+
+    def run(self, flight: Flight, generation: ProxiedGeneration):
+        """Pump the upstream response into the flight in the background"""
+        upstream = generation.response
+        streaming = generation.stream and upstream.status_code < 400
+        default_type = "text/event-stream" if streaming else "application/json"
+        flight.start(upstream.status_code, upstream.headers.get("content-type", default_type), streaming)
+        flight.task = asyncio.create_task(self._pump(flight, generation))
+
+    async def _pump(self, flight: Flight, generation: ProxiedGeneration):
+        stream = generation.iter_stream() if flight.streaming else None
+        try:
+            if stream:
+                async for chunk in stream:
+                    flight.append(chunk)
+            else:
+                flight.append(await generation.read())
+        except httpx.HTTPError as e:
+            logger.error(f"Coalesced generation failed: {e}")
+        finally:
+            if stream:
+                # Closes the upstream response now rather than whenever the generator is collected
+                await stream.aclose()
+            self._land(flight)
+
+    def _land(self, flight: Flight):
+        flight.finish()
+        if self.flights.get(flight.key) is flight:
+            del self.flights[flight.key]
+
+    async def close(self):
+        tasks = [flight.task for flight in self.flights.values() if flight.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def summary(self) -> Dict:
+        return {**self.stats, "generationsSaved": self.stats["coalesced"], "inFlight": len(self.flights)}
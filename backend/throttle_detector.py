@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Streaming GPU throttle detection
+Tracks EWMA baselines of graphics clock, power and temperature per GPU and turns
+sustained clock drops (or driver-reported throttle reasons) into start/end events
+"""
+
+import itertools
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence
+
+# NVML clock event (throttle) reason bits, as returned by nvmlDeviceGetCurrentClocksEventReasons
+NVML_THROTTLE_REASONS = (
+    (0x0000000000000001, "gpuIdle"),
+    (0x0000000000000002, "applicationsClocksSetting"),
+    (0x0000000000000004, "swPowerCap"),
+    (0x0000000000000008, "hwSlowdown"),
+    (0x0000000000000010, "syncBoost"),
+    (0x0000000000000020, "swThermalSlowdown"),
+    (0x0000000000000040, "hwThermalSlowdown"),
+    (0x0000000000000080, "hwPowerBrakeSlowdown"),
+    (0x0000000000000100, "displayClockSetting"),
+)
+# Reported reasons that actually cost performance, mapped to the cause shown to users;
+# idle, application clocks, sync boost and display clocks are deliberate and ignored
+REASON_CAUSES = {
+    "swPowerCap": "power",
+    "hwPowerBrakeSlowdown": "power",
+    "swThermalSlowdown": "thermal",
+    "hwThermalSlowdown": "thermal",
+    "hwSlowdown": "hardware",
+}
+
+# Baselines follow roughly the last 30 samples (alpha = 2 / (N + 1))
+BASELINE_ALPHA = 2 / (30 + 1)
+# Samples a baseline needs before a clock drop against it is trusted
+WARMUP_SAMPLES = 10
+# Clocks fall when a GPU idles; only drops while it is this busy count as throttling
+BUSY_UTILIZATION = 50.0
+CLOCK_DROP_THRESHOLD = 0.10
+# Within this many degrees of the slowdown temperature, or this share of the power limit, the cause is inferred
+THERMAL_MARGIN = 5.0
+POWER_LIMIT_SHARE = 0.97
+# Consecutive samples needed to start and to end an episode, so one noisy sample does neither
+START_SAMPLES = 3
+END_SAMPLES = 3
+SEVERITIES = ((0.25, "severe"), (0.10, "moderate"), (0.0, "minor"))
+SEVERITY_LEVELS = {None: 0, "minor": 1, "moderate": 2, "severe": 3}
+MAX_EVENTS = 1000
+RECENT_EVENTS = 10
+
+
+def decode_nvml_reasons(mask: int) -> List[str]:
+    """Names of the bits set in an NVML throttle reason mask"""
+    return [name for bit, name in NVML_THROTTLE_REASONS if mask & bit]
+
+
+def severity_for(clock_drop: float) -> str:
+    for threshold, severity in SEVERITIES:
+        if clock_drop >= threshold:
+            return severity
+    return "minor"
+
+
+class Ewma:
+    """Exponentially weighted moving average, O(1) per update"""
+
+    __slots__ = ("alpha", "value", "count")
+
+    def __init__(self, alpha: float = BASELINE_ALPHA):
+        self.alpha = alpha
+        self.value: Optional[float] = None
+        self.count = 0
+
+    def update(self, sample: Optional[float]):
+        if sample is None:
+            return
+        self.value = sample if self.value is None else self.value + self.alpha * (sample - self.value)
+        self.count += 1
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= WARMUP_SAMPLES
+
+
+class Episode:
+    """Running aggregates of one throttle episode"""
+
+    def __init__(self, started_at: float, baseline_clock: Optional[float]):
+        self.started_at = started_at
+        self.baseline_clock = baseline_clock
+        self.causes: Dict[str, None] = {}  # insertion-ordered set
+        self.samples = 0
+        self.drop_sum = 0.0
+        self.max_drop = 0.0
+        self.min_clock: Optional[float] = None
+        self.peak_temperature: Optional[float] = None
+        self.peak_power: Optional[float] = None
+
+    def add(self, causes: Sequence[str], drop: float, clock, temperature, power):
+        self.causes.update(dict.fromkeys(causes))
+        self.samples += 1
+        self.drop_sum += drop
+        self.max_drop = max(self.max_drop, drop)
+        if clock is not None:
+            self.min_clock = clock if self.min_clock is None else min(self.min_clock, clock)
+        if temperature is not None:
+            self.peak_temperature = temperature if self.peak_temperature is None else max(self.peak_temperature, temperature)
+        if power is not None:
+            self.peak_power = power if self.peak_power is None else max(self.peak_power, power)
+
+    @property
+    def severity(self) -> str:
+        return severity_for(self.max_drop)
+
+
+class GpuThrottleState:
+    """Baselines and episode state for one GPU"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.clock = Ewma()
+        self.power = Ewma()
+        self.temperature = Ewma()
+        self.streak = 0  # throttled samples in a row (positive) or clear samples in a row (negative)
+        self.pending: Optional[Episode] = None
+        self.episode: Optional[Episode] = None
+        self.clear_since: Optional[float] = None
+        self.clock_drop = 0.0
+
+    def update(self, gpu: Dict, now: float) -> Optional[Dict]:
+        """Feed one sample; returns a throttle-start or throttle-end event when an episode changes state"""
+        clock = gpu.get("graphicsClock")
+        power = gpu.get("powerDraw")
+        temperature = gpu.get("temperature")
+        busy = (gpu.get("utilization") or 0) >= BUSY_UTILIZATION
+
+        causes = list(dict.fromkeys(REASON_CAUSES[reason] for reason in gpu.get("throttleReasons") or ()
+                                    if reason in REASON_CAUSES))
+        drop = 0.0
+        if busy and clock and self.clock.ready and self.clock.value:
+            drop = max(0.0, 1.0 - clock / self.clock.value)
+        self.clock_drop = drop
+        throttled = bool(causes) or drop >= CLOCK_DROP_THRESHOLD
+        if throttled and not causes:
+            causes = self._inferred_causes(gpu, temperature, power)
+
+        # Baselines only learn from unthrottled busy samples, so they keep the clocks the GPU should be running at
+        if not throttled and self.episode is None:
+            if busy:
+                self.clock.update(clock)
+            self.power.update(power)
+            self.temperature.update(temperature)
+
+        if throttled:
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+            if self.episode is not None:
+                self.episode.add(causes, drop, clock, temperature, power)
+            else:
+                if self.pending is None:
+                    self.pending = Episode(now, self.clock.value)
+                self.pending.add(causes, drop, clock, temperature, power)
+                if self.streak >= START_SAMPLES:
+                    self.episode, self.pending = self.pending, None
+                    return self._start_event()
+        else:
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+            if self.streak == -1:
+                self.clear_since = now
+            self.pending = None
+            if self.episode is not None and -self.streak >= END_SAMPLES:
+                return self._end_event()
+        return None
+
+    @staticmethod
+    def _inferred_causes(gpu: Dict, temperature, power) -> List[str]:
+        """Explain a clock drop from the limits when the driver reports no reason"""
+        causes = []
+        temperature_limit = gpu.get("temperatureLimit")
+        if temperature_limit and temperature is not None and temperature >= temperature_limit - THERMAL_MARGIN:
+            causes.append("thermal")
+        power_limit = gpu.get("powerLimit")
+        if power_limit and power is not None and power >= power_limit * POWER_LIMIT_SHARE:
+            causes.append("power")
+        return causes or ["clock"]
+
+    def _start_event(self) -> Dict:
+        episode = self.episode
+        return {
+            "type": "throttle-start",
+            "gpu": self.index,
+            "timestamp": episode.started_at,
+            "reasons": list(episode.causes),
+            "baselineClock": _round(episode.baseline_clock),
+            "clockDrop": round(episode.max_drop, 3),
+            "severity": episode.severity
+        }
+
+    def _end_event(self) -> Dict:
+        episode, self.episode = self.episode, None
+        # The episode ended with the first of the clear samples that confirmed it
+        ended_at = self.clear_since
+        return {
+            "type": "throttle-end",
+            "gpu": self.index,
+            "timestamp": ended_at,
+            "startedAt": episode.started_at,
+            "duration": round(ended_at - episode.started_at, 3),
+            "reasons": list(episode.causes),
+            "severity": episode.severity,
+            "baselineClock": _round(episode.baseline_clock),
+            "minClock": episode.min_clock,
+            "maxClockDrop": round(episode.max_drop, 3),
+            "meanClockDrop": round(episode.drop_sum / episode.samples, 3) if episode.samples else 0.0,
+            "peakTemperature": episode.peak_temperature,
+            "peakPower": _round(episode.peak_power)
+        }
+
+    def status(self, now: float) -> Dict:
+        episode = self.episode
+        return {
+            "index": self.index,
+            "throttling": episode is not None,
+            "since": episode.started_at if episode else None,
+            "duration": round(now - episode.started_at, 3) if episode else None,
+            "reasons": list(episode.causes) if episode else [],
+            "severity": episode.severity if episode else None,
+            "clockDrop": round(self.clock_drop, 3),
+            "baselineClock": _round(self.clock.value),
+            "baselinePower": _round(self.power.value),
+            "baselineTemperature": _round(self.temperature.value)
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+
+class ThrottleDetector:
+    """Throttle episodes across every GPU, fed with each GPU sample (a MetricSource listener)
+
+    Each sample costs O(1) per GPU: three EWMA updates and a few comparisons.
+    Events are kept in a bounded log with increasing ids, so clients can ask
+    for everything after the last id they saw.
+    """
+
+    def __init__(self, max_events: int = MAX_EVENTS):
+        self.gpus: List[GpuThrottleState] = []
+        self.events: Deque[Dict] = deque(maxlen=max_events)
+        self._ids = itertools.count(1)
+        self.updated_at: Optional[float] = None
+
+    def record(self, gpus: Sequence[Dict], timestamp: Optional[float] = None):
+        now = time.time() if timestamp is None else timestamp
+        self.updated_at = now
+        if len(gpus) != len(self.gpus):
+            # Device set changed (hot-plug, or the first sample): keep the states of the GPUs that remain
+            self.gpus = self.gpus[:len(gpus)] + [GpuThrottleState(i) for i in range(len(self.gpus), len(gpus))]
+        for state, gpu in zip(self.gpus, gpus):
+            event = state.update(gpu, now)
+            if event is not None:
+                event["id"] = next(self._ids)
+                event["model"] = gpu.get("model")
+                self.events.append(event)
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              after: Optional[int] = None) -> List[Dict]:
+        """Logged events, optionally limited to a time window or to ids after a given one"""
+        return [event for event in self.events
+                if (since is None or event["timestamp"] >= since)
+                and (until is None or event["timestamp"] < until)
+                and (after is None or event["id"] > after)]
+
+    def summary(self) -> Dict:
+        """Current state for the metrics document: active episodes, node aggregates and the latest events"""
+        now = self.updated_at or time.time()
+        active = [state.status(now) for state in self.gpus if state.episode is not None]
+        return {
+            "throttling": len(active),
+            "maxSeverity": SEVERITY_LEVELS[max((state["severity"] for state in active),
+                                               key=SEVERITY_LEVELS.get, default=None)],
+            "maxClockDrop": round(max((state.clock_drop for state in self.gpus), default=0.0), 3),
+            "active": active,
+            "events": list(itertools.islice(reversed(self.events), RECENT_EVENTS))[::-1]
+        }
+
+    def status(self) -> List[Dict]:
+        """Per-GPU baselines and episode state"""
+        now = self.updated_at or time.time()
+        return [state.status(now) for state in self.gpus]
@@ -0,0 +1,144 @@
+# Token-budgeted conversation context for OpenAI-compatible chat endpoints
+# Keeps the prompt under a token budget while leaving its prefix byte-identical between turns,
+# so the server's prefix / KV cache is reused instead of re-prefilling the whole history
+import json
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# Try to use a real tokenizer for counting; fall back to a byte-length estimate
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+    TIKTOKEN_AVAILABLE = True
+except Exception:
+    _ENCODING = None
+    TIKTOKEN_AVAILABLE = False
+
+# Role markers and separators the chat template adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def count_tokens(text: str) -> int:
+    """Token count of a piece of text (tiktoken if installed, otherwise ~4 bytes per token)"""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+class Turn:
+    """A message plus its token count, computed once when the message is added"""
+
+    __slots__ = ("message", "tokens")
+
+    def __init__(self, message: Dict, counter: Callable[[str], int]):
+        self.message = message
+        content = message.get("content")
+        text = content if isinstance(content, str) else json.dumps(content)
+        self.tokens = counter(text) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ConversationContext:
+    """Conversation history that fits a prompt-token budget
+
+    When the prompt would exceed ``max_prompt_tokens``, the oldest turns are
+    dropped (or folded into a summary) until it is back under
+    ``low_water * max_prompt_tokens``. Compacting below the budget, rather than
+    dropping one turn per request, means the prefix stays the same for many
+    turns afterwards. Messages are never rewritten: the system prompt and
+    every kept turn are sent exactly as they were the first time.
+    """
+
+    def __init__(self, system_prompt: Optional[str] = None, max_prompt_tokens: int = 4096, low_water: float = 0.6,
+                 counter: Callable[[str], int] = count_tokens,
+                 summarizer: Optional[Callable[[List[Dict]], Awaitable[str]]] = None):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.low_water = low_water
+        self.counter = counter
+        self.summarizer = summarizer
+        self.system = Turn({"role": "system", "content": system_prompt}, counter) if system_prompt else None
+        self.summary: Optional[Turn] = None
+        self.turns: List[Turn] = []
+        self.tokens = self.system.tokens if self.system else 0
+        self.dropped = 0
+        self.compactions = 0
+
+    def _append(self, role: str, content: str):
+        turn = Turn({"role": role, "content": content}, self.counter)
+        self.turns.append(turn)
+        self.tokens += turn.tokens
+
+    def add_user(self, content: str):
+        self._append("user", content)
+
+    def add_assistant(self, content: str):
+        self._append("assistant", content)
+
+    def pop(self) -> Optional[Dict]:
+        """Remove the newest message, e.g. a user turn whose request failed"""
+        if not self.turns:
+            return None
+        turn = self.turns.pop()
+        self.tokens -= turn.tokens
+        return turn.message
+
+    async def prepare(self, user_message: str) -> List[Dict]:
+        """Add the next user message and return the prompt to send, compacted if it is over budget"""
+        self.add_user(user_message)
+        if self.tokens > self.max_prompt_tokens:
+            await self.compact()
+        return self.messages()
+
+    def messages(self) -> List[Dict]:
+        head = [turn.message for turn in (self.system, self.summary) if turn is not None]
+        return head + [turn.message for turn in self.turns]
+
+    async def compact(self):
+        """Drop whole user/assistant exchanges from the front until under the low-water mark"""
+        target = self.max_prompt_tokens * self.low_water
+        removed: List[Turn] = []
+        # Always keep the newest user message, and never start the history with an assistant reply
+        while len(self.turns) > 1 and self.tokens > target:
+            turn = self.turns.pop(0)
+            removed.append(turn)
+            self.tokens -= turn.tokens
+            while len(self.turns) > 1 and self.turns[0].message["role"] != "user":
+                turn = self.turns.pop(0)
+                removed.append(turn)
+                self.tokens -= turn.tokens
+        if not removed:
+            return
+        self.dropped += len(removed)
+        self.compactions += 1
+        if self.summarizer:
+            earlier = [self.summary.message] if self.summary else []
+            text = await self.summarizer(earlier + [turn.message for turn in removed])
+            if self.summary:
+                self.tokens -= self.summary.tokens
+            self.summary = Turn({"role": "system", "content": f"Summary of the earlier conversation: {text}"},
+                                self.counter)
+            self.tokens += self.summary.tokens
+
+    def stats(self) -> Dict:
+        return {
+            "promptTokens": self.tokens,
+            "budget": self.max_prompt_tokens,
+            "turns": len(self.turns),
+            "dropped": self.dropped,
+            "compactions": self.compactions,
+            "summarized": self.summary is not None,
+            "exactCounts": self.counter is count_tokens and TIKTOKEN_AVAILABLE
+        }
+
+
+def summarize_with(client, max_tokens: int = 256, **params) -> Callable[[List[Dict]], Awaitable[str]]:
+    """A summarizer that asks the model itself (any object with multiverse_client.ChatClient.complete)"""
+
+    async def summarize(messages: List[Dict]) -> str:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        prompt = [
+            {"role": "system", "content": "Summarize the conversation below in a few sentences. "
+                                          "Keep names, numbers and decisions."},
+            {"role": "user", "content": transcript}
+        ]
+        return await client.complete(prompt, max_tokens=max_tokens, **{"temperature": 0, **params})
+
+    return summarize
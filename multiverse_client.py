@@ -0,0 +1,188 @@
+# Async streaming client for OpenAI-compatible chat endpoints
+# One pooled connection per client, incremental byte-level SSE parsing, and helpers for many prompts at once
+import asyncio
+import json
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Union
+
+import httpx
+
+
+class SSEParser:
+    """Incremental Server-Sent Events parser working directly on bytes
+
+    Chunks may split lines or events anywhere. Only newly received bytes are
+    searched for event boundaries, every complete event is cut off in one
+    slice, and a run of plain single-line ``data:`` events (what chat servers
+    send) is split without any per-line work. Multi-line ``data:`` fields are
+    joined with newlines as the SSE spec requires; ``id:`` is kept in
+    ``last_event_id`` and other fields are ignored.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._after_cr = False
+        self.last_event_id: Optional[bytes] = None
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """Consume a chunk and return the data of every event it completed"""
+        if self._after_cr and chunk.startswith(b"\n"):
+            chunk = chunk[1:]  # the LF of a CRLF split across chunks
+        if b"\r" in chunk:
+            # Normalize CRLF / CR line endings before buffering; a CR ends its line right away
+            self._after_cr = chunk.endswith(b"\r")
+            chunk = chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        elif chunk:
+            self._after_cr = False
+        buffer = self._buffer
+        # A boundary may straddle the previous chunk, so look one byte back
+        scan_from = max(0, len(buffer) - 1)
+        buffer += chunk
+        end = buffer.rfind(b"\n\n", scan_from)
+        if end < 0:
+            return []
+        block = bytes(buffer[:end])
+        del buffer[:end + 2]
+        events = block.split(b"\n\n")
+        separators = len(events) - 1
+        if (block.startswith(b"data: ") and block.count(b"\n") == 2 * separators
+                and block.count(b"\n\ndata: ") == separators):
+            return [event[6:] for event in events]
+        return [data for data in map(self._parse, events) if data is not None]
+
+    def _parse(self, event: bytes) -> Optional[bytes]:
+        data = []
+        for line in event.split(b"\n"):
+            if not line or line.startswith(b":"):
+                continue  # blank / comment / keep-alive
+            field, _, value = line.partition(b":")
+            value = value[1:] if value.startswith(b" ") else value
+            if field == b"data":
+                data.append(value)
+            elif field == b"id":
+                self.last_event_id = value
+        return b"\n".join(data) if data else None
+
+
+class ChatDelta(NamedTuple):
+    content: str
+    reasoning: str
+    finish_reason: Optional[str]
+    usage: Optional[Dict]
+
+
+class ChatClient:
+    """Pooled async client for /v1/chat/completions
+
+    Use it as ``async with ChatClient(endpoint) as client:`` so the
+    connection pool is reused across requests and closed at the end.
+    """
+
+    def __init__(self, endpoint: str = "http://localhost:1234", api_key: Optional[str] = None,
+                 model: Optional[str] = None, max_connections: int = 32, timeout: float = 300.0, **defaults):
+        headers = {"Content-Type": "application/json"}
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        self.model = model
+        self.defaults = defaults
+        self._client = httpx.AsyncClient(
+            base_url=endpoint.rstrip("/"),
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def __aenter__(self) -> "ChatClient":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def _payload(self, messages: List[Dict], stream: bool, params: Dict) -> Dict:
+        payload = {**self.defaults, **params, "messages": messages, "stream": stream}
+        if self.model and "model" not in payload:
+            payload["model"] = self.model
+        return payload
+
+    async def stream(self, messages: List[Dict], batch: bool = False,
+                     **params) -> AsyncIterator[Union[ChatDelta, List[ChatDelta]]]:
+        """Yield deltas as they arrive
+
+        With ``batch=True`` every delta that arrived in the same network read is
+        yielded together as a list, so a UI can render once per read instead of
+        once per token.
+        """
+        parser = SSEParser()
+        async with self._client.stream("POST", "/v1/chat/completions",
+                                       json=self._payload(messages, True, params)) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                deltas = []
+                for data in parser.feed(chunk):
+                    if data == b"[DONE]":
+                        break
+                    try:
+                        # Decoding first is faster than letting json sniff the encoding of bytes
+                        payload = json.loads(data.decode())
+                    except ValueError:
+                        continue
+                    delta = _to_delta(payload)
+                    if delta is not None:
+                        deltas.append(delta)
+                if batch:
+                    if deltas:
+                        yield deltas
+                else:
+                    for delta in deltas:
+                        yield delta
+
+    async def stream_text(self, messages: List[Dict], on_text=None, **params) -> str:
+        """Stream a reply and return the full text; ``on_text`` is called with each piece"""
+        parts = []
+        async for batch in self.stream(messages, batch=True, **params):
+            text = "".join(delta.content for delta in batch)
+            if text:
+                parts.append(text)
+                if on_text:
+                    on_text(text)
+        return "".join(parts)
+
+    async def complete(self, messages: List[Dict], **params) -> str:
+        """Non-streaming request; returns the reply text"""
+        response = await self._client.post("/v1/chat/completions", json=self._payload(messages, False, params))
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def gather(self, conversations: Iterable[List[Dict]], concurrency: int = 8,
+                     return_exceptions: bool = True, **params) -> List[Union[str, BaseException]]:
+        """Run many conversations concurrently (at most ``concurrency`` in flight); results keep input order"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(messages):
+            async with semaphore:
+                return await self.stream_text(messages, **params)
+
+        return await asyncio.gather(*(one(messages) for messages in conversations),
+                                    return_exceptions=return_exceptions)
+
+    async def map_prompts(self, prompts: Iterable[str], system: Optional[str] = None, concurrency: int = 8,
+                          **params) -> List[Union[str, BaseException]]:
+        """gather() for plain prompt strings"""
+        prefix = [{"role": "system", "content": system}] if system else []
+        return await self.gather(([*prefix, {"role": "user", "content": prompt}] for prompt in prompts),
+                                 concurrency=concurrency, **params)
+
+
+def _to_delta(payload: Dict) -> Optional[ChatDelta]:
+    choices = payload.get("choices") or []
+    usage = payload.get("usage")
+    if not choices:
+        return ChatDelta("", "", None, usage) if usage else None
+    choice = choices[0]
+    delta = choice.get("delta") or {}
+    return ChatDelta(delta.get("content") or "", delta.get("reasoning_content") or "",
+                     choice.get("finish_reason"), usage)
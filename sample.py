@@ -1,154 +1,113 @@
 # AI Model API Integration with Streaming
-import requests
-import json
-
-def chat_with_model_stream(message, endpoint="http://192.168.1.141:1234", conversation_history=None):
-    """Send a message to an AI model endpoint with streaming response"""
-    
-    headers = {
-        "Content-Type": "application/json"
-    }
-    
-    # Build conversation history
-    if conversation_history is None:
-        messages = [
-            {"role": "system", "content": "You are a helpful AI assistant."},
-            {"role": "user", "content": message}
-        ]
-    else:
-        messages = [
-            {"role": "system", "content": "You are a helpful AI assistant."},
-            *conversation_history,
-            {"role": "user", "content": message}
-        ]
-    
-    payload = {
-        "messages": messages,
-        "temperature": 0.7,
-        "max_tokens": 2048,
-        "top_p": 0.9,
-        "stream": True
-    }
-    
+# Uses multiverse_client.ChatClient: one pooled connection for the whole session and a byte-level SSE parser,
+# and conversation_context.ConversationContext to keep the prompt within a token budget
+import asyncio
+
+from conversation_context import ConversationContext
+from multiverse_client import ChatClient
+
+ENDPOINT = "http://192.168.1.141:1234"
+SYSTEM_PROMPT = "You are a helpful AI assistant."
+PARAMS = {"temperature": 0.7, "max_tokens": 2048, "top_p": 0.9}
+# Prompt budget; keep it below the model's context length minus max_tokens
+MAX_PROMPT_TOKENS = 4096
+
+
+async def chat_with_model_stream(client, message, context=None):
+    """Send a message to an AI model endpoint with streaming response
+
+    With a ConversationContext the message is added to it, and the reply is
+    recorded there once it has streamed in.
+    """
+
+    if context is None:
+        context = ConversationContext(SYSTEM_PROMPT, MAX_PROMPT_TOKENS)
+    messages = await context.prepare(message)
+
     try:
-        response = requests.post(f"{endpoint}/v1/chat/completions", 
-                               headers=headers, json=payload, timeout=30, stream=True)
-        response.raise_for_status()
-        
         print("AI Response: ", end="", flush=True)
-        
-        ai_response = ""
-        for line in response.iter_lines():
-            if line:
-                line = line.decode('utf-8')
-                if line.startswith('data: '):
-                    data = line[6:]
-                    if data.strip() == '[DONE]':
-                        break
-                    try:
-                        parsed = json.loads(data)
-                        if 'choices' in parsed and len(parsed['choices']) > 0:
-                            delta = parsed['choices'][0].get('delta', {})
-                            if 'content' in delta:
-                                content = delta['content']
-                                print(content, end="", flush=True)
-                                ai_response += content
-                    except json.JSONDecodeError:
-                        continue
-        
+        ai_response = await client.stream_text(messages, on_text=lambda text: print(text, end="", flush=True),
+                                               **PARAMS)
         print()  # New line after streaming
+        context.add_assistant(ai_response)
         return ai_response
-        
-    except requests.exceptions.RequestException as e:
-        print(f"Error: {e}")
     except Exception as e:
+        # Forget the unanswered message so the history keeps alternating user/assistant
+        context.pop()
         print(f"Error: {e}")
 
-def chat_with_model(message, endpoint="http://192.168.1.141:1234"):
+
+async def chat_with_model(client, message):
     """Send a message to an AI model endpoint (non-streaming)"""
-    
-    headers = {
-        "Content-Type": "application/json"
-    }
-    
-    # Build conversation history
+
     messages = [
-        {"role": "system", "content": "You are a helpful AI assistant."},
+        {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": message}
     ]
-    
-    payload = {
-        "messages": messages,
-        "temperature": 0.7,
-        "max_tokens": 2048,
-        "top_p": 0.9,
-        "stream": False
-    }
-    
+
     try:
-        response = requests.post(f"{endpoint}/v1/chat/completions", 
-                               headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        result = response.json()
-        return result['choices'][0]['message']['content']
-        
-    except requests.exceptions.RequestException as e:
-        return f"Error: {e}"
+        return await client.complete(messages, **PARAMS)
     except KeyError as e:
         return f"Error: Unexpected response format - {e}"
     except Exception as e:
         return f"Error: {e}"
 
+
+async def chat_many(client, prompts, concurrency=4):
+    """Ask several independent questions concurrently over the same connection pool"""
+    return await client.map_prompts(prompts, system=SYSTEM_PROMPT, concurrency=concurrency, **PARAMS)
+
+
 # Interactive chat loop
-def interactive_chat(endpoint="http://192.168.1.141:1234"):
+async def interactive_chat(endpoint=ENDPOINT):
     """Interactive chat loop - type 'quit' to exit"""
     print("🤖 AI Chat Assistant")
     print("Type 'quit' to exit the chat")
     print("-" * 40)
-    
-    conversation_history = []
-    
-    while True:
-        try:
-            # Get user input
-            user_input = input("\nYou: ").strip()
-            
-            # Check for quit command
-            if user_input.lower() in ['quit', 'exit', 'bye', 'goodbye']:
-                print("👋 Goodbye! Thanks for chatting!")
+
+    # The context counts tokens once per message and trims the oldest turns in batches,
+    # so the system prompt and recent history stay byte-identical and the server's prefix cache stays warm
+    context = ConversationContext(SYSTEM_PROMPT, MAX_PROMPT_TOKENS)
+
+    async with ChatClient(endpoint) as client:
+        while True:
+            try:
+                # Get user input without blocking the event loop
+                user_input = (await asyncio.to_thread(input, "\nYou: ")).strip()
+
+                # Check for quit command
+                if user_input.lower() in ['quit', 'exit', 'bye', 'goodbye']:
+                    print("👋 Goodbye! Thanks for chatting!")
+                    break
+
+                if not user_input:
+                    print("Please enter a message or type 'quit' to exit.")
+                    continue
+
+                # Get AI response with streaming; the context records both sides of the turn
+                print("\nAI: ", end="", flush=True)
+                await chat_with_model_stream(client, user_input, context)
+
+            except (KeyboardInterrupt, EOFError):
+                print("\n\n👋 Goodbye! Thanks for chatting!")
                 break
-            
-            if not user_input:
-                print("Please enter a message or type 'quit' to exit.")
-                continue
-            
-            # Add user message to conversation
-            conversation_history.append({"role": "user", "content": user_input})
-            
-            # Get AI response with streaming
-            print("\nAI: ", end="", flush=True)
-            ai_response = chat_with_model_stream(user_input, endpoint, conversation_history)
-            
-            # Add AI response to conversation history
-            if ai_response:
-                conversation_history.append({"role": "assistant", "content": ai_response})
-            
-        except KeyboardInterrupt:
-            print("\n\n👋 Goodbye! Thanks for chatting!")
-            break
-        except Exception as e:
-            print(f"\nError: {e}")
-            print("Please try again or type 'quit' to exit.")
+            except Exception as e:
+                print(f"\nError: {e}")
+                print("Please try again or type 'quit' to exit.")
 
 # Example usage
 if __name__ == "__main__":
     # Interactive chat loop
-    interactive_chat()
-    
-    # Or single message examples:
-    # print("=== Single Message Examples ===")
-    # message = "Hello, how can you help me?"
-    # chat_with_model_stream(message)
-    # response = chat_with_model(message)
-    # print(f"AI Response: {response}")
+    try:
+        asyncio.run(interactive_chat())
+    except KeyboardInterrupt:
+        pass
+
+    # Or single message / batch examples:
+    # async def examples():
+    #     async with ChatClient(ENDPOINT) as client:
+    #         message = "Hello, how can you help me?"
+    #         await chat_with_model_stream(client, message)
+    #         print(f"AI Response: {await chat_with_model(client, message)}")
+    #         print(await chat_many(client, ["What is a GPU?", "What is a TPU?"]))
+    # asyncio.run(examples())
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Resumable Batch Inference for Multiverse
+Runs every request in a JSONL file against an OpenAI-compatible endpoint with bounded
+concurrency, request and token rate limits and retries, and appends each result to an
+output JSONL as it completes. The output doubles as the checkpoint: running the same
+command again skips everything that already succeeded.
+
+Examples:
+    python scripts/batch-infer.py prompts.jsonl -o results.jsonl --concurrency 8
+    python scripts/batch-infer.py requests.jsonl -o answers.jsonl --template '{title}\\n\\n{body}' --rpm 120 --tpm 200000
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+try:
+    import httpx
+    from multiverse_client import ChatClient
+except ImportError:
+    print("httpx is required: pip install httpx", file=sys.stderr)
+    sys.exit(1)
+
+from conversation_context import MESSAGE_OVERHEAD_TOKENS, count_tokens  # noqa: E402
+
+# Fields tried, in order, for an item's ID when --id-field is not given (otherwise the line number is used)
+ID_FIELDS = ("custom_id", "id", "request_id")
+# Record fields sent upstream as request parameters; anything else (metadata, labels, ...) stays local
+REQUEST_PARAMS = {"model", "max_tokens", "max_completion_tokens", "temperature", "top_p", "top_k", "min_p", "stop",
+                  "seed", "presence_penalty", "frequency_penalty", "repetition_penalty", "logit_bias", "logprobs",
+                  "top_logprobs", "response_format", "tools", "tool_choice", "parallel_tool_calls",
+                  "reasoning_effort", "user"}
+# Worth another attempt: rate limited, timed out or a server-side failure
+RETRY_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 60.0
+# Completions per second are measured over this window for the ETA
+RATE_WINDOW_SECONDS = 60.0
+
+
+def load_items(path, args):
+    """Read the input JSONL into (id, record, messages, params) tuples
+
+    With --template, every line is a record whose fields fill the template.
+    Otherwise a line is {"messages": [...]} or {"prompt": "..."} plus optional
+    per-request parameters (model, max_tokens, ... from REQUEST_PARAMS), or a
+    bare JSON string.
+    """
+    items, seen = [], set()
+    template = args.template.replace("\\n", "\n") if args.template else None
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise SystemExit(f"{path}:{number}: invalid JSON ({e})")
+            if isinstance(record, str):
+                record = {"prompt": record}
+            if args.id_field:
+                if args.id_field not in record:
+                    raise SystemExit(f"{path}:{number}: no '{args.id_field}' field")
+                item_id = record[args.id_field]
+            else:
+                item_id = next((record[field] for field in ID_FIELDS if field in record), number)
+            if str(item_id) in seen:
+                raise SystemExit(f"{path}:{number}: duplicate ID {item_id!r}")
+            seen.add(str(item_id))
+
+            params = {}
+            if template:
+                try:
+                    messages = [{"role": "user", "content": template.format_map(record)}]
+                except KeyError as e:
+                    raise SystemExit(f"{path}:{number}: template field {e} is missing")
+            elif "messages" in record:
+                messages = record["messages"]
+            elif "prompt" in record:
+                messages = [{"role": "user", "content": record["prompt"]}]
+            else:
+                raise SystemExit(f"{path}:{number}: expected 'messages' or 'prompt' (or use --template)")
+            if not template:
+                params = {k: v for k, v in record.items() if k in REQUEST_PARAMS}
+            if args.system and messages[0].get("role") != "system":
+                messages = [{"role": "system", "content": args.system}, *messages]
+            items.append((item_id, record, messages, params))
+    if not items:
+        raise SystemExit(f"{path}: no requests found")
+    return items
+
+
+def load_checkpoint(path, skip_failed):
+    """IDs already finished in an earlier run of the same output file
+
+    A run that was killed mid-write can leave a partial last line; it is cut
+    off so new results start on a fresh line. Failed items are run again
+    unless skip_failed is set; the newest line for an ID is its result.
+    """
+    done, failed = set(), set()
+    if not os.path.exists(path):
+        return done, failed
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        key = str(record.get("id"))
+        if record.get("ok"):
+            done.add(key)
+            failed.discard(key)
+        elif key not in done:
+            failed.add(key)
+    return done | failed if skip_failed else done, failed
+
+
+class RateLimiter:
+    """Token bucket: `per_minute` units refilled continuously, holding at most `burst`
+
+    Callers are served in arrival order. A cost above the burst waits for a
+    full bucket and leaves it in debt, and settle() corrects an estimate once
+    the real cost is known.
+    """
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60.0
+        self.burst = max(1.0, burst)
+        self.level = self.burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.burst, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, cost=1.0):
+        async with self._lock:
+            self._refill()
+            needed = min(cost, self.burst)
+            while self.level < needed:
+                await asyncio.sleep((needed - self.level) / self.rate)
+                self._refill()
+            self.level -= cost
+
+    def settle(self, estimated, actual):
+        self._refill()
+        self.level = min(self.burst, self.level + estimated - actual)
+
+
+class Progress:
+    """Counters for the live status line and the final summary"""
+
+    def __init__(self, total, resumed):
+        self.total = total
+        self.resumed = resumed
+        self.ok = 0
+        self.failed = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.started = time.monotonic()
+        self._recent = collections.deque()  # completion times within RATE_WINDOW_SECONDS
+
+    def completed(self, ok, usage):
+        if ok:
+            self.ok += 1
+        else:
+            self.failed += 1
+        if usage:
+            self.prompt_tokens += usage.get("prompt_tokens") or 0
+            self.completion_tokens += usage.get("completion_tokens") or 0
+        self._recent.append(time.monotonic())
+
+    @property
+    def done(self):
+        return self.ok + self.failed
+
+    def rate(self):
+        """Completions per second over the last minute (since the start until a minute has passed)"""
+        now = time.monotonic()
+        while self._recent and self._recent[0] < now - RATE_WINDOW_SECONDS:
+            self._recent.popleft()
+        window = min(RATE_WINDOW_SECONDS, now - self.started)
+        return len(self._recent) / window if window > 0 else 0.0
+
+    def line(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.rate()
+        remaining = self.total - self.done
+        eta = format_duration(remaining / rate) if rate > 0 else "-"
+        tokens_per_second = self.completion_tokens / elapsed if elapsed > 0 else 0.0
+        return (f"{self.done}/{self.total} done ({self.ok} ok, {self.failed} failed, {self.retries} retries), "
+                f"{self.in_flight} in flight, {rate:.2f} req/s, {tokens_per_second:.0f} tok/s, "
+                f"elapsed {format_duration(elapsed)}, ETA {eta}")
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def retry_delay(attempt, error):
+    """Full-jitter exponential backoff, but never sooner than the server's Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_INITIAL * 2 ** (attempt - 1)))
+    if isinstance(error, httpx.HTTPStatusError):
+        try:
+            delay = max(delay, float(error.response.headers.get("retry-after", 0)))
+        except ValueError:
+            pass
+    return delay
+
+
+def is_retryable(error):
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRY_STATUSES
+    return isinstance(error, httpx.TransportError)
+
+
+def describe(error):
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code}: {error.response.text[:200]}"
+    return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+
+async def complete(client, messages, params):
+    """Stream one completion; returns its text, reasoning, finish reason, usage and time to first token"""
+    started = time.perf_counter()
+    content, reasoning = [], []
+    finish_reason = usage = ttft = None
+    params = {"stream_options": {"include_usage": True}, **params}
+    async for batch in client.stream(messages, batch=True, **params):
+        if ttft is None:
+            ttft = time.perf_counter() - started
+        for delta in batch:
+            content.append(delta.content)
+            reasoning.append(delta.reasoning)
+            finish_reason = delta.finish_reason or finish_reason
+            usage = delta.usage or usage
+    return "".join(content), "".join(reasoning), finish_reason, usage, ttft
+
+
+async def run_item(client, item, args, limits, progress, stopping):
+    """One request with retries; returns its output record, or None if stopped while waiting to retry"""
+    item_id, record, messages, params = item
+    defaults = {"max_tokens": args.max_tokens}
+    if args.temperature is not None:
+        defaults["temperature"] = args.temperature
+    params = {**defaults, **params}
+    # The token limit is charged up front with the prompt estimate plus max_tokens, then settled with the real usage
+    estimate = sum(count_tokens(str(m.get("content") or "")) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+    estimate += params.get("max_tokens") or 0
+    started = time.perf_counter()
+    attempt = 0
+    while True:
+        if limits["requests"]:
+            await limits["requests"].acquire()
+        if limits["tokens"]:
+            await limits["tokens"].acquire(estimate)
+        progress.in_flight += 1
+        try:
+            text, reasoning, finish_reason, usage, ttft = await complete(client, messages, params)
+            error = None
+        except Exception as e:
+            # HTTP and network errors, but also e.g. a malformed response: a failed item, never a dead worker
+            error = e
+        finally:
+            progress.in_flight -= 1
+        if limits["tokens"]:
+            limits["tokens"].settle(estimate, (usage or {}).get("total_tokens", estimate) if error is None else 0)
+        if error is None or attempt >= args.retries or not is_retryable(error):
+            break
+        attempt += 1
+        progress.retries += 1
+        try:
+            await asyncio.wait_for(stopping.wait(), retry_delay(attempt, error))
+            return None  # left for the next run
+        except asyncio.TimeoutError:
+            pass
+
+    output = {"id": item_id, "ok": error is None}
+    if error is None:
+        output.update({"response": text, "finishReason": finish_reason, "usage": usage})
+        if reasoning:
+            output["reasoning"] = reasoning
+        output["ttftMs"] = round(ttft * 1000, 1) if ttft is not None else None
+    else:
+        output["error"] = describe(error)
+    output["latencyMs"] = round((time.perf_counter() - started) * 1000, 1)
+    output["attempts"] = attempt + 1
+    if args.echo:
+        output["input"] = record
+    return output
+
+
+async def run(args):
+    items = load_items(args.input, args)
+    done, failed = load_checkpoint(args.output, args.skip_failed)
+    pending = [item for item in items if str(item[0]) not in done]
+    resumed = len(items) - len(pending)
+    if resumed:
+        print(f"Resuming: {resumed} of {len(items)} item(s) already in {args.output}", file=sys.stderr)
+    if failed and not args.skip_failed:
+        print(f"Retrying {len(failed)} item(s) that failed in an earlier run", file=sys.stderr)
+    progress = Progress(len(pending), resumed)
+    if not pending:
+        print("Nothing to do", file=sys.stderr)
+        return progress, False
+
+    limits = {
+        "requests": RateLimiter(args.rpm, args.rpm / 60.0) if args.rpm else None,
+        # Up to ten seconds' worth of tokens at once, so the first requests do not all wait for the bucket to fill
+        "tokens": RateLimiter(args.tpm, args.tpm / 6.0) if args.tpm else None,
+    }
+    queue = iter(pending)
+    stopping = asyncio.Event()
+    interrupts = 0
+    workers = []
+
+    def interrupt():
+        nonlocal interrupts
+        interrupts += 1
+        stopping.set()
+        if interrupts == 1:
+            print("\nFinishing requests in flight; press Ctrl-C again to abandon them", file=sys.stderr)
+        else:
+            for worker in workers:
+                worker.cancel()
+
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGINT, interrupt)
+        loop.add_signal_handler(signal.SIGTERM, interrupt)
+    except (NotImplementedError, RuntimeError):
+        pass  # Windows: Ctrl-C abandons requests in flight; their items are redone on resume
+
+    async with ChatClient(args.endpoint, api_key=args.api_key, model=args.model,
+                          max_connections=args.concurrency, timeout=args.timeout) as client:
+        with open(args.output, "a", encoding="utf-8") as out:
+
+            async def worker():
+                # Items are pulled one at a time, so the work in flight never exceeds the concurrency
+                for item in queue:
+                    if stopping.is_set():
+                        return
+                    output = await run_item(client, item, args, limits, progress, stopping)
+                    if output is None:
+                        continue
+                    # One write per line and a flush, so a kill leaves at most one partial line
+                    out.write(json.dumps(output, ensure_ascii=False) + "\n")
+                    out.flush()
+                    progress.completed(output["ok"], output.get("usage"))
+
+            async def report():
+                tty = sys.stderr.isatty()
+                while True:
+                    await asyncio.sleep(1.0 if tty else args.progress_interval)
+                    print(("\r" + progress.line() + "\x1b[K") if tty else progress.line(),
+                          end="" if tty else "\n", file=sys.stderr, flush=True)
+
+            workers.extend(asyncio.create_task(worker()) for _ in range(args.concurrency))
+            reporter = asyncio.create_task(report())
+            results = await asyncio.gather(*workers, return_exceptions=True)
+            reporter.cancel()
+            if sys.stderr.isatty():
+                print(file=sys.stderr)
+            # Cancelled workers (second Ctrl-C) are expected; anything else is a bug worth a traceback
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+    return progress, stopping.is_set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable concurrent batch inference over a JSONL file")
+    parser.add_argument("input", help="JSONL of requests ({'messages': [...]}, {'prompt': ...}, a string, "
+                                      "or any record with --template)")
+    parser.add_argument("--output", "-o", required=True, help="Results JSONL; appended to, and read back to resume")
+    parser.add_argument("--endpoint", default="http://localhost:1234", help="Base URL of the server")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"), help="Bearer token (default: $OPENAI_API_KEY)")
+    parser.add_argument("--model", help="Model name to send (if a request does not set one)")
+    parser.add_argument("--template", help="Build the prompt from each record's fields, e.g. '{title}\\n\\n{body}'")
+    parser.add_argument("--system", help="System prompt added to requests that have none")
+    parser.add_argument("--id-field", help=f"Field holding each item's ID (default: first of {', '.join(ID_FIELDS)}, "
+                                           "else the line number)")
+    parser.add_argument("--concurrency", "-c", type=int, default=4, help="Maximum requests in flight (default: 4)")
+    parser.add_argument("--rpm", type=float, help="Request rate limit per minute")
+    parser.add_argument("--tpm", type=float, help="Token rate limit per minute (prompt estimate + max_tokens, "
+                                                  "corrected by the reported usage)")
+    parser.add_argument("--retries", type=int, default=5, help="Retries per request on 429, 5xx and network "
+                                                               "errors (default: 5)")
+    parser.add_argument("--max-tokens", type=int, default=1024)
+    parser.add_argument("--temperature", type=float)
+    parser.add_argument("--timeout", type=float, default=300.0, help="Read timeout in seconds; streamed responses "
+                                                                     "only need a chunk within it")
+    parser.add_argument("--skip-failed", action="store_true", help="On resume, do not run items that failed before")
+    parser.add_argument("--echo", action="store_true", help="Copy each input record into its result as 'input'")
+    parser.add_argument("--progress-interval", type=float, default=10.0,
+                        help="Seconds between progress lines when stderr is not a terminal")
+    args = parser.parse_args()
+    if args.concurrency < 1 or args.retries < 0 or (args.rpm is not None and args.rpm <= 0) \
+            or (args.tpm is not None and args.tpm <= 0):
+        parser.error("--concurrency, --rpm and --tpm must be positive and --retries not negative")
+
+    progress, interrupted = asyncio.run(run(args))
+    if not progress.total:
+        return 0
+    elapsed = time.monotonic() - progress.started
+    print(f"{progress.ok} ok, {progress.failed} failed of {progress.total} in {format_duration(elapsed)} "
+          f"({progress.done / elapsed if elapsed > 0 else 0:.2f} req/s, "
+          f"{progress.prompt_tokens} prompt + {progress.completion_tokens} completion tokens); "
+          f"results in {args.output}", file=sys.stderr)
+    if interrupted:
+        print("Interrupted; run the same command again to resume", file=sys.stderr)
+        return 130
+    if progress.done < progress.total:
+        print(f"{progress.total - progress.done} item(s) were not run; run the same command again to resume",
+              file=sys.stderr)
+        return 1
+    return 1 if progress.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Local Node Agents for Testing Multiverse Hub Mode
+Starts several metrics_server agents on this machine, each reading its own copy of a
+recorded sysfs fixture, or simulates hundreds of nodes in one process, and prints the
+MULTIVERSE_HUB_NODES value to point a hub at them.
+
+Usage:
+    # 4 real agents on ports 8101-8104, plus a hub on port 8100 following them
+    python scripts/cluster-agents.py --agents 4 --hub 8100
+
+    # 300 simulated nodes on one port (ws://127.0.0.1:8200/node-N/ws/metrics), 5 of them hung
+    python scripts/cluster-agents.py --simulate 300 --port 8200 --hung 5 --hub 8100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND)
+
+from delta_frames import CODECS, Frame, MSGPACK_AVAILABLE  # noqa: E402
+from fake_providers import FakeSysfs, load_fixture  # noqa: E402
+
+
+def start_server(port, env, log_path):
+    """A metrics_server under uvicorn on 127.0.0.1:port"""
+    log = open(log_path, "w")
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", "metrics_server:app", "--host", "127.0.0.1",
+                             "--port", str(port), "--log-level", "warning"],
+                            cwd=BACKEND, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+
+
+def start_hub(port, nodes, workdir):
+    env = {"MULTIVERSE_HUB_NODES": nodes, "MULTIVERSE_HISTORY_SECONDS": "0",
+           "MULTIVERSE_INVENTORY_CACHE": os.path.join(workdir, "hub-inventory.json")}
+    process = start_server(port, env, os.path.join(workdir, "hub.log"))
+    print(f"Hub on http://127.0.0.1:{port}/api/cluster (log: {os.path.join(workdir, 'hub.log')})")
+    return process
+
+
+def run_agents(args, workdir):
+    """Real metrics_server processes, each with a fake sysfs tree advanced once a second"""
+    fixture = load_fixture(args.fixture)
+    trees, processes, nodes = [], [], []
+    for index in range(args.agents):
+        port = args.port + index
+        tree = FakeSysfs(fixture, os.path.join(workdir, f"agent-{index}"))
+        # Start every agent at a different recorded sample so the nodes do not move in lockstep
+        for _ in range(index):
+            tree.advance()
+        env = {"MULTIVERSE_SYSFS_ROOT": tree.root, "MULTIVERSE_HISTORY_SECONDS": "0",
+               "MULTIVERSE_INVENTORY_CACHE": os.path.join(workdir, f"agent-{index}-inventory.json")}
+        processes.append(start_server(port, env, os.path.join(workdir, f"agent-{index}.log")))
+        trees.append(tree)
+        nodes.append(f"agent-{index}=127.0.0.1:{port}")
+    hub_nodes = ",".join(nodes)
+    print(f"{args.agents} agent(s) on ports {args.port}-{args.port + args.agents - 1} ({args.fixture})")
+    print(f"MULTIVERSE_HUB_NODES={hub_nodes}")
+    if args.hub:
+        processes.append(start_hub(args.hub, hub_nodes, workdir))
+    # Agents may be killed on purpose to watch the hub mark them down, so keep going until all are gone
+    exited = set()
+    try:
+        while len(exited) < len(processes):
+            time.sleep(1.0)
+            for tree in trees:
+                tree.advance()
+            for index, process in enumerate(processes):
+                if index not in exited and process.poll() is not None:
+                    exited.add(index)
+                    print(f"Server on port {process.args[-3]} exited with code {process.returncode}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.send_signal(signal.SIGINT)
+        for process in processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+class SimulatedNode:
+    """One fake node: 8 GPUs doing a random walk, encoded the way metrics_server encodes frames"""
+
+    def __init__(self, index, gpus=8):
+        self.name = f"node-{index}"
+        self.rng = random.Random(index)
+        self.utilization = [self.rng.uniform(0, 100) for _ in range(gpus)]
+        self.frame = None
+        self.seq = 0
+        self.changed = asyncio.Event()
+
+    def tick(self):
+        self.seq += 1
+        gpus = []
+        for index, utilization in enumerate(self.utilization):
+            utilization = min(100.0, max(0.0, utilization + self.rng.uniform(-10, 10)))
+            self.utilization[index] = utilization
+            gpus.append({
+                "index": index, "model": "AMD Instinct MI300X", "vendor": "AMD",
+                "memoryTotal": 206158430208, "memoryUsed": int(206158430208 * utilization / 120),
+                "utilization": round(utilization), "temperature": round(40 + utilization * 0.4),
+                "powerDraw": round(150 + utilization * 5.5, 1), "graphicsClock": 2100
+            })
+        document = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "cpu": {"utilization": round(self.rng.uniform(5, 40), 1)},
+            "memory": {"percent": round(self.rng.uniform(20, 60), 1)},
+            "gpu": gpus[0],
+            "gpus": gpus,
+            "throttle": {"throttling": 0, "maxSeverity": 0, "maxClockDrop": 0.0, "active": [], "events": []}
+        }
+        self.frame = Frame(self.seq, time.time(), document, self.frame)
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+async def simulate(args):
+    """Hundreds of nodes behind one port, told apart by path; the last --hung nodes never send a frame"""
+    import websockets
+
+    nodes = {node.name: node for node in (SimulatedNode(i) for i in range(args.simulate))}
+    hung = {f"node-{i}" for i in range(args.simulate - args.hung, args.simulate)}
+
+    async def handler(websocket):
+        name = websocket.path.strip("/").split("/")[0]
+        node = nodes.get(name)
+        if node is None:
+            await websocket.close(1008, "unknown node")
+            return
+        if name in hung:
+            await asyncio.Future()  # accept, then never answer
+        codec = CODECS.get(websocket.subprotocol)
+        last_seq = None
+
+        async def acknowledge():
+            async for message in websocket:
+                if json.loads(message).get("type") == "subscribe":
+                    await websocket.send(json.dumps({"type": "subscribed"}))
+
+        listener = asyncio.create_task(acknowledge())
+        try:
+            while True:
+                await node.changed.wait()
+                frame = node.frame
+                await websocket.send(frame.encode(codec, last_seq) if codec else frame.json())
+                last_seq = frame.seq
+        finally:
+            listener.cancel()
+
+    protocols = (["multiverse.delta.msgpack"] if MSGPACK_AVAILABLE else []) + ["multiverse.delta.json"]
+    async with websockets.serve(handler, "127.0.0.1", args.port, subprotocols=protocols, ping_interval=None):
+        urls = ",".join(f"{name}=ws://127.0.0.1:{args.port}/{name}/ws/metrics" for name in nodes)
+        print(f"{args.simulate} simulated node(s) on port {args.port} ({args.hung} hung)")
+        if not args.hub:
+            print(f"MULTIVERSE_HUB_NODES={urls}")
+        hub = start_hub(args.hub, urls, tempfile.mkdtemp(prefix="multiverse-hub-")) if args.hub else None
+        try:
+            while hub is None or hub.poll() is None:
+                for node in nodes.values():
+                    node.tick()
+                await asyncio.sleep(1.0)
+        finally:
+            if hub:
+                hub.send_signal(signal.SIGINT)
+                hub.wait(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local metrics agents for testing hub mode")
+    parser.add_argument("--agents", type=int, default=3, help="Real metrics_server agents to start")
+    parser.add_argument("--simulate", type=int, default=0, help="Simulate this many nodes in-process instead")
+    parser.add_argument("--hung", type=int, default=0, help="Simulated nodes that accept connections but never send")
+    parser.add_argument("--port", type=int, default=8101, help="First agent port (or the simulation port)")
+    parser.add_argument("--fixture", default="sysfs-mi300x", help="sysfs fixture each real agent reads")
+    parser.add_argument("--hub", type=int, help="Also start a hub on this port following the agents")
+    args = parser.parse_args()
+
+    if args.simulate:
+        try:
+            asyncio.run(simulate(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix="multiverse-agents-")
+    try:
+        run_agents(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
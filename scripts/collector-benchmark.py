@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Metrics Collector Benchmark for Multiverse
+Measures what a MetricsCollector sample costs (per source and in total), how much it
+allocates, and how fast frames fan out to WebSocket subscribers, using the recorded
+hardware fixtures in backend/fixtures so it runs on any machine.
+
+Usage:
+    python scripts/collector-benchmark.py                               # report only
+    python scripts/collector-benchmark.py --save-baseline baseline.json # record a baseline
+    python scripts/collector-benchmark.py --baseline baseline.json      # flag regressions (exit 1)
+    python scripts/collector-benchmark.py --dump                        # show what each fixture parses to
+    python scripts/collector-benchmark.py --capture fixtures/           # record this machine's hardware
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import fake_providers  # noqa: E402
+from fake_providers import FakeNvml, FakeRocmSmi, FakeSysfs, fake_inventory, list_fixtures, load_fixture  # noqa: E402
+
+BASELINE_VERSION = 1
+HOST_SOURCES = ("cpu", "memory", "io", "process", "battery", "static")
+DEFAULT_CLIENTS = "1,10,100,1000"
+FAN_OUT_CODECS = ("json", "multiverse.delta.json", "multiverse.delta.msgpack")
+
+
+class Fixture:
+    """A MetricsCollector wired to one recorded fixture"""
+
+    def __init__(self, server, kind, name, directory):
+        self.name = name
+        self.sysfs = None
+        self.empty_root = tempfile.mkdtemp(prefix="multiverse-bench-")
+        data = load_fixture(name, directory)
+        if kind == "nvml":
+            self.collector = server.MetricsCollector(
+                sysfs_root=self.empty_root, inventory=fake_inventory(nvidia=True),
+                nvml=FakeNvml(data), run_command=FakeRocmSmi({}))
+        elif kind == "rocm-smi":
+            self.collector = server.MetricsCollector(
+                sysfs_root=self.empty_root, inventory=fake_inventory(rocm_smi=True), run_command=FakeRocmSmi(data))
+        else:
+            self.sysfs = FakeSysfs(data)
+            self.collector = server.MetricsCollector(
+                sysfs_root=self.sysfs.root, inventory=fake_inventory(), run_command=FakeRocmSmi({}))
+
+    def tick(self):
+        """Move the recorded hardware on to its next sample (untimed)"""
+        if self.sysfs is not None:
+            self.sysfs.advance()
+
+    def close(self):
+        self.collector.amd_sysfs.close()
+        if self.sysfs is not None:
+            self.sysfs.close()
+        os.rmdir(self.empty_root)
+
+
+def load_fixtures(server, directory, only):
+    fixtures = []
+    for kind in ("nvml", "rocm-smi", "sysfs"):
+        for name in list_fixtures(kind, directory):
+            if not only or name in only:
+                fixtures.append(Fixture(server, kind, name, directory))
+    return fixtures
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def latency(function, iterations, before=None, rounds=3):
+    """Median and p95 wall time of one call in microseconds, from the quietest of a few rounds"""
+    best = None
+    for _ in range(rounds):
+        durations = []
+        for _ in range(iterations):
+            if before:
+                before()
+            started = time.perf_counter()
+            function()
+            durations.append((time.perf_counter() - started) * 1e6)
+        measured = statistics.median(durations), percentile(durations, 0.95)
+        if best is None or measured[0] < best[0]:
+            best = measured
+    return best
+
+
+def allocations(function, iterations, before=None):
+    """Peak bytes allocated during one call, and bytes still held after all of them (leaks)"""
+    function()  # warm caches and lazily created state
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        peaks = []
+        for _ in range(iterations):
+            if before:
+                before()
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            function()
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    return statistics.median(peaks), max(0, retained)
+
+
+def record(results, name, value, unit, better="lower"):
+    """Add a result; better=None marks it as informational (never flagged)"""
+    results[name] = {"value": round(value, 3), "unit": unit, "better": better}
+
+
+def bench_sources(server, fixtures, iterations, results):
+    """Per-source and whole-sample latency and allocations"""
+    scheduler = server.CollectionScheduler(fixtures[0].collector)
+    print(f"{'source':<34}{'p50 us':>10}{'p95 us':>10}{'alloc KiB':>12}")
+    for name in HOST_SOURCES:
+        collect = scheduler.sources[name].collect
+        p50, p95 = latency(collect, iterations)
+        allocated, _ = allocations(collect, max(10, iterations // 10))
+        _report(results, f"source.{name}", p50, p95, allocated)
+
+    for fixture in fixtures:
+        collect = fixture.collector.get_all_gpu_metrics
+        p50, p95 = latency(collect, iterations, fixture.tick)
+        allocated, _ = allocations(collect, max(10, iterations // 10), fixture.tick)
+        _report(results, f"source.gpu.{fixture.name}", p50, p95, allocated)
+
+    # A whole sample: every source once, then the document the streams are built from
+    print()
+    for fixture in fixtures:
+        scheduler = server.CollectionScheduler(fixture.collector)
+        sources = list(scheduler.sources.values())
+
+        def sample():
+            for source in sources:
+                source.value = source.collect()
+            return scheduler.snapshot()
+
+        p50, p95 = latency(sample, iterations, fixture.tick)
+        allocated, retained = allocations(sample, max(10, iterations // 10), fixture.tick)
+        _report(results, f"sample.{fixture.name}", p50, p95, allocated)
+        record(results, f"sample.{fixture.name}.retainedBytes", retained, "B")
+
+
+def _report(results, name, p50, p95, allocated):
+    print(f"{name:<34}{p50:>10.1f}{p95:>10.1f}{allocated / 1024:>12.1f}")
+    record(results, f"{name}.p50", p50, "us")
+    # Tail latency is too noisy on shared machines to gate on
+    record(results, f"{name}.p95", p95, "us", better=None)
+    record(results, f"{name}.allocatedBytes", allocated, "B")
+
+
+async def fan_out(server, documents, clients, codec):
+    """Publish every document to one stream with `clients` subscribers, each running the WebSocket sender loop
+
+    Socket writes are left out: this is the server-side cost of projecting,
+    encoding and handing a frame to every client.
+    """
+    stream = server.MetricsStream(server.ALL_GROUPS, server.MIN_STREAM_INTERVAL)
+    subscribers = []
+    for _ in range(clients):
+        subscriber = server.Subscriber(codec)
+        subscriber.stream = stream
+        stream.subscribers.add(subscriber)
+        subscribers.append(subscriber)
+    delivered = 0
+    sent_bytes = 0
+
+    async def sender(subscriber):
+        nonlocal delivered, sent_bytes
+        while True:
+            frame = await subscriber.queue.get()
+            if frame is None:
+                return
+            sent_bytes += len(subscriber.encode(frame))
+            delivered += 1
+
+    tasks = [asyncio.create_task(sender(subscriber)) for subscriber in subscribers]
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    for document in documents:
+        stream.publish(document)
+        # One pass of the event loop lets every sender pick up and encode the frame
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+    for subscriber in subscribers:
+        subscriber.close()
+    await asyncio.gather(*tasks)
+    dropped = sum(subscriber.dropped for subscriber in subscribers)
+    return elapsed, delivered, sent_bytes, dropped
+
+
+def bench_fan_out(server, fixtures, frames, client_counts, results):
+    """Frames delivered per second to 1..N subscribers, for each protocol"""
+    from delta_frames import CODECS, MSGPACK_AVAILABLE
+
+    # Documents from the richest recorded node, so frames change the way they do under load
+    fixture = max(fixtures, key=lambda f: len(f.collector.get_all_gpu_metrics()))
+    scheduler = server.CollectionScheduler(fixture.collector)
+    documents = []
+    for _ in range(frames):
+        fixture.tick()
+        for source in scheduler.sources.values():
+            source.value = source.collect()
+        documents.append(scheduler.snapshot())
+
+    print(f"\nFan-out of {frames} frames from {fixture.name} (socket writes excluded)")
+    print(f"{'protocol':<28}{'clients':>8}{'frames/s':>14}{'us/client-frame':>17}{'KiB/frame':>11}")
+    for codec_name in FAN_OUT_CODECS:
+        if codec_name.endswith("msgpack") and not MSGPACK_AVAILABLE:
+            print(f"{codec_name:<28}  skipped (msgpack not installed)")
+            continue
+        codec = CODECS.get(codec_name)
+        for clients in client_counts:
+            # Best of three runs, like the latency rounds
+            elapsed, delivered, sent_bytes, dropped = min(
+                (asyncio.run(fan_out(server, documents, clients, codec)) for _ in range(3)),
+                key=lambda run: run[0] / run[1])
+            rate = delivered / elapsed
+            per_frame = elapsed / delivered * 1e6
+            print(f"{codec_name:<28}{clients:>8}{rate:>14,.0f}{per_frame:>17.2f}{sent_bytes / delivered / 1024:>11.1f}"
+                  + (f"  ({dropped} dropped)" if dropped else ""))
+            record(results, f"fanout.{codec_name}.{clients}.framesPerSecond", rate, "frames/s", better="higher")
+
+
+def compare(results, baseline, tolerance):
+    """Metrics that got worse than the baseline by more than the tolerance"""
+    regressions = []
+    for name, previous in baseline.get("results", {}).items():
+        current = results.get(name)
+        if current is None or not previous["value"] or previous.get("better") is None:
+            continue
+        change = current["value"] / previous["value"] - 1
+        worse = change > tolerance if previous["better"] == "lower" else change < -tolerance
+        # Tiny byte counts and sub-microsecond timings swing by large ratios on noise alone
+        if worse and abs(current["value"] - previous["value"]) >= (1.0 if current["unit"] == "us" else 256):
+            regressions.append((name, previous["value"], current["value"], change, current["unit"]))
+    return regressions
+
+
+def capture(directory, samples, interval):
+    """Record the GPUs on this machine as fixtures the benchmark can replay elsewhere"""
+    os.makedirs(directory, exist_ok=True)
+    host = platform.node() or "host"
+    captures = (("nvml", lambda: fake_providers.capture_nvml(samples, interval)),
+                ("rocm-smi", lambda: fake_providers.capture_rocm_smi(samples, interval)),
+                ("sysfs", lambda: fake_providers.capture_sysfs("/", samples, interval)))
+    written = 0
+    for kind, function in captures:
+        try:
+            data = function()
+        except Exception as e:
+            print(f"{kind}: not captured ({e})")
+            continue
+        if not data.get("devices", data.get("cards", data.get("json"))):
+            print(f"{kind}: no devices")
+            continue
+        path = os.path.join(directory, f"{kind}-{host}.json")
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
+        print(f"{kind}: wrote {path}")
+        written += 1
+    return 0 if written else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark metrics collection against recorded hardware fixtures")
+    parser.add_argument("--fixtures", help="Comma-separated fixture names (default: all)")
+    parser.add_argument("--fixture-dir", default=fake_providers.FIXTURE_DIR)
+    parser.add_argument("--iterations", type=int, default=200, help="Timed calls per source")
+    parser.add_argument("--frames", type=int, default=60, help="Frames published per fan-out run")
+    parser.add_argument("--clients", default=DEFAULT_CLIENTS, help="Comma-separated subscriber counts")
+    parser.add_argument("--baseline", help="Compare against this baseline and exit 1 on regressions")
+    parser.add_argument("--save-baseline", help="Write the results as a baseline to this file")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed change against the baseline before it counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--dump", action="store_true", help="Print the GPU metrics each fixture parses to and exit")
+    parser.add_argument("--capture", metavar="DIR", help="Record this machine's GPUs as fixtures into DIR and exit")
+    parser.add_argument("--capture-samples", type=int, default=10)
+    parser.add_argument("--capture-interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.capture:
+        return capture(args.capture, args.capture_samples, args.capture_interval)
+
+    logging.disable(logging.INFO)
+    import metrics_server as server
+
+    only = {name.strip() for name in args.fixtures.split(",")} if args.fixtures else None
+    fixtures = load_fixtures(server, args.fixture_dir, only)
+    if not fixtures:
+        print(f"No fixtures found in {args.fixture_dir}")
+        return 1
+    try:
+        if args.dump:
+            for fixture in fixtures:
+                fixture.tick()
+                print(f"{fixture.name}:")
+                print(json.dumps(fixture.collector.get_all_gpu_metrics(), indent=1))
+            return 0
+
+        results = {}
+        bench_sources(server, fixtures, args.iterations, results)
+        bench_fan_out(server, fixtures, args.frames, [int(n) for n in args.clients.split(",")], results)
+    finally:
+        for fixture in fixtures:
+            fixture.close()
+
+    report = {
+        "version": BASELINE_VERSION,
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)",
+        "results": results
+    }
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("machine") != report["machine"]:
+            print(f"\nNote: baseline recorded on {baseline.get('machine')}, this is {report['machine']}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline} (tolerance {args.tolerance:.0%}):")
+            for name, previous, current, change, unit in regressions:
+                print(f"  {name:<52}{previous:>12,.1f} -> {current:>12,.1f} {unit} ({change:+.0%})")
+            return 1
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
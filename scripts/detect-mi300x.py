@@ -1,76 +1,28 @@
 #!/usr/bin/env python3
 """
 MI300X GPU Detection Script for Multiverse
-Detects AMD MI300X GPUs using rocm-smi and provides metrics
+Detects AMD MI300X GPUs from the cached GPU inventory and provides metrics
+(live values from amdgpu sysfs, or one rocm-smi call when sysfs is unavailable)
 """
 
-import subprocess
+import argparse
 import json
-import sys
 import os
+import subprocess
+import sys
 
-def run_command(cmd):
-    """Run a shell command and return the output"""
-    try:
-        result = subprocess.run(
-            cmd,
-            shell=True,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        return None
-    except FileNotFoundError:
-        return None
-
-def detect_rocm_smi():
-    """Check if rocm-smi is available"""
-    return run_command("which rocm-smi") is not None
-
-def get_gpu_info():
-    """Get GPU information using rocm-smi"""
-    if not detect_rocm_smi():
-        return None
-    
-    # Get GPU list
-    gpu_list = run_command("rocm-smi --showid")
-    if not gpu_list:
-        return None
-    
-    gpus = []
-    
-    # Try to get detailed info for each GPU
-    # rocm-smi --showproductname --showid --showmeminfo vram --showtemp --showuse --showpower
-    info = run_command("rocm-smi --showproductname --showid --showmeminfo vram --showtemp --showuse --showpower --json")
-    
-    if info:
-        try:
-            data = json.loads(info)
-            if isinstance(data, dict) and 'card0' in data:
-                # Handle single GPU
-                gpu_data = data['card0']
-                gpus.append(parse_gpu_data(gpu_data, 0))
-            elif isinstance(data, list):
-                # Handle multiple GPUs
-                for idx, gpu_data in enumerate(data):
-                    gpus.append(parse_gpu_data(gpu_data, idx))
-        except json.JSONDecodeError:
-            # Fallback to parsing text output
-            pass
-    
-    # If JSON parsing failed, try text parsing
-    if not gpus:
-        gpus = parse_text_output()
-    
-    return gpus
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
 
-def parse_gpu_data(gpu_data, index):
-    """Parse GPU data from rocm-smi JSON output"""
-    gpu_info = {
+import gpu_inventory  # noqa: E402
+from amdgpu_sysfs import CARD_PATTERN, AmdGpuSysfsReader  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def empty_gpu_info(index, model='Unknown'):
+    return {
         'index': index,
-        'model': 'Unknown',
+        'model': model,
         'vendor': 'AMD',
         'memoryTotal': 0,
         'memoryUsed': 0,
@@ -82,139 +34,168 @@ def parse_gpu_data(gpu_data, index):
         'computeUnits': 0,
         'clockSpeed': 0
     }
-    
+
+
+def apply_spec(gpu_info, spec):
+    """Fill datasheet values from the spec table (measured values override them later)"""
+    if not spec:
+        return gpu_info
+    gpu_info['model'] = spec['model']
+    gpu_info['memoryTotal'] = spec['memoryTotal']
+    gpu_info['memoryType'] = spec.get('memoryType')
+    gpu_info['memoryBandwidth'] = spec['memoryBandwidth']
+    gpu_info['computeUnits'] = spec['computeUnits']
+    gpu_info['clockSpeed'] = spec['clockSpeed']
+    return gpu_info
+
+
+def get_sysfs_gpus(inventory, root):
+    """Static data from the inventory plus one read of each device's live sysfs values"""
+    reader = AmdGpuSysfsReader(root)
+    if not reader.available:
+        return []
+    live = {device.pci_bus: device.read() for device in reader.devices}
+    reader.close()
+
+    gpus = []
+    for device in (gpu for gpu in inventory['gpus'] if gpu['vendor'] == 'AMD'):
+        metrics = live.get(device['pciBus'])
+        if metrics is None:
+            continue
+        gpu_info = apply_spec(empty_gpu_info(len(gpus), device['model']), device['spec'])
+        gpu_info.update({
+            'pciBus': device['pciBus'],
+            'numaNode': device['numaNode'],
+            'xgmiHiveId': device['xgmiHiveId']
+        })
+        if metrics['memoryTotal']:
+            gpu_info['memoryTotal'] = metrics['memoryTotal'] / MB
+        gpu_info['memoryUsed'] = metrics['memoryUsed'] / MB
+        gpu_info['memoryFree'] = gpu_info['memoryTotal'] - gpu_info['memoryUsed']
+        gpu_info['temperature'] = metrics['temperature']
+        gpu_info['utilization'] = metrics['utilization']
+        gpu_info['powerDraw'] = metrics['powerDraw'] or 0
+        if metrics['graphicsClock']:
+            gpu_info['clockSpeed'] = metrics['graphicsClock']
+        gpus.append(gpu_info)
+    return gpus
+
+
+def get_rocm_smi_gpus(rocm_smi):
+    """Fallback: one rocm-smi call with JSON output"""
+    try:
+        result = subprocess.run(
+            [rocm_smi, "--showproductname", "--showid", "--showmeminfo", "vram", "--showtemp", "--showuse",
+             "--showpower", "--json"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            check=True
+        )
+        data = json.loads(result.stdout)
+    except (OSError, subprocess.SubprocessError, json.JSONDecodeError):
+        return []
+
+    if isinstance(data, dict):
+        # Numeric order (card2 before card10), the same indexes as sysfs discovery and the inventory
+        keys = [key for key in data if CARD_PATTERN.match(key)]
+        cards = [data[key] for key in sorted(keys, key=lambda key: int(CARD_PATTERN.match(key).group(1)))]
+    elif isinstance(data, list):
+        cards = data
+    else:
+        cards = []
+    return [parse_gpu_data(gpu_data, idx) for idx, gpu_data in enumerate(cards)]
+
+
+def parse_gpu_data(gpu_data, index):
+    """Parse GPU data from rocm-smi JSON output"""
+    gpu_info = empty_gpu_info(index)
+
     # Extract model name
     if 'Card series' in gpu_data:
         gpu_info['model'] = gpu_data['Card series']
     elif 'Card model' in gpu_data:
         gpu_info['model'] = gpu_data['Card model']
-    
-    # Check if it's MI300X
-    model_str = str(gpu_info['model']).upper()
-    if 'MI300X' in model_str or 'MI300' in model_str:
-        gpu_info['model'] = 'MI300X'
-        gpu_info['memoryTotal'] = 192 * 1024  # 192 GB in MB
-        gpu_info['memoryBandwidth'] = 5300  # 5.3 TB/s in GB/s
-        gpu_info['computeUnits'] = 304
-        gpu_info['clockSpeed'] = 1700  # MHz
-    elif 'MI250X' in model_str or 'MI250' in model_str:
-        gpu_info['model'] = 'MI250X'
-        gpu_info['memoryTotal'] = 128 * 1024  # 128 GB
-        gpu_info['memoryBandwidth'] = 3277  # GB/s
-        gpu_info['computeUnits'] = 220
-        gpu_info['clockSpeed'] = 1700
-    elif 'MI210' in model_str or 'MI210' in model_str:
-        gpu_info['model'] = 'MI210'
-        gpu_info['memoryTotal'] = 64 * 1024  # 64 GB
-        gpu_info['memoryBandwidth'] = 1638  # GB/s
-        gpu_info['computeUnits'] = 104
-        gpu_info['clockSpeed'] = 1700
-    
+    apply_spec(gpu_info, gpu_inventory.match_spec(str(gpu_info['model'])))
+
     # Extract memory info
     if 'vram' in gpu_data:
         vram = gpu_data['vram']
         if isinstance(vram, dict):
             if 'Total Memory (B)' in vram:
-                gpu_info['memoryTotal'] = int(vram['Total Memory (B)']) / (1024 * 1024)  # Convert to MB
+                gpu_info['memoryTotal'] = int(vram['Total Memory (B)']) / MB
             if 'Used Memory (B)' in vram:
-                gpu_info['memoryUsed'] = int(vram['Used Memory (B)']) / (1024 * 1024)
+                gpu_info['memoryUsed'] = int(vram['Used Memory (B)']) / MB
             if 'Free Memory (B)' in vram:
-                gpu_info['memoryFree'] = int(vram['Free Memory (B)']) / (1024 * 1024)
-    
+                gpu_info['memoryFree'] = int(vram['Free Memory (B)']) / MB
+    elif 'VRAM Total Memory (B)' in gpu_data:
+        gpu_info['memoryTotal'] = int(gpu_data['VRAM Total Memory (B)']) / MB
+        if 'VRAM Total Used Memory (B)' in gpu_data:
+            gpu_info['memoryUsed'] = int(gpu_data['VRAM Total Used Memory (B)']) / MB
+            gpu_info['memoryFree'] = gpu_info['memoryTotal'] - gpu_info['memoryUsed']
+
     # Extract temperature
     if 'Temperature (Sensor edge) (C)' in gpu_data:
         gpu_info['temperature'] = float(gpu_data['Temperature (Sensor edge) (C)'])
     elif 'Temperature (C)' in gpu_data:
         gpu_info['temperature'] = float(gpu_data['Temperature (C)'])
-    
+
     # Extract utilization
     if 'GPU use (%)' in gpu_data:
         gpu_info['utilization'] = float(gpu_data['GPU use (%)'])
-    
+
     # Extract power
     if 'Average Graphics Package Power (W)' in gpu_data:
         gpu_info['powerDraw'] = float(gpu_data['Average Graphics Package Power (W)'])
     elif 'Power (W)' in gpu_data:
         gpu_info['powerDraw'] = float(gpu_data['Power (W)'])
-    
+
     # Extract clock speed
     if 'GPU Clock (MHz)' in gpu_data:
         gpu_info['clockSpeed'] = float(gpu_data['GPU Clock (MHz)'])
-    
+
     return gpu_info
 
-def parse_text_output():
-    """Fallback: Parse text output from rocm-smi"""
-    gpus = []
-    
-    # Get product names
-    product_names = run_command("rocm-smi --showproductname")
-    if not product_names:
-        return gpus
-    
-    lines = product_names.split('\n')
-    for idx, line in enumerate(lines):
-        if 'Card series' in line or 'Card model' in line:
-            model = line.split(':')[-1].strip() if ':' in line else 'Unknown'
-            
-            gpu_info = {
-                'index': idx,
-                'model': model,
-                'vendor': 'AMD',
-                'memoryTotal': 0,
-                'memoryUsed': 0,
-                'memoryFree': 0,
-                'temperature': 0,
-                'utilization': 0,
-                'powerDraw': 0,
-                'memoryBandwidth': 0,
-                'computeUnits': 0,
-                'clockSpeed': 0
-            }
-            
-            # Set MI300X defaults if detected
-            if 'MI300X' in model.upper() or 'MI300' in model.upper():
-                gpu_info['model'] = 'MI300X'
-                gpu_info['memoryTotal'] = 192 * 1024
-                gpu_info['memoryBandwidth'] = 5300
-                gpu_info['computeUnits'] = 304
-                gpu_info['clockSpeed'] = 1700
-            
-            gpus.append(gpu_info)
-    
-    return gpus
 
 def main():
     """Main function to detect and output GPU information"""
-    if not detect_rocm_smi():
-        print(json.dumps({
-            'error': 'rocm-smi not found. Please install ROCm.',
-            'gpus': []
-        }), file=sys.stderr)
-        sys.exit(1)
-    
-    gpus = get_gpu_info()
-    
+    parser = argparse.ArgumentParser(description="Detect AMD Instinct GPUs")
+    parser.add_argument("--refresh", action="store_true", help="Re-probe instead of using the inventory cache")
+    parser.add_argument("--sysfs-root", default=os.environ.get("MULTIVERSE_SYSFS_ROOT", "/"),
+                        help="Root of the sysfs tree to read (for testing against a copy)")
+    args = parser.parse_args()
+
+    inventory = gpu_inventory.load(args.sysfs_root, refresh=args.refresh)
+    rocm_smi = inventory['amd']['rocmSmi']
+
+    gpus = get_sysfs_gpus(inventory, args.sysfs_root)
+    if not gpus and rocm_smi['available']:
+        gpus = get_rocm_smi_gpus(rocm_smi['path'])
+
     if not gpus:
+        error = ('No GPUs detected or unable to parse rocm-smi output' if rocm_smi['available']
+                 else 'No amdgpu devices in sysfs and rocm-smi not found. Please install ROCm.')
         print(json.dumps({
-            'error': 'No GPUs detected or unable to parse rocm-smi output',
+            'error': error,
             'gpus': []
         }), file=sys.stderr)
         sys.exit(1)
-    
+
     # Output JSON for easy parsing
     output = {
         'gpus': gpus,
         'count': len(gpus),
-        'mi300x_detected': any(gpu['model'] == 'MI300X' for gpu in gpus)
+        'mi300x_detected': any(gpu['model'] == 'MI300X' for gpu in gpus),
+        'topology': inventory['topology']
     }
-    
+
     print(json.dumps(output, indent=2))
-    
+
     # Also print human-readable summary
     print("\n=== GPU Detection Summary ===", file=sys.stderr)
     for gpu in gpus:
-        print(f"GPU {gpu['index']}: {gpu['vendor']} {gpu['model']}", file=sys.stderr)
+        location = f" [{gpu['pciBus']}, NUMA {gpu['numaNode']}]" if gpu.get('pciBus') else ""
+        print(f"GPU {gpu['index']}: {gpu['vendor']} {gpu['model']}{location}", file=sys.stderr)
         if gpu['model'] == 'MI300X':
             print(f"  ✓ MI300X Detected!", file=sys.stderr)
             print(f"  Memory: {gpu['memoryTotal'] / 1024:.0f} GB HBM3", file=sys.stderr)
@@ -224,7 +205,11 @@ def main():
             print(f"  Utilization: {gpu['utilization']:.1f}%", file=sys.stderr)
         if gpu['temperature'] > 0:
             print(f"  Temperature: {gpu['temperature']:.1f}°C", file=sys.stderr)
+    for hive in inventory['topology']['xgmiHives']:
+        print(f"XGMI hive {hive['hiveId']}: {len(hive['gpus'])} GPUs", file=sys.stderr)
+    source = "cached" if inventory['cached'] else f"probed in {inventory['probeMs']} ms"
+    print(f"Inventory: {source}", file=sys.stderr)
+
 
 if __name__ == '__main__':
     main()
-
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+LLM Load Generator and Latency Benchmark for Multiverse
+Drives concurrent streaming chat completions against any OpenAI-compatible endpoint
+and reports TTFT, inter-token latency, end-to-end latency and throughput
+
+Examples:
+    python scripts/llm-benchmark.py --endpoint http://localhost:1234 --concurrency 8 --requests 64
+    python scripts/llm-benchmark.py --rate 4 --requests 100 --prompts prompts.jsonl --json results.json
+    python scripts/llm-benchmark.py --stub --concurrency 16 --requests 200
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+
+try:
+    import httpx
+except ImportError:
+    print("httpx is required: pip install httpx", file=sys.stderr)
+    sys.exit(1)
+
+DEFAULT_PROMPTS = [
+    "Explain the difference between a process and a thread.",
+    "Write a haiku about GPUs.",
+    "Summarize the plot of Hamlet in three sentences.",
+    "What is the capital of Australia, and why was it chosen?",
+]
+
+
+def load_prompts(path):
+    """Read chat requests from a JSONL file
+
+    Each line is either {"messages": [...]} (plus optional per-request params),
+    {"prompt": "..."}, or a bare JSON string.
+    """
+    if not path:
+        return [{"messages": [{"role": "user", "content": prompt}]} for prompt in DEFAULT_PROMPTS]
+    requests = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise SystemExit(f"{path}:{number}: invalid JSON ({e})")
+            if isinstance(item, str):
+                item = {"prompt": item}
+            if "messages" not in item:
+                if "prompt" not in item:
+                    raise SystemExit(f"{path}:{number}: expected 'messages' or 'prompt'")
+                item = {**item, "messages": [{"role": "user", "content": item.pop("prompt")}]}
+            requests.append(item)
+    if not requests:
+        raise SystemExit(f"{path}: no prompts found")
+    return requests
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class StreamResult:
+    """Timings of one streamed completion"""
+
+    def __init__(self):
+        self.started = 0.0
+        self.ended = 0.0
+        self.token_times = []
+        self.completion_tokens = None
+        self.prompt_tokens = None
+        self.error = None
+
+    def feed_event(self, data, received):
+        if data == b"[DONE]":
+            return
+        try:
+            payload = json.loads(data)
+        except json.JSONDecodeError:
+            return
+        usage = payload.get("usage")
+        if usage:
+            self.completion_tokens = usage.get("completion_tokens")
+            self.prompt_tokens = usage.get("prompt_tokens")
+        for choice in payload.get("choices") or []:
+            delta = choice.get("delta") or {}
+            if delta.get("content") or delta.get("reasoning_content"):
+                self.token_times.append(received)
+                break
+
+    @property
+    def tokens(self):
+        return self.completion_tokens if self.completion_tokens is not None else len(self.token_times)
+
+    def to_dict(self):
+        times = self.token_times
+        gaps = [(b - a) * 1000 for a, b in zip(times, times[1:])]
+        decode_time = times[-1] - times[0] if len(times) > 1 else 0
+        return {
+            "ok": self.error is None,
+            "error": self.error,
+            "ttftMs": (times[0] - self.started) * 1000 if times else None,
+            "e2eMs": (self.ended - self.started) * 1000,
+            "itlMs": gaps,
+            "promptTokens": self.prompt_tokens,
+            "completionTokens": self.tokens,
+            "tokensPerSecond": (self.tokens - 1) / decode_time if decode_time > 0 and self.tokens > 1 else None,
+        }
+
+
+async def stream_completion(client, url, body):
+    """Send one streaming request and time every content event as bytes arrive"""
+    result = StreamResult()
+    result.started = time.perf_counter()
+    buffer = bytearray()
+    try:
+        async with client.stream("POST", url, json=body) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                result.error = f"HTTP {response.status_code}: {response.text[:200]}"
+                return result
+            async for chunk in response.aiter_bytes():
+                received = time.perf_counter()
+                buffer += chunk.replace(b"\r\n", b"\n")
+                while True:
+                    end = buffer.find(b"\n\n")
+                    if end < 0:
+                        break
+                    event = bytes(buffer[:end])
+                    del buffer[:end + 2]
+                    for line in event.split(b"\n"):
+                        if line.startswith(b"data:"):
+                            result.feed_event(line[5:].strip(), received)
+    except httpx.HTTPError as e:
+        result.error = f"{type(e).__name__}: {e}"
+    finally:
+        result.ended = time.perf_counter()
+    return result
+
+
+def build_body(template, args):
+    body = {"temperature": args.temperature, "max_tokens": args.max_tokens, **template,
+            "stream": True, "stream_options": {"include_usage": True}}
+    if args.model and "model" not in template:
+        body["model"] = args.model
+    return body
+
+
+async def run_phase(client, url, requests, args, count):
+    """Issue `count` requests in fixed-concurrency or fixed-rate mode; returns (results, wall seconds)"""
+    bodies = [build_body(template, args) for template in itertools.islice(itertools.cycle(requests), count)]
+    results = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(body):
+        async with semaphore:
+            results.append(await stream_completion(client, url, body))
+
+    started = time.perf_counter()
+    if args.rate:
+        # Open loop: arrivals follow the schedule regardless of how fast responses come back
+        tasks, due = [], started
+        for body in bodies:
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(body)))
+            due += random.expovariate(args.rate) if args.poisson else 1.0 / args.rate
+        await asyncio.gather(*tasks)
+    else:
+        await asyncio.gather(*(one(body) for body in bodies))
+    return results, time.perf_counter() - started
+
+
+def summarize(results, wall, args):
+    """Aggregate per-request timings into the report"""
+    records = [r.to_dict() for r in results]
+    ok = [r for r in records if r["ok"]]
+
+    def stats(values):
+        values = [v for v in values if v is not None]
+        return {
+            "p50": percentile(values, 0.5),
+            "p90": percentile(values, 0.9),
+            "p99": percentile(values, 0.99),
+            "mean": sum(values) / len(values) if values else None,
+            "count": len(values),
+        }
+
+    output_tokens = sum(r["completionTokens"] for r in ok)
+    return {
+        "endpoint": args.endpoint,
+        "mode": f"rate={args.rate}/s" if args.rate else f"concurrency={args.concurrency}",
+        "requests": len(records),
+        "succeeded": len(ok),
+        "failed": len(records) - len(ok),
+        "errors": sorted({r["error"] for r in records if r["error"]})[:5],
+        "durationS": wall,
+        "requestsPerSecond": len(ok) / wall if wall > 0 else None,
+        "outputTokens": output_tokens,
+        "aggregateTokensPerSecond": output_tokens / wall if wall > 0 else None,
+        "ttftMs": stats(r["ttftMs"] for r in ok),
+        "itlMs": stats(gap for r in ok for gap in r["itlMs"]),
+        "e2eMs": stats(r["e2eMs"] for r in ok),
+        "streamTokensPerSecond": stats(r["tokensPerSecond"] for r in ok),
+    }
+
+
+def print_table(report):
+    def fmt(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    print(f"\nEndpoint: {report['endpoint']}  ({report['mode']})")
+    print(f"Requests: {report['succeeded']}/{report['requests']} ok in {report['durationS']:.2f}s "
+          f"({fmt(report['requestsPerSecond'])} req/s)")
+    print(f"Throughput: {report['outputTokens']} output tokens, {fmt(report['aggregateTokensPerSecond'])} tokens/s aggregate")
+    print()
+    print(f"{'metric':<22}{'p50':>10}{'p90':>10}{'p99':>10}{'mean':>10}")
+    print("-" * 62)
+    for key, label in (("ttftMs", "TTFT (ms)"), ("itlMs", "ITL (ms)"), ("e2eMs", "E2E (ms)"),
+                       ("streamTokensPerSecond", "tokens/s per stream")):
+        row = report[key]
+        print(f"{label:<22}{fmt(row['p50']):>10}{fmt(row['p90']):>10}{fmt(row['p99']):>10}{fmt(row['mean']):>10}")
+    for error in report["errors"]:
+        print(f"error: {error}")
+
+
+class StubServer:
+    """Minimal in-process OpenAI-compatible streaming server for offline runs
+
+    Speaks just enough HTTP/1.1 (keep-alive, chunked responses) for httpx.
+    """
+
+    def __init__(self, tokens=64, ttft=0.05, itl=0.01):
+        self.tokens = tokens
+        self.ttft = ttft
+        self.itl = itl
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{self.port}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                headers = {}
+                for line in head.decode("latin-1").split("\r\n")[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                await self._respond(writer, json.loads(body or b"{}"))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, request):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: keep-alive\r\n\r\n")
+        model = request.get("model", "stub-model")
+        count = min(self.tokens, request.get("max_tokens") or self.tokens)
+
+        async def send(payload):
+            data = b"data: " + (payload if isinstance(payload, bytes) else json.dumps(payload).encode()) + b"\n\n"
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+
+        await asyncio.sleep(self.ttft)
+        for i in range(count):
+            if i:
+                await asyncio.sleep(self.itl)
+            await send({"object": "chat.completion.chunk", "model": model,
+                        "choices": [{"index": 0, "delta": {"content": f"tok{i} "}, "finish_reason": None}]})
+        await send({"object": "chat.completion.chunk", "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            await send({"object": "chat.completion.chunk", "model": model, "choices": [],
+                        "usage": {"prompt_tokens": 10, "completion_tokens": count, "total_tokens": 10 + count}})
+        await send(b"[DONE]")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def run(args):
+    stub = None
+    if args.stub:
+        stub = StubServer(args.stub_tokens, args.stub_ttft, args.stub_itl)
+        args.endpoint = await stub.start()
+    requests = load_prompts(args.prompts)
+    url = args.endpoint.rstrip("/") + "/v1/chat/completions"
+    # One pooled client so connections are reused across requests instead of a new one per message
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(timeout=httpx.Timeout(args.timeout, connect=10.0), limits=limits) as client:
+            if args.warmup:
+                print(f"Warming up with {args.warmup} request(s)...", file=sys.stderr)
+                await run_phase(client, url, requests, args, args.warmup)
+            print(f"Running {args.requests} request(s) against {url}...", file=sys.stderr)
+            results, wall = await run_phase(client, url, requests, args, args.requests)
+    finally:
+        if stub:
+            await stub.stop()
+    return summarize(results, wall, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent streaming load generator for OpenAI-compatible endpoints")
+    parser.add_argument("--endpoint", default="http://localhost:1234", help="Base URL of the server")
+    parser.add_argument("--model", help="Model name to send (if the prompts do not set one)")
+    parser.add_argument("--prompts", help="JSONL file of requests ({'messages': [...]}, {'prompt': ...} or a string)")
+    parser.add_argument("--requests", "-n", type=int, default=32, help="Measured requests (default: 32)")
+    parser.add_argument("--concurrency", "-c", type=int,
+                        help="Maximum requests in flight (default: 4, or 256 as a safety cap with --rate)")
+    parser.add_argument("--rate", type=float, help="Target arrival rate in requests/s instead of closed-loop concurrency")
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times in --rate mode")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests sent first (default: 2)")
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request read timeout in seconds")
+    parser.add_argument("--json", dest="json_out", help="Write the report as JSON to this file ('-' for stdout)")
+    parser.add_argument("--stub", action="store_true", help="Benchmark a bundled in-process stub server (offline)")
+    parser.add_argument("--stub-tokens", type=int, default=64)
+    parser.add_argument("--stub-ttft", type=float, default=0.05, help="Stub time to first token in seconds")
+    parser.add_argument("--stub-itl", type=float, default=0.01, help="Stub inter-token delay in seconds")
+    args = parser.parse_args()
+    if args.concurrency is None:
+        # In rate mode the concurrency cap only guards against runaway queues
+        args.concurrency = 256 if args.rate else 4
+    if args.concurrency < 1 or args.requests < 1 or (args.rate is not None and args.rate <= 0):
+        parser.error("--concurrency, --requests and --rate must be positive")
+
+    report = asyncio.run(run(args))
+    if args.json_out == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(report)
+        if args.json_out:
+            with open(args.json_out, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"\nReport written to {args.json_out}")
+    return 0 if report["succeeded"] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
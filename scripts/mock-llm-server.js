@@ -26,7 +26,7 @@ function getRandomResponse() {
 }
 
 // Create streaming SSE chunks
-function* generateStreamChunks(message) {
+function* generateStreamChunks(message, includeUsage = false) {
   const words = message.split(' ');
   
   for (let i = 0; i < words.length; i++) {
@@ -66,6 +66,23 @@ function* generateStreamChunks(message) {
   };
   
   yield `data: ${JSON.stringify(finalChunk)}\n\n`;
+
+  // Usage chunk, sent when the client asks for stream_options.include_usage
+  if (includeUsage) {
+    const usageChunk = {
+      id: `chatcmpl-mock-${Date.now()}`,
+      object: 'chat.completion.chunk',
+      created: Math.floor(Date.now() / 1000),
+      model: 'mock-model',
+      choices: [],
+      usage: {
+        prompt_tokens: 10,
+        completion_tokens: words.length,
+        total_tokens: 10 + words.length,
+      },
+    };
+    yield `data: ${JSON.stringify(usageChunk)}\n\n`;
+  }
   yield 'data: [DONE]\n\n';
 }
 
@@ -126,7 +143,8 @@ const server = http.createServer((req, res) => {
         const message = getRandomResponse();
         
         // Send chunks with slight delay to simulate real streaming
-        const chunks = Array.from(generateStreamChunks(message));
+        const includeUsage = requestData.stream_options?.include_usage === true;
+        const chunks = Array.from(generateStreamChunks(message, includeUsage));
         let index = 0;
 
         const interval = setInterval(() => {
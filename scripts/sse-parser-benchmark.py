@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+SSE Parser Micro-benchmark for Multiverse
+Measures multiverse_client.SSEParser throughput in MB/s against the iter_lines()
+approach used by the old generated code, on a synthetic chat-completion stream
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from multiverse_client import SSEParser  # noqa: E402
+
+
+def make_stream(events, multiline_every=0):
+    """A realistic stream: one JSON chunk per token, optional multi-line data events"""
+    parts = []
+    for i in range(events):
+        payload = json.dumps({
+            "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 1700000000, "model": "bench-model",
+            "choices": [{"index": 0, "delta": {"content": f" token{i}"}, "finish_reason": None}]
+        })
+        if multiline_every and i % multiline_every == 0:
+            # Same JSON split over two data: lines at a whitespace position (valid SSE,
+            # mangled by line-at-a-time parsers)
+            middle = payload.index(', "choices"') + 1
+            parts.append(f"data: {payload[:middle]}\ndata: {payload[middle:]}\n\n")
+        else:
+            parts.append(f"data: {payload}\n\n")
+    parts.append("data: [DONE]\n\n")
+    return "".join(parts).encode()
+
+
+def chunked(data, low, high, seed=1):
+    """Split the stream at random offsets like network reads would"""
+    rng = random.Random(seed)
+    chunks, offset = [], 0
+    while offset < len(data):
+        size = rng.randint(low, high)
+        chunks.append(data[offset:offset + size])
+        offset += size
+    return chunks
+
+
+def parse_incremental(chunks, decode_json):
+    parser = SSEParser()
+    count = 0
+    for chunk in chunks:
+        for data in parser.feed(chunk):
+            if decode_json and data != b"[DONE]":
+                json.loads(data.decode())
+            count += 1
+    return count
+
+
+def parse_iter_lines(chunks, decode_json):
+    """What requests' iter_lines() + per-line decode does: re-split the pending buffer on every chunk"""
+    pending = b""
+    count = 0
+    for chunk in chunks:
+        lines = (pending + chunk).splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(b"\n") else b""
+        for line in lines:
+            line = line.rstrip(b"\r\n").decode("utf-8")
+            if line.startswith("data: "):
+                data = line[6:]
+                if data.strip() == "[DONE]":
+                    continue
+                if decode_json:
+                    try:
+                        json.loads(data)
+                    except json.JSONDecodeError:
+                        continue
+                count += 1
+    return count
+
+
+def bench(name, function, chunks, size, decode_json, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = function(chunks, decode_json)
+        best = min(best, time.perf_counter() - started)
+    print(f"{name:<34}{size / best / 1e6:>10.1f} MB/s{count:>10} events")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SSE parser throughput")
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--chunk-min", type=int, default=16, help="Smallest simulated network read in bytes")
+    parser.add_argument("--chunk-max", type=int, default=4096, help="Largest simulated network read in bytes")
+    parser.add_argument("--multiline-every", type=int, default=0,
+                        help="Split every Nth event over two data: lines (0 = never)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = make_stream(args.events, args.multiline_every)
+    chunks = chunked(data, args.chunk_min, args.chunk_max)
+    print(f"Stream: {len(data) / 1e6:.2f} MB, {args.events} events, {len(chunks)} chunks "
+          f"({args.chunk_min}-{args.chunk_max} B)\n")
+    for decode_json in (False, True):
+        suffix = " + json.loads" if decode_json else ""
+        bench("SSEParser" + suffix, parse_incremental, chunks, len(data), decode_json, args.repeat)
+        bench("iter_lines-style" + suffix, parse_iter_lines, chunks, len(data), decode_json, args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
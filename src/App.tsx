@@ -45,7 +45,7 @@ import { useConversation } from './hooks/useConversation';
 import { useTheme } from './hooks/useTheme';
 import { useToast } from './hooks/useToast';
 import { useConnection } from './hooks/useConnection';
-import { useBackendMetrics } from './hooks/useBackendMetrics';
+import { useBackendMetrics, type InferenceProcess } from './hooks/useBackendMetrics';
 import { debounce } from './utils/debounce';
 import { useChat } from './hooks/useChat';
 
@@ -166,7 +166,16 @@ function App() {
     igpuAvailable: false,
     igpuUtilization: 0,
     igpuModel: 'Unknown',
-    igpuMemoryTotal: 0
+    igpuMemoryTotal: 0,
+    // Inference server process reported by the backend (0 = not found)
+    processId: 0,
+    processName: '',
+    processThreads: 0,
+    processUptime: 0,
+    // Host rates reported by the backend (undefined = not available)
+    cpuMaxCoreUtilization: undefined as number | undefined,
+    diskThroughput: undefined as number | undefined,
+    networkThroughput: undefined as number | undefined
   });
   
   const [compositeMetrics, setCompositeMetrics] = useState({
@@ -1302,6 +1311,11 @@ function App() {
       const memory = backendMetrics.memory;
       const gpu = backendMetrics.gpu;
       const battery = backendMetrics.battery;
+      const disk = backendMetrics.disk;
+      const network = backendMetrics.network;
+      // The largest process is the server itself rather than a helper or model runner
+      const inferenceProcess = (backendMetrics.process?.processes || [])
+        .reduce<InferenceProcess | null>((largest, p) => (!largest || p.rss > largest.rss ? p : largest), null);
       
       setSystemMetrics(prev => ({
         ...prev,
@@ -1315,8 +1329,18 @@ function App() {
         temperature: gpu?.temperature || prev.temperature,
         powerDraw: gpu?.powerDraw || prev.powerDraw,
         batteryLevel: battery?.level || prev.batteryLevel,
-        isThrottling: (gpu?.temperature || 0) > 80 || cpu.utilization > 95,
-        gpuClockSpeed: gpu?.graphicsClock || prev.gpuClockSpeed
+        // The backend's throttle detector watches clocks against their baseline; the thresholds are a fallback for older backends
+        isThrottling: backendMetrics.throttle
+          ? backendMetrics.throttle.throttling > 0
+          : (gpu?.temperature || 0) > 80 || cpu.utilization > 95,
+        gpuClockSpeed: gpu?.graphicsClock || prev.gpuClockSpeed,
+        processId: inferenceProcess?.pid || 0,
+        processName: inferenceProcess ? `${inferenceProcess.server} (${inferenceProcess.name})` : '',
+        processThreads: backendMetrics.process?.total?.threads || 0,
+        processUptime: inferenceProcess?.uptime || 0,
+        cpuMaxCoreUtilization: cpu.maxCoreUtilization,
+        diskThroughput: disk ? (disk.readBytesPerSec + disk.writeBytesPerSec) / (1024 * 1024) : undefined, // MB/s
+        networkThroughput: network ? (network.rxBytesPerSec + network.txBytesPerSec) / (1024 * 1024) : undefined // MB/s
         // Don't update activeAccelerator or acceleratorType from backend
         // These are determined by frontend detection logic which correctly identifies iGPU vs dGPU
       }));
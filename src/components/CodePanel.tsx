@@ -36,160 +36,167 @@ export const CodePanel: React.FC<CodePanelProps> = ({
     
     const currentMessage = inputMessage.trim() || "Hello, how can you help me?";
     
-    return `# AI Model API Integration with Streaming
-import requests
+    return `# AI Model API Integration with Streaming (async, pooled connection)
+# pip install httpx
+import asyncio
 import json
 
-def chat_with_model_stream(message, endpoint="${endpoint}", conversation_history=None):
+import httpx
+
+ENDPOINT = "${endpoint}"
+HEADERS = {
+    "Content-Type": "application/json"${apiKey ? `,\n    "Authorization": "Bearer ${apiKey}"` : ''}
+}
+PARAMS = {"temperature": ${temperature}, "max_tokens": ${maxTokens}, "top_p": ${topP}}
+SYSTEM_PROMPT = {"role": "system", "content": "You are a helpful AI assistant."}
+INITIAL_HISTORY = [
+${conversationHistory ? conversationHistory.replace(/^ {8}/gm, '') : '    SYSTEM_PROMPT'}
+]
+
+
+class SSEParser:
+    """Incremental byte-level SSE parser: handles partial chunks and multi-line data: events"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.after_cr = False
+
+    def feed(self, chunk):
+        if self.after_cr and chunk.startswith(b"\\n"):
+            chunk = chunk[1:]  # the LF of a CRLF split across chunks
+        if b"\\r" in chunk:
+            self.after_cr = chunk.endswith(b"\\r")
+            chunk = chunk.replace(b"\\r\\n", b"\\n").replace(b"\\r", b"\\n")
+        elif chunk:
+            self.after_cr = False
+        scan_from = max(0, len(self.buffer) - 1)
+        self.buffer += chunk
+        end = self.buffer.rfind(b"\\n\\n", scan_from)
+        if end < 0:
+            return []
+        block = bytes(self.buffer[:end])
+        del self.buffer[:end + 2]
+        events = []
+        for event in block.split(b"\\n\\n"):
+            data = [line[5:].removeprefix(b" ") for line in event.split(b"\\n") if line.startswith(b"data:")]
+            if data:
+                events.append(b"\\n".join(data))
+        return events
+
+
+async def chat_with_model_stream(client, message, conversation_history=None):
     """Send a message to an AI model endpoint with streaming response"""
-    
-    headers = {
-        "Content-Type": "application/json"${apiKey ? `,\n        "Authorization": "Bearer ${apiKey}"` : ''}
-    }
-    
-    # Build conversation history
-    if conversation_history is None:
-        messages = [
-${conversationHistory || '            {"role": "system", "content": "You are a helpful AI assistant."}'},
-            {"role": "user", "content": message}
-        ]
-    else:
-        messages = [
-            {"role": "system", "content": "You are a helpful AI assistant."},
-            *conversation_history,
-            {"role": "user", "content": message}
-        ]
-    
-    payload = {
-        "messages": messages,
-        "temperature": ${temperature},
-        "max_tokens": ${maxTokens},
-        "top_p": ${topP},
-        "stream": True
-    }
-    
+    messages = [*(conversation_history or INITIAL_HISTORY), {"role": "user", "content": message}]
+    payload = {**PARAMS, "messages": messages, "stream": True}
+    parser = SSEParser()
+    ai_response = []
     try:
-        response = requests.post(f"{endpoint}/v1/chat/completions", 
-                               headers=headers, json=payload, stream=True, timeout=30)
-        response.raise_for_status()
-        
-        print("AI Response: ", end="", flush=True)
-        
-        ai_response = ""
-        for line in response.iter_lines():
-            if line:
-                line = line.decode('utf-8')
-                if line.startswith('data: '):
-                    data = line[6:]
-                    if data.strip() == '[DONE]':
+        async with client.stream("POST", "/v1/chat/completions", json=payload) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                # Everything that arrived in one read is printed at once
+                pieces = []
+                for data in parser.feed(chunk):
+                    if data == b"[DONE]":
                         break
                     try:
-                        parsed = json.loads(data)
-                        if 'choices' in parsed and len(parsed['choices']) > 0:
-                            delta = parsed['choices'][0].get('delta', {})
-                            if 'content' in delta:
-                                content = delta['content']
-                                print(content, end="", flush=True)
-                                ai_response += content
-                    except json.JSONDecodeError:
+                        parsed = json.loads(data.decode())
+                    except ValueError:
                         continue
-        
+                    choices = parsed.get("choices") or []
+                    content = (choices[0].get("delta") or {}).get("content") if choices else None
+                    if content:
+                        pieces.append(content)
+                if pieces:
+                    text = "".join(pieces)
+                    print(text, end="", flush=True)
+                    ai_response.append(text)
         print()  # New line after streaming
-        return ai_response
-        
-    except requests.exceptions.RequestException as e:
-        print(f"Error: {e}")
-    except Exception as e:
+        return "".join(ai_response)
+    except httpx.HTTPError as e:
         print(f"Error: {e}")
 
-def chat_with_model(message, endpoint="${endpoint}"):
+
+async def chat_with_model(client, message):
     """Send a message to an AI model endpoint (non-streaming)"""
-    
-    headers = {
-        "Content-Type": "application/json"${apiKey ? `,\n        "Authorization": "Bearer ${apiKey}"` : ''}
-    }
-    
-    # Build conversation history
-    messages = [
-${conversationHistory || '        {"role": "system", "content": "You are a helpful AI assistant."}'},
-        {"role": "user", "content": message}
-    ]
-    
-    payload = {
-        "messages": messages,
-        "temperature": ${temperature},
-        "max_tokens": ${maxTokens},
-        "top_p": ${topP},
-        "stream": False
-    }
-    
+    payload = {**PARAMS, "messages": [*INITIAL_HISTORY, {"role": "user", "content": message}], "stream": False}
     try:
-        response = requests.post(f"{endpoint}/v1/chat/completions", 
-                               headers=headers, json=payload, timeout=30)
+        response = await client.post("/v1/chat/completions", json=payload)
         response.raise_for_status()
-        
-        result = response.json()
-        return result['choices'][0]['message']['content']
-        
-    except requests.exceptions.RequestException as e:
+        return response.json()["choices"][0]["message"]["content"]
+    except httpx.HTTPError as e:
         return f"Error: {e}"
-    except KeyError as e:
+    except (KeyError, IndexError) as e:
         return f"Error: Unexpected response format - {e}"
-    except Exception as e:
-        return f"Error: {e}"
+
+
+async def chat_many(client, prompts, concurrency=4):
+    """Ask several independent questions concurrently over the same connection pool"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(prompt):
+        async with semaphore:
+            return await chat_with_model(client, prompt)
+
+    return await asyncio.gather(*(one(prompt) for prompt in prompts))
+
+
+def make_client():
+    """One pooled keep-alive connection reused by every request"""
+    return httpx.AsyncClient(base_url=ENDPOINT, headers=HEADERS, timeout=httpx.Timeout(300.0, connect=10.0))
+
 
 # Interactive chat loop
-def interactive_chat(endpoint="${endpoint}"):
+async def interactive_chat():
     """Interactive chat loop - type 'quit' to exit"""
     print("🤖 AI Chat Assistant")
     print("Type 'quit' to exit the chat")
     print("-" * 40)
-    
-    conversation_history = []
-    
-    while True:
-        try:
-            # Get user input
-            user_input = input("\\nYou: ").strip()
-            
-            # Check for quit command
-            if user_input.lower() in ['quit', 'exit', 'bye', 'goodbye']:
-                print("👋 Goodbye! Thanks for chatting!")
+
+    conversation_history = list(INITIAL_HISTORY)
+
+    async with make_client() as client:
+        while True:
+            try:
+                user_input = (await asyncio.to_thread(input, "\\nYou: ")).strip()
+
+                if user_input.lower() in ['quit', 'exit', 'bye', 'goodbye']:
+                    print("👋 Goodbye! Thanks for chatting!")
+                    break
+
+                if not user_input:
+                    print("Please enter a message or type 'quit' to exit.")
+                    continue
+
+                print("\\nAI: ", end="", flush=True)
+                ai_response = await chat_with_model_stream(client, user_input, conversation_history)
+
+                # Keep both sides of the turn for the next request; a failed turn is dropped so roles keep alternating
+                if ai_response is not None:
+                    conversation_history.append({"role": "user", "content": user_input})
+                    conversation_history.append({"role": "assistant", "content": ai_response})
+
+            except (KeyboardInterrupt, EOFError):
+                print("\\n\\n👋 Goodbye! Thanks for chatting!")
                 break
-            
-            if not user_input:
-                print("Please enter a message or type 'quit' to exit.")
-                continue
-            
-            # Add user message to conversation
-            conversation_history.append({"role": "user", "content": user_input})
-            
-            # Get AI response with streaming
-            print("\\nAI: ", end="", flush=True)
-            ai_response = chat_with_model_stream(user_input, endpoint, conversation_history)
-            
-            # Add AI response to conversation history
-            if ai_response:
-                conversation_history.append({"role": "assistant", "content": ai_response})
-            
-        except KeyboardInterrupt:
-            print("\\n\\n👋 Goodbye! Thanks for chatting!")
-            break
-        except Exception as e:
-            print(f"\\nError: {e}")
-            print("Please try again or type 'quit' to exit.")
+
 
 # Example usage
 if __name__ == "__main__":
     # Interactive chat loop
-    interactive_chat()
-    
-    # Or single message examples:
-    # print("=== Single Message Examples ===")
-    # message = ${JSON.stringify(currentMessage)}
-    # chat_with_model_stream(message)
-    # response = chat_with_model(message)
-    # print(f"AI Response: {response}")`;
+    try:
+        asyncio.run(interactive_chat())
+    except KeyboardInterrupt:
+        pass
+
+    # Or single message / batch examples:
+    # async def examples():
+    #     async with make_client() as client:
+    #         message = ${JSON.stringify(currentMessage)}
+    #         await chat_with_model_stream(client, message)
+    #         print(f"AI Response: {await chat_with_model(client, message)}")
+    #         print(await chat_many(client, [message, "What is a GPU?"]))
+    # asyncio.run(examples())`;
   };
 
   const getJavaScriptCode = () => {
@@ -42,6 +42,13 @@ interface DashboardProps {
     igpuUtilization: number;
     igpuModel: string;
     igpuMemoryTotal: number;
+    processId?: number;
+    processName?: string;
+    processThreads?: number;
+    processUptime?: number;
+    cpuMaxCoreUtilization?: number;
+    diskThroughput?: number;
+    networkThroughput?: number;
   };
   compositeMetrics: {
     tokensPerWatt: number;
@@ -234,14 +241,14 @@ export const Dashboard: React.FC<DashboardProps> = ({
               {/* First row: CPU, Memory, Power & Thermal, System Status */}
               <div style={{ display: 'grid', gridTemplateColumns: isMobile ? '1fr' : '1fr 1fr 1fr 1fr', gap: '20px', marginBottom: '20px' }}>
                 <div className="metric-card" style={{ position: 'relative' }}>
-                  <HintIcon text="CPU Utilization: Overall = real-time CPU usage percentage from Performance API (based on long tasks and load timing). Per-core avg = overall * 0.8. Thread count = hardware concurrency from navigator.hardwareConcurrency" />
+                  <HintIcon text="CPU Utilization: Overall = real-time CPU usage percentage from Performance API (based on long tasks and load timing). Busiest core = highest per-core utilization reported by the backend (estimated as overall * 0.8 when the backend is not connected). Thread count = hardware concurrency from navigator.hardwareConcurrency" />
                   <h4 className="metric-title" style={{ fontSize: isROGAllyX ? '1.3rem' : '1rem' }}>🔹 CPU Utilization</h4>
                   <div className="metric-value" style={{ fontSize: isROGAllyX ? '1.1rem' : '0.9rem' }}>
                     <div>
                       Overall: <span className="value">{systemMetrics.cpuUtilization.toFixed(1)}%</span>
                     </div>
                     <div>
-                      Per-core avg: <span className="value">{(systemMetrics.cpuUtilization * 0.8).toFixed(1)}%</span>
+                      Busiest core: <span className="value">{(systemMetrics.cpuMaxCoreUtilization ?? systemMetrics.cpuUtilization * 0.8).toFixed(1)}%</span>
                     </div>
                     <div>
                       Thread count: <span className="value">{Math.floor(systemMetrics.cpuUtilization / 10) + 8}</span>
@@ -266,7 +273,7 @@ export const Dashboard: React.FC<DashboardProps> = ({
                 </div>
                 
                 <div className="metric-card" style={{ position: 'relative' }}>
-                  <HintIcon text="Power & Thermal: Power draw = estimated from Battery API discharge rate (calculated from battery.dischargingTime). CPU temp = estimated from CPU utilization and power draw (30 + cpuUtilization * 0.4 + powerDraw * 0.2). Throttling = detected when temp > 80°C or CPU > 95%. Battery = real-time battery level from Battery API (navigator.getBattery())" />
+                  <HintIcon text="Power & Thermal: Power draw = estimated from Battery API discharge rate (calculated from battery.dischargingTime). CPU temp = estimated from CPU utilization and power draw (30 + cpuUtilization * 0.4 + powerDraw * 0.2). Throttling = a GPU clock drop or power/thermal slowdown detected by the backend (temp > 80°C or CPU > 95% when the backend is not connected). Battery = real-time battery level from Battery API (navigator.getBattery())" />
                   <h4 className="metric-title" style={{ fontSize: isROGAllyX ? '1.3rem' : '1rem' }}>🔹 Power & Thermal</h4>
                   <div className="metric-value" style={{ fontSize: isROGAllyX ? '1.1rem' : '0.9rem' }}>
                     <div>
@@ -285,13 +292,24 @@ export const Dashboard: React.FC<DashboardProps> = ({
                 </div>
                 
                 <div className="metric-card" style={{ position: 'relative' }}>
-                  <HintIcon text="System Status: Disk I/O = estimated from real-time RAM usage (ramUsage / 1000 MB/s). Network = estimated from power draw (powerDraw / 10 MB/s). Process PID = estimated process ID (cpuUtilization * 100 + 1000). Uptime = real-time uptime from Performance API (performance.now() / 1000 seconds)" />
+                  <HintIcon text="System Status: Disk I/O = host disk read + write throughput and Network = host receive + transmit throughput, both reported by the backend (estimated from RAM usage and power draw when the backend is not connected). Process PID, threads and uptime = the inference server process reported by the backend (LM Studio, Ollama, llama.cpp, ...); estimated when the backend is not connected" />
                   <h4 className="metric-title" style={{ fontSize: isROGAllyX ? '1.3rem' : '1rem' }}>💡 System Status</h4>
                   <div className="metric-value" style={{ fontSize: isROGAllyX ? '1.1rem' : '0.9rem' }}>
-                    <div>Disk I/O: <span className="value">{(systemMetrics.ramUsage / 1000).toFixed(1)} MB/s</span></div>
-                    <div>Network: <span className="value">{(systemMetrics.powerDraw / 10).toFixed(1)} MB/s</span></div>
-                    <div>Process PID: <span className="value">{Math.floor(systemMetrics.cpuUtilization * 100) + 1000}</span></div>
-                    <div>Uptime: <span className="value">{Math.floor(systemMetrics.temperature / 10)}h {Math.floor(systemMetrics.powerDraw / 10)}m</span></div>
+                    <div>Disk I/O: <span className="value">{(systemMetrics.diskThroughput ?? systemMetrics.ramUsage / 1000).toFixed(1)} MB/s</span></div>
+                    <div>Network: <span className="value">{(systemMetrics.networkThroughput ?? systemMetrics.powerDraw / 10).toFixed(1)} MB/s</span></div>
+                    {systemMetrics.processId ? (
+                      <>
+                        <div>Inference server: <span className="value">{systemMetrics.processName}</span></div>
+                        <div>Process PID: <span className="value">{systemMetrics.processId}</span></div>
+                        <div>Threads: <span className="value">{systemMetrics.processThreads}</span></div>
+                        <div>Uptime: <span className="value">{Math.floor((systemMetrics.processUptime || 0) / 3600)}h {Math.floor((systemMetrics.processUptime || 0) % 3600 / 60)}m</span></div>
+                      </>
+                    ) : (
+                      <>
+                        <div>Process PID: <span className="value">{Math.floor(systemMetrics.cpuUtilization * 100) + 1000}</span></div>
+                        <div>Uptime: <span className="value">{Math.floor(systemMetrics.temperature / 10)}h {Math.floor(systemMetrics.powerDraw / 10)}m</span></div>
+                      </>
+                    )}
                   </div>
                 </div>
               </div>
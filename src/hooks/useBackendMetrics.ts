@@ -1,5 +1,52 @@
 import { useEffect, useState, useRef } from 'react';
 
+export interface InferenceProcess {
+  pid: number;
+  name: string;
+  server: string;
+  cpuPercent: number | null;
+  rss: number;
+  threads: number;
+  ctxSwitchesVoluntary: number | null;
+  ctxSwitchesInvoluntary: number | null;
+  readBytesPerSec: number | null;
+  writeBytesPerSec: number | null;
+  uptime: number;
+}
+
+export interface ThrottleEvent {
+  id: number;
+  type: 'throttle-start' | 'throttle-end';
+  gpu: number;
+  model: string | null;
+  timestamp: number;
+  reasons: string[];
+  severity: 'minor' | 'moderate' | 'severe';
+  duration?: number;
+  maxClockDrop?: number;
+}
+
+export interface ClusterNode {
+  name: string;
+  url: string;
+  state: 'connecting' | 'live' | 'stale' | 'down';
+  age: number | null;
+  reconnects: number;
+  error: string | null;
+  subscribeError: string | null;
+  cpuUtilization?: number | null;
+  memoryPercent?: number | null;
+  gpus?: number;
+  gpusBusy?: number;
+  utilizationMean?: number | null;
+  vramTotal?: number;
+  vramUsed?: number;
+  vramFree?: number;
+  powerDraw?: number | null;
+  temperatureMax?: number | null;
+  throttling?: number;
+}
+
 interface BackendMetrics {
   timestamp: string;
   cpu: {
@@ -7,6 +54,9 @@ interface BackendMetrics {
     cores: number;
     frequency: number | null;
     maxFrequency: number | null;
+    perCore?: (number | null)[];
+    maxCoreUtilization?: number;
+    iowait?: number | null;
   };
   memory: {
     total: number;
@@ -31,6 +81,53 @@ interface BackendMetrics {
     graphicsClock: number | null;
     memoryClock: number | null;
   } | null;
+  disk?: {
+    readBytesPerSec: number;
+    writeBytesPerSec: number;
+    maxBusyPercent: number;
+  } | null;
+  network?: {
+    rxBytesPerSec: number;
+    txBytesPerSec: number;
+  } | null;
+  process?: {
+    processes: InferenceProcess[];
+    total: {
+      count: number;
+      cpuPercent: number | null;
+      rss: number | null;
+      threads: number | null;
+    } | null;
+  };
+  throttle?: {
+    throttling: number;
+    maxSeverity: number;
+    maxClockDrop: number;
+    active: {
+      index: number;
+      since: number;
+      reasons: string[];
+      severity: 'minor' | 'moderate' | 'severe';
+      clockDrop: number;
+    }[];
+    events: ThrottleEvent[];
+  };
+  cluster?: {
+    fleet: {
+      nodes: number;
+      nodesLive: number;
+      nodesDown: number;
+      gpus: number;
+      gpusBusy: number;
+      utilizationMean: number | null;
+      vramTotal: number;
+      vramUsed: number;
+      vramFree: number;
+      powerDraw: number | null;
+      throttling: number;
+    };
+    nodes: ClusterNode[];
+  };
   battery: {
     level: number;
     charging: boolean;
@@ -0,0 +1,53 @@
+"""Tests for the incremental SSE parser in multiverse_client"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from multiverse_client import SSEParser  # noqa: E402
+
+EVENTS = [b'{"a":1}', b'{"b":2}', b"[DONE]"]
+STREAM = b"".join(b"data: " + data + b"\n\n" for data in EVENTS)
+MULTILINE = b": keep-alive\n\nid: 7\ndata: one\ndata: two\n\nevent: x\ndata: three\n\n"
+ENDINGS = {"lf": b"\n", "crlf": b"\r\n", "cr": b"\r"}
+
+
+def feed_all(chunks):
+    parser = SSEParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return parser, events
+
+
+@pytest.mark.parametrize("ending", ENDINGS.values(), ids=ENDINGS.keys())
+def test_every_split_point(ending):
+    stream = STREAM.replace(b"\n", ending)
+    for split in range(len(stream) + 1):
+        _, events = feed_all([stream[:split], stream[split:]])
+        assert events == EVENTS, f"split at {split}: {stream[:split]!r} | {stream[split:]!r}"
+
+
+@pytest.mark.parametrize("ending", ENDINGS.values(), ids=ENDINGS.keys())
+def test_one_byte_at_a_time(ending):
+    stream = STREAM.replace(b"\n", ending)
+    _, events = feed_all(stream[i:i + 1] for i in range(len(stream)))
+    assert events == EVENTS
+
+
+@pytest.mark.parametrize("ending", ENDINGS.values(), ids=ENDINGS.keys())
+def test_multiline_fields_at_every_split_point(ending):
+    stream = MULTILINE.replace(b"\n", ending)
+    for split in range(len(stream) + 1):
+        parser, events = feed_all([stream[:split], stream[split:]])
+        assert events == [b"one\ntwo", b"three"], f"split at {split}"
+        assert parser.last_event_id == b"7"
+
+
+def test_event_is_not_emitted_before_its_blank_line():
+    parser = SSEParser()
+    assert parser.feed(b"data: x\n") == []
+    assert parser.feed(b"\n") == [b"x"]